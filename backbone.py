@@ -0,0 +1,279 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : backbone.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        MEOBackbone.path()
+        HierarchicalRouter.route()
+
+    NOTES :
+        - The MEO backbone is the graph of the MEO satellites, the edges between
+          them and shortcuts that drop to a single LEO satellite and back. Its
+          all-pairs costs are computed once per tick with a vectorized
+          Floyd-Warshall, so a long-haul route gets a good bound as soon as the
+          searches from each end reach the backbone.
+        - The backbone tables miss routes that drop back to two or more LEO
+          satellites in a row between MEO segments, so the bidirectional search
+          still passes through MEO satellites and stops on the usual bound (the
+          two queue heads against the best route). Hierarchical routes are as
+          cheap as the flat search; short routes use the flat search directly.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+from heapq import heappush, heappop
+from math import dist
+
+import numpy as np
+
+import settings
+from graph import INF, SnapshotGraph, reconstruct_path, shortest_path_tree
+
+
+class MEOBackbone:
+    """ The all-pairs costs and next hops of the MEO backbone of a tick.
+
+        :param graph: The graph of the tick.
+
+        Attributes:
+            nodes (np.ndarray): The node indices of the MEO satellites.
+            costs (np.ndarray): A (M, M) array of backbone costs, where entering
+            a satellite costs the edge weight plus the node cost, as in
+            Algorithms.dijskra().
+    """
+
+    def __init__(self, graph: SnapshotGraph) -> None:
+        self.nodes = np.array([i for i, position in enumerate(graph.positions)
+                               if position[2] == settings.MEO_ORBIT_HEIGHT], dtype=np.int64)
+        self._slot = {node: slot for slot, node in enumerate(self.nodes.tolist())}
+        node_count = len(self.nodes)
+
+        costs = np.full((node_count, node_count), INF)
+        for slot, u in enumerate(self.nodes.tolist()):
+            for v, w_uv in graph.adjacency[u]:
+                if v in self._slot:
+                    costs[slot, self._slot[v]] = w_uv + graph.node_cost[v]
+
+        # Dropping to a single LEO satellite between two MEO satellites is a
+        # shortcut of the backbone, remembered by its LEO node.
+        meo_to_leo = np.full((node_count, len(graph.positions)), INF)
+        for slot, u in enumerate(self.nodes.tolist()):
+            for v, w_uv in graph.adjacency[u]:
+                if v not in self._slot:
+                    meo_to_leo[slot, v] = w_uv
+        leo_nodes = np.nonzero(np.isfinite(meo_to_leo).any(axis=0))[0]
+        meo_to_leo = meo_to_leo[:, leo_nodes]
+        meo_node_cost = np.array([graph.node_cost[u] for u in self.nodes.tolist()])
+        self._via = np.full((node_count, node_count), -1, dtype=np.int64)
+        for column, leo_node in enumerate(leo_nodes.tolist()):
+            dip = (meo_to_leo[:, column, None] + graph.node_cost[leo_node] +
+                   meo_to_leo[None, :, column] + meo_node_cost[None, :])
+            shorter = dip < costs
+            costs = np.where(shorter, dip, costs)
+            self._via = np.where(shorter, leo_node, self._via)
+
+        np.fill_diagonal(costs, 0)
+        self._via[np.diag_indices(node_count)] = -1
+        next_hop = np.tile(np.arange(node_count), (node_count, 1))
+
+        for k in range(node_count):
+            # Relax every pair through k at once.
+            through_k = costs[:, k, None] + costs[None, k, :]
+            shorter = through_k < costs
+            costs = np.where(shorter, through_k, costs)
+            next_hop = np.where(shorter, next_hop[:, k, None], next_hop)
+        self.costs = costs
+        self._next_hop = next_hop
+
+    def path(self, u: int, v: int) -> list[int]:
+        """ Returns the backbone route between two MEO satellites.
+
+            :param u: The node index of the first satellite.
+            :param v: The node index of the last satellite.
+            :return: The node indices from u to v, including the LEO satellites
+            of shortcuts, or an empty list if v cannot be reached through the
+            backbone.
+        """
+        i, j = self._slot[u], self._slot[v]
+        if self.costs[i, j] == INF:
+            return []
+        path = [u]
+        while i != j:
+            hop = int(self._next_hop[i, j])
+            if self._via[i, hop] != -1:
+                path.append(int(self._via[i, hop]))
+            path.append(int(self.nodes[hop]))
+            i = hop
+        return path
+
+
+@dataclass
+class HierarchicalRoute:
+    """ A dataclass holding a route found by a HierarchicalRouter.
+
+        Attributes:
+            path (list): The positions of the nodes along the route.
+            cost (float): The total cost of the route.
+            hierarchical (bool): Whether the route came from the backbone tables
+            rather than the flat search.
+    """
+    path: list
+    cost: float
+    hierarchical: bool
+
+
+class HierarchicalRouter:
+    """ Routes over the LEO layer and the precomputed MEO backbone of a tick.
+
+        :param graph: The graph of the tick.
+        :param min_distance: Routes between satellites closer than this (pixels)
+        use the flat search. Defaults to settings.HIERARCHICAL_MIN_DISTANCE.
+
+        Hierarchical routes cost the same as the flat search: the backbone
+        tables shorten the search but do not restrict it.
+    """
+
+    def __init__(self, graph: SnapshotGraph, min_distance: float = None) -> None:
+        self.graph = graph
+        self.min_distance = settings.HIERARCHICAL_MIN_DISTANCE \
+            if min_distance is None else min_distance
+        self.backbone = MEOBackbone(graph)
+        self._is_meo = [position[2] == settings.MEO_ORBIT_HEIGHT
+                        for position in graph.positions]
+
+    def _flat_route(self, source: int, target: int) -> HierarchicalRoute:
+        """ Routes over the whole graph. """
+        distance, parent = shortest_path_tree(self.graph, source, target=target)
+        path = reconstruct_path(parent, source, target)
+        return HierarchicalRoute(
+            path=[self.graph.positions[i] for i in path],
+            cost=distance[target],
+            hierarchical=False
+        )
+
+    def route(
+            self,
+            src_node: tuple[float, float, int],
+            dst_node: tuple[float, float, int],
+            flat: bool = False
+    ) -> HierarchicalRoute:
+        """ Routes between two satellites.
+
+            :param src_node: The position of the first satellite.
+            :param dst_node: The position of the last satellite.
+            :param flat: Whether to skip the backbone and search the whole graph.
+            Defaults to False.
+            :return: A HierarchicalRoute. Its path is empty and its cost infinite
+            if the satellites are not connected.
+        """
+        graph = self.graph
+        source, target = graph.index[src_node], graph.index[dst_node]
+        if flat or source == target or self._is_meo[source] or self._is_meo[target] \
+                or dist(src_node[:-1], dst_node[:-1]) < self.min_distance:
+            return self._flat_route(source, target)
+
+        # Search from both ends, one towards the backbone and one away from it,
+        # until together they cannot improve the best route. The backbone
+        # tables only offer early routes through its satellites: the searches
+        # still pass through them, as the tables miss detours through several
+        # LEO satellites and the route must stay optimal.
+        backbone = self.backbone
+        node_cost = graph.node_cost
+        node_count = len(graph.positions)
+        distance = ([INF] * node_count, [INF] * node_count)
+        distance[0][source] = distance[1][target] = 0
+        parent = ([-1] * node_count, [-1] * node_count)
+        settled = ([False] * node_count, [False] * node_count)
+        queues = ([(0, source)], [(0, target)])
+        # The cost from every backbone entry to the target, once settled.
+        entry_costs = (np.full(len(backbone.nodes), INF), np.full(len(backbone.nodes), INF))
+        best_cost, best_route = INF, None
+
+        while True:
+            tops = [queue[0][0] if queue else INF for queue in queues]
+            side = 0 if tops[0] <= tops[1] else 1
+            if tops[0] + tops[1] >= best_cost:
+                break
+            d_u, u = heappop(queues[side])
+            if settled[side][u]:
+                continue
+            settled[side][u] = True
+
+            if self._is_meo[u]:
+                slot = backbone._slot[u]
+                entry_costs[side][slot] = d_u
+                # Join the backbone entry with every settled exit.
+                if side == 0:
+                    totals = d_u + backbone.costs[slot] + entry_costs[1]
+                else:
+                    totals = entry_costs[0] + backbone.costs[:, slot] + d_u
+                best = int(np.argmin(totals))
+                if totals[best] < best_cost:
+                    best_cost = float(totals[best])
+                    best_route = ("meo", (u, int(backbone.nodes[best])) if side == 0
+                                  else (int(backbone.nodes[best]), u))
+
+            # Forward edges pay the cost of the node entered, backward edges the
+            # cost of the node left.
+            own_distance, other_distance = distance[side], distance[1 - side]
+            for v, w_uv in graph.adjacency[u]:
+                if settled[side][v]:
+                    continue
+                candidate = d_u + w_uv + (node_cost[v] if side == 0 else node_cost[u])
+                if candidate < own_distance[v]:
+                    own_distance[v] = candidate
+                    parent[side][v] = u
+                    heappush(queues[side], (candidate, v))
+                # The searches met on the edge. The backward cost of a node
+                # excludes its own cost, the forward one includes it.
+                if candidate + other_distance[v] < best_cost:
+                    best_cost = candidate + other_distance[v]
+                    best_route = ("edge", (u, v) if side == 0 else (v, u))
+
+        if best_route is None:
+            # Not connected, the flat search builds the empty route.
+            return self._flat_route(source, target)
+
+        if best_route[0] == "edge":
+            entry, exit_node = best_route[1]
+            middle = [entry, exit_node]
+        else:
+            entry, exit_node = best_route[1]
+            middle = backbone.path(entry, exit_node)
+        path = []
+        node = entry
+        while node != -1:
+            path.append(node)
+            node = parent[0][node]
+        path.reverse()
+        path += middle[1:]
+        node = parent[1][exit_node]
+        while node != -1:
+            path.append(node)
+            node = parent[1][node]
+        return HierarchicalRoute(
+            path=[graph.positions[i] for i in path],
+            cost=best_cost,
+            hierarchical=True
+        )
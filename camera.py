@@ -0,0 +1,183 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : camera.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.Camera
+        Camera.visible_rect()
+        Camera.world_to_screen()
+        Camera.screen_to_world()
+        Camera.pan()
+        Camera.zoom_at()
+        SpatialGrid.query()
+        density_tiles()
+
+    NOTES :
+        - World coordinates are the window coordinates the simulation runs in. A
+          zoom of 1 shows the whole world, larger zooms show a smaller region.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import settings
+
+
+@dataclass
+class Camera:
+    """ A dataclass representing the region of the world shown on screen.
+
+        Attributes:
+            x (float): The world x-coordinate of the top left corner. Defaults to 0.
+            y (float): The world y-coordinate of the top left corner. Defaults to 0.
+            zoom (float): The screen pixels per world pixel. Defaults to 1.
+    """
+    x: float = 0
+    y: float = 0
+    zoom: float = 1
+
+    def visible_rect(self) -> tuple[float, float, float, float]:
+        """ Returns the region of the world shown on screen.
+
+            :return: A (x, y, width, height) tuple in world coordinates.
+        """
+        return (self.x, self.y,
+                settings.WINDOW_WIDTH / self.zoom, settings.WINDOW_HEIGHT / self.zoom)
+
+    def world_to_screen(self, point: tuple) -> tuple[float, float]:
+        """ Converts a world position into a screen position.
+
+            :param point: A 2D or 3D world position.
+            :return: The (x, y) screen position.
+        """
+        return ((point[0] - self.x) * self.zoom, (point[1] - self.y) * self.zoom)
+
+    def screen_to_world(self, point: tuple) -> tuple[float, float]:
+        """ Converts a screen position into a world position.
+
+            :param point: The (x, y) screen position.
+            :return: The (x, y) world position.
+        """
+        return (point[0] / self.zoom + self.x, point[1] / self.zoom + self.y)
+
+    def _clamp(self) -> None:
+        """ Keeps the view inside the world. """
+        self.zoom = min(max(self.zoom, 1), settings.MAX_ZOOM)
+        _, _, width, height = self.visible_rect()
+        self.x = min(max(self.x, 0), settings.WINDOW_WIDTH - width)
+        self.y = min(max(self.y, 0), settings.WINDOW_HEIGHT - height)
+
+    def pan(self, dx: float, dy: float) -> None:
+        """ Moves the view by a screen distance.
+
+            :param dx: The horizontal screen distance (pixels).
+            :param dy: The vertical screen distance (pixels).
+        """
+        self.x += dx / self.zoom
+        self.y += dy / self.zoom
+        self._clamp()
+
+    def zoom_at(self, factor: float, screen_point: tuple) -> None:
+        """ Zooms the view, keeping the world position under a screen position
+            in place.
+
+            :param factor: The zoom multiplier (above 1 zooms in).
+            :param screen_point: The (x, y) screen position to zoom around.
+        """
+        world_x, world_y = self.screen_to_world(screen_point)
+        self.zoom *= factor
+        self.zoom = min(max(self.zoom, 1), settings.MAX_ZOOM)
+        self.x = world_x - screen_point[0] / self.zoom
+        self.y = world_y - screen_point[1] / self.zoom
+        self._clamp()
+
+
+class SpatialGrid:
+    """ A uniform grid index over 2D points, rebuilt every frame in O(n log n)
+        and queried by rectangle.
+
+        :param points: An (N, 2) array of world positions.
+        :param cell_size: The size of a grid cell in world pixels.
+    """
+
+    def __init__(self, points: np.ndarray, cell_size: float) -> None:
+        self.points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.cell_size = cell_size
+        cells = np.maximum((self.points // cell_size).astype(np.int64), 0)
+        self._columns = int(cells[:, 0].max()) + 1 if len(cells) else 1
+        keys = cells[:, 1] * self._columns + cells[:, 0]
+        self._order = np.argsort(keys, kind="stable")
+        self._keys = keys[self._order]
+
+    def query(self, rect: tuple[float, float, float, float]) -> np.ndarray:
+        """ Finds the points inside a rectangle.
+
+            :param rect: A (x, y, width, height) tuple in world coordinates.
+            :return: The indices of the points inside the rectangle.
+        """
+        x, y, width, height = rect
+        if not len(self.points):
+            return np.empty(0, dtype=np.int64)
+        first_column = max(int(x // self.cell_size), 0)
+        last_column = min(int((x + width) // self.cell_size), self._columns - 1)
+        first_row = max(int(y // self.cell_size), 0)
+        last_row = int((y + height) // self.cell_size)
+        if first_column > last_column:
+            return np.empty(0, dtype=np.int64)
+
+        # Every grid row of the rectangle is one contiguous run of sorted keys.
+        rows = np.arange(first_row, last_row + 1) * self._columns
+        starts = np.searchsorted(self._keys, rows + first_column, side="left")
+        stops = np.searchsorted(self._keys, rows + last_column, side="right")
+        candidates = np.concatenate(
+            [self._order[start:stop] for start, stop in zip(starts, stops)])
+        inside = self.points[candidates]
+        keep = (inside[:, 0] >= x) & (inside[:, 0] <= x + width) & \
+            (inside[:, 1] >= y) & (inside[:, 1] <= y + height)
+        return candidates[keep]
+
+
+def density_tiles(
+        points: np.ndarray,
+        rect: tuple[float, float, float, float],
+        tile_size: float
+) -> np.ndarray:
+    """ Counts the points falling in every tile of a rectangle.
+
+        :param points: An (N, 2) array of world positions inside the rectangle.
+        :param rect: A (x, y, width, height) tuple in world coordinates.
+        :param tile_size: The size of a tile in world pixels.
+        :return: A (rows, columns) array of point counts.
+    """
+    x, y, width, height = rect
+    column_num = max(int(np.ceil(width / tile_size)), 1)
+    row_num = max(int(np.ceil(height / tile_size)), 1)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    counts, _, _ = np.histogram2d(
+        points[:, 1], points[:, 0],
+        bins=(row_num, column_num),
+        range=((y, y + row_num * tile_size), (x, x + column_num * tile_size)))
+    return counts
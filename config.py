@@ -0,0 +1,183 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : config.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.SimulationConfig
+        SimulationConfig.from_settings()
+        SimulationConfig.replace()
+        applied_settings()
+
+    NOTES :
+        - SimulationConfig holds the tunables of a single scenario. Field names
+          are the lowercase names of the matching settings.py globals.
+        - The engine takes a config instead of reading settings.py, so several
+          differently configured simulations can run in one process. Derived
+          constants (squared reaches, angular frequencies, the orbit band) are
+          computed once when the config is built.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import dataclasses
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from math import pi
+from typing import Iterator
+
+import settings
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """ An immutable dataclass holding the tunables of one simulation scenario.
+
+        Attributes:
+            window_width (int): The width of the simulated map (pixels).
+            window_height (int): The height of the simulated map (pixels).
+            fps (int): Frames (ticks) per simulated second.
+            congestion_complexity (int): How many levels of congestion there are.
+            congestion_grid_density (int): Rows of the congestion grid.
+            heat_map_refresh (int): Ticks between two congestion refreshes.
+            max_leo_satellite_count (int): How many LEO satellites are in orbit.
+            max_meo_satellite_count (int): How many MEO satellites are in orbit.
+            leo_max_reachability (float): How far LEO satellites reach.
+            meo_max_reachability (float): How far MEO satellites reach.
+            leo_leo_hop_cost (float): Multiplier cost of a LEO to LEO hop.
+            meo_meo_hop_cost (float): Multiplier cost of a MEO to MEO hop.
+            leo_meo_hop_cost (float): Multiplier cost of a LEO to MEO hop.
+            Defaults to the mean of the two other hop costs.
+            simulation_speed_multiplier (float): How fast the satellites move.
+            amplitude (float): The amplitude of the sine wave orbits.
+            leo_frequency (float): The frequency of the LEO orbits.
+            meo_frequency (float): The frequency of the MEO orbits.
+
+        Derived attributes:
+            leo_reach_squared (float): The squared LEO reachability.
+            meo_reach_squared (float): The squared MEO reachability.
+            leo_angular_frequency (float): 2 pi times the LEO orbit frequency.
+            meo_angular_frequency (float): 2 pi times the MEO orbit frequency.
+            half_height (float): Half of the window height, the centre of the
+            orbits and the cost of one congestion level.
+            band_top (float): The smallest y the orbits reach.
+            band_bottom (float): The largest y the orbits reach.
+    """
+    window_width: int = settings.WINDOW_WIDTH
+    window_height: int = settings.WINDOW_HEIGHT
+    fps: int = settings.FPS
+    congestion_complexity: int = settings.CONGESTION_COMPLEXITY
+    congestion_grid_density: int = settings.CONGESTION_GRID_DENSITY
+    heat_map_refresh: int = settings.HEAT_MAP_REFRESH
+    max_leo_satellite_count: int = settings.MAX_LEO_SATELLITE_COUNT
+    max_meo_satellite_count: int = settings.MAX_MEO_SATELLITE_COUNT
+    leo_max_reachability: float = settings.LEO_MAX_REACHABILITY
+    meo_max_reachability: float = settings.MEO_MAX_REACHABILITY
+    leo_leo_hop_cost: float = settings.LEO_LEO_HOP_COST
+    meo_meo_hop_cost: float = settings.MEO_MEO_HOP_COST
+    leo_meo_hop_cost: float = field(default=None)
+    simulation_speed_multiplier: float = settings.SIMULATION_SPEED_MULTIPLIER
+    amplitude: float = settings.AMPLITUDE
+    leo_frequency: float = settings.LEO_FREQUENCY
+    meo_frequency: float = settings.MEO_FREQUENCY
+
+    leo_reach_squared: float = field(init=False, compare=False)
+    meo_reach_squared: float = field(init=False, compare=False)
+    leo_angular_frequency: float = field(init=False, compare=False)
+    meo_angular_frequency: float = field(init=False, compare=False)
+    half_height: float = field(init=False, compare=False)
+    band_top: float = field(init=False, compare=False)
+    band_bottom: float = field(init=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Keep the LEO to MEO hop cost derived, as it is in settings.py.
+        if self.leo_meo_hop_cost is None:
+            object.__setattr__(self, "leo_meo_hop_cost",
+                               (self.leo_leo_hop_cost + self.meo_meo_hop_cost) / 2)
+        derived = {
+            "leo_reach_squared": self.leo_max_reachability ** 2,
+            "meo_reach_squared": self.meo_max_reachability ** 2,
+            "leo_angular_frequency": 2 * pi * self.leo_frequency,
+            "meo_angular_frequency": 2 * pi * self.meo_frequency,
+            "half_height": self.window_height / 2,
+            "band_top": self.window_height / 2 - self.amplitude,
+            "band_bottom": self.window_height / 2 + self.amplitude,
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_settings(cls) -> "SimulationConfig":
+        """ Returns a config holding the current values of settings.py. The
+            config is shared by every call made with the same settings, as the
+            functions taking an optional config build one per call.
+
+            :return: A SimulationConfig instance.
+        """
+        values = tuple(getattr(settings, name) for name in _SETTING_NAMES)
+        return _config_from_settings(cls, values)
+
+    def replace(self, **changes) -> "SimulationConfig":
+        """ Returns a copy of the config with some tunables changed. The LEO to
+            MEO hop cost is re-derived unless it is changed explicitly.
+
+            :param changes: The tunables to change, by field name.
+            :return: A new SimulationConfig instance.
+            :raises ValueError: If a tunable does not exist.
+        """
+        unknown = set(changes) - {f.name for f in fields(self) if f.init}
+        if unknown:
+            raise ValueError(f"unknown tunables: {', '.join(sorted(unknown))}")
+        if "leo_meo_hop_cost" not in changes and (
+                "leo_leo_hop_cost" in changes or "meo_meo_hop_cost" in changes):
+            changes["leo_meo_hop_cost"] = None
+        return dataclasses.replace(self, **changes)
+
+
+_SETTING_NAMES = tuple(f.name.upper() for f in fields(SimulationConfig) if f.init)
+
+
+@lru_cache(maxsize=16)
+def _config_from_settings(cls: type, values: tuple) -> SimulationConfig:
+    """ Builds the config of a set of settings values. """
+    return cls(**dict(zip((name.lower() for name in _SETTING_NAMES), values)))
+
+
+@contextmanager
+def applied_settings(config: SimulationConfig) -> Iterator[SimulationConfig]:
+    """ Temporarily installs a config into the settings module, for code that
+        does not take a config and reads settings.py at call time instead. Only
+        use it where a single scenario runs per process.
+
+        :param config: The config to install.
+        :return: A context manager yielding the installed config.
+    """
+    tunables = [f for f in fields(config) if f.init]
+    previous = {f.name.upper(): getattr(settings, f.name.upper()) for f in tunables}
+    try:
+        for f in tunables:
+            setattr(settings, f.name.upper(), getattr(config, f.name))
+        yield config
+    finally:
+        for name, value in previous.items():
+            setattr(settings, name, value)
@@ -0,0 +1,332 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : contraction.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        ContractionHierarchy.build()
+        ContractionHierarchy.load()
+        ContractionHierarchy.save()
+        ContractionHierarchy.query()
+        ContractionHierarchy.shortest_path()
+
+    NOTES :
+        - Preprocesses a frozen SnapshotGraph into a contraction hierarchy for
+          analytics runs that issue many queries against the same snapshot.
+        - The hierarchy is built on directed arcs weighing the edge weight plus
+          the cost of the node entered, so route costs match Algorithms.dijskra().
+        - Nodes are contracted cheapest first by edge difference, with lazy
+          priority updates. Witness searches are capped at WITNESS_SETTLE_LIMIT
+          settled nodes, which can only add unneeded shortcuts, never drop a
+          needed one.
+        - A query runs two upward searches, one from each end, which settle only
+          a small fraction of the nodes.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from heapq import heappush, heappop
+
+import numpy as np
+
+from graph import INF, SnapshotGraph
+
+# How many nodes a witness search may settle before giving up.
+WITNESS_SETTLE_LIMIT = 16
+
+
+def _witness_distances(
+        out_arcs: list[dict],
+        source: int,
+        skipped: int,
+        targets: dict[int, float]
+) -> dict[int, float]:
+    """ Runs a bounded search from source that avoids the node being
+        contracted, until every target is settled or cannot be beaten.
+    """
+    limit = max(targets.values())
+    remaining = len(targets)
+    distance = {source: 0}
+    settled = set()
+    queue = [(0, source)]
+    while queue and len(settled) < WITNESS_SETTLE_LIMIT:
+        d_u, u = heappop(queue)
+        if u in settled:
+            continue
+        if d_u > limit:
+            break
+        settled.add(u)
+        if u in targets:
+            remaining -= 1
+            if remaining == 0:
+                break
+        for v, w_uv in out_arcs[u].items():
+            if v == skipped:
+                continue
+            candidate = d_u + w_uv
+            if candidate < distance.get(v, INF):
+                distance[v] = candidate
+                heappush(queue, (candidate, v))
+    return distance
+
+
+class ContractionHierarchy:
+    """ A contraction hierarchy over the graph of a frozen tick.
+
+        Use ContractionHierarchy.build() or ContractionHierarchy.load() to
+        create one.
+
+        Attributes:
+            positions (list): The 3D position of every node, by node index.
+            index (dict): The node index of every position.
+            rank (np.ndarray): The contraction order of every node.
+            settled_nodes (int): How many nodes the last query settled.
+    """
+
+    def __init__(
+            self,
+            positions: list,
+            rank: np.ndarray,
+            tails: np.ndarray,
+            heads: np.ndarray,
+            weights: np.ndarray,
+            middles: np.ndarray
+    ) -> None:
+        self.positions = positions
+        self.index = {position: i for i, position in enumerate(positions)}
+        self.rank = rank
+        self._arcs = (tails, heads, weights, middles)
+        self._middle = dict(zip(zip(tails.tolist(), heads.tolist()), middles.tolist()))
+        # Forward searches climb outgoing arcs, backward searches climb
+        # incoming arcs, both only towards higher ranks.
+        self._up = ([[] for _ in positions], [[] for _ in positions])
+        for u, v, w_uv in zip(tails.tolist(), heads.tolist(), weights.tolist()):
+            if rank[v] > rank[u]:
+                self._up[0][u].append((v, w_uv))
+            else:
+                self._up[1][v].append((u, w_uv))
+        self.settled_nodes = 0
+
+    @classmethod
+    def build(cls, graph: SnapshotGraph) -> "ContractionHierarchy":
+        """ Contracts every node of a graph.
+
+            :param graph: The graph of the tick, e.g. from build_snapshot_graph().
+            :return: A ContractionHierarchy instance.
+        """
+        node_count = len(graph.positions)
+        out_arcs = [{} for _ in range(node_count)]
+        in_arcs = [{} for _ in range(node_count)]
+        middles = {}
+        for u, neighbours in enumerate(graph.adjacency):
+            for v, w_uv in neighbours:
+                weight = w_uv + graph.node_cost[v]
+                if weight < out_arcs[u].get(v, INF):
+                    out_arcs[u][v] = in_arcs[v][u] = weight
+                    middles[(u, v)] = -1
+        tails, heads, weights = [], [], []
+
+        def shortcuts(v: int) -> list[tuple[int, int, float]]:
+            """ Finds the shortcuts contracting v would need. """
+            needed = []
+            for u, w_uv in in_arcs[v].items():
+                # A direct arc is the most common witness, skip the search for it.
+                out_u = out_arcs[u]
+                targets = {w: w_uv + w_vw for w, w_vw in out_arcs[v].items()
+                           if w != u and out_u.get(w, INF) > w_uv + w_vw}
+                if not targets:
+                    continue
+                witness = _witness_distances(out_arcs, u, v, targets)
+                for w, via_v in targets.items():
+                    if witness.get(w, INF) > via_v:
+                        needed.append((u, w, via_v))
+            return needed
+
+        contracted_neighbours = [0] * node_count
+
+        def priority(v: int, needed: list) -> int:
+            """ The edge difference of contracting v. """
+            return len(needed) - len(in_arcs[v]) - len(out_arcs[v]) + \
+                contracted_neighbours[v]
+
+        queue = [(priority(v, shortcuts(v)), v) for v in range(node_count)]
+        queue.sort()
+        rank = np.zeros(node_count, dtype=np.int64)
+        level = 0
+        while queue:
+            _, v = heappop(queue)
+            # Lazy update: contract v only if it is still the cheapest node.
+            needed = shortcuts(v)
+            current = priority(v, needed)
+            if queue and current > queue[0][0]:
+                heappush(queue, (current, v))
+                continue
+
+            for u, w, weight in needed:
+                if weight < out_arcs[u].get(w, INF):
+                    out_arcs[u][w] = in_arcs[w][u] = weight
+                    middles[(u, w)] = v
+            # Keep the arcs of v, they lead to the nodes contracted after it.
+            for w, w_vw in out_arcs[v].items():
+                tails.append(v), heads.append(w), weights.append(w_vw)
+                del in_arcs[w][v]
+                contracted_neighbours[w] += 1
+            for u, w_uv in in_arcs[v].items():
+                tails.append(u), heads.append(v), weights.append(w_uv)
+                del out_arcs[u][v]
+                contracted_neighbours[u] += 1
+            out_arcs[v], in_arcs[v] = {}, {}
+            rank[v] = level
+            level += 1
+
+        tails = np.array(tails, dtype=np.int64)
+        heads = np.array(heads, dtype=np.int64)
+        return cls(
+            positions=list(graph.positions),
+            rank=rank,
+            tails=tails,
+            heads=heads,
+            weights=np.array(weights, dtype=float),
+            middles=np.array([middles[(u, v)] for u, v in zip(tails.tolist(), heads.tolist())],
+                             dtype=np.int64)
+        )
+
+    def save(self, path: str) -> None:
+        """ Saves the hierarchy to a NumPy '.npz' archive.
+
+            :param path: The file to write.
+        """
+        tails, heads, weights, middles = self._arcs
+        np.savez(
+            path,
+            positions=np.array(self.positions, dtype=float),
+            rank=self.rank,
+            tails=tails,
+            heads=heads,
+            weights=weights,
+            middles=middles
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "ContractionHierarchy":
+        """ Loads a hierarchy saved with save().
+
+            :param path: The file to read.
+            :return: A ContractionHierarchy instance.
+        """
+        with np.load(path) as archive:
+            # Positions are dictionary keys, restore the integer altitude.
+            positions = [(x, y, int(z)) for x, y, z in archive["positions"].tolist()]
+            return cls(
+                positions=positions,
+                rank=archive["rank"],
+                tails=archive["tails"],
+                heads=archive["heads"],
+                weights=archive["weights"],
+                middles=archive["middles"]
+            )
+
+    def _search(self, source: int, target: int) -> tuple[float, int, tuple[dict, dict]]:
+        """ Runs the two upward searches and returns the cost, the meeting node
+            and the parents of both searches.
+        """
+        distance = ({source: 0}, {target: 0})
+        parent = ({source: -1}, {target: -1})
+        settled = (set(), set())
+        queues = ([(0, source)], [(0, target)])
+        best_cost, meeting = (0, source) if source == target else (INF, -1)
+
+        while queues[0] or queues[1]:
+            side = 0 if queues[0] and (not queues[1] or queues[0][0][0] <= queues[1][0][0]) else 1
+            d_u, u = heappop(queues[side])
+            if u in settled[side]:
+                continue
+            if d_u >= best_cost:
+                # Nothing beyond this node can improve the route on this side.
+                queues[side].clear()
+                continue
+            settled[side].add(u)
+            if u in distance[1 - side] and d_u + distance[1 - side][u] < best_cost:
+                best_cost, meeting = d_u + distance[1 - side][u], u
+            for v, w_uv in self._up[side][u]:
+                candidate = d_u + w_uv
+                if candidate < distance[side].get(v, INF):
+                    distance[side][v] = candidate
+                    parent[side][v] = u
+                    heappush(queues[side], (candidate, v))
+        self.settled_nodes = len(settled[0]) + len(settled[1])
+        return best_cost, meeting, parent
+
+    def query(
+            self,
+            src_node: tuple[float, float, int],
+            dst_node: tuple[float, float, int]
+    ) -> float:
+        """ Computes the cost of the shortest route between two satellites.
+
+            :param src_node: The position of the first satellite.
+            :param dst_node: The position of the last satellite.
+            :return: The cost of the route, infinite if there is none.
+        """
+        return self._search(self.index[src_node], self.index[dst_node])[0]
+
+    def _unpack(self, u: int, v: int, path: list[int]) -> None:
+        """ Appends the nodes after u of the original arcs behind an arc. """
+        middle = self._middle[(u, v)]
+        if middle == -1:
+            path.append(v)
+        else:
+            self._unpack(u, middle, path)
+            self._unpack(middle, v, path)
+
+    def shortest_path(
+            self,
+            src_node: tuple[float, float, int],
+            dst_node: tuple[float, float, int]
+    ) -> tuple[list[tuple[float, float, int]], float]:
+        """ Computes the shortest route between two satellites.
+
+            :param src_node: The position of the first satellite.
+            :param dst_node: The position of the last satellite.
+            :return: A tuple of the positions along the route and its cost. The
+            route is empty if there is none.
+        """
+        source, target = self.index[src_node], self.index[dst_node]
+        cost, meeting, parent = self._search(source, target)
+        if cost == INF:
+            return [], INF
+
+        # Climb down from the meeting node to both ends.
+        up_path = [meeting]
+        while parent[0][up_path[-1]] != -1:
+            up_path.append(parent[0][up_path[-1]])
+        up_path.reverse()
+        down_path = [meeting]
+        while parent[1][down_path[-1]] != -1:
+            down_path.append(parent[1][down_path[-1]])
+
+        path = [source]
+        for u, v in zip(up_path, up_path[1:]):
+            self._unpack(u, v, path)
+        for u, v in zip(down_path, down_path[1:]):
+            self._unpack(u, v, path)
+        return [self.positions[i] for i in path], cost
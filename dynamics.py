@@ -0,0 +1,176 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : dynamics.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        CongestionDynamics.hotspot_centres()
+        CongestionDynamics.step()
+
+    NOTES :
+        - Evolves the levels of a CongestionBand with whole array operations:
+          every step diffuses the levels to the four neighbouring cells
+          (wrapping around in longitude), decays them towards the lowest level,
+          then adds the hotspots, the routed traffic load and some noise.
+        - The hotspots sit at CONGESTION_PEAK_HOUR local solar time, so they
+          follow the dusk terminator westwards at one map width per simulated
+          day. Program time is turned into simulated time with ORBIT_TIME_SCALE,
+          as in the orbital mechanics mode.
+        - Sources are scaled by the decay rate, so a settled hotspot or load
+          raises its cell by CONGESTION_HOTSPOT_LEVEL or CONGESTION_LOAD_GAIN
+          times the load, before diffusion spreads it out.
+        - All randomness comes from one np.random.Generator, so two engines
+          with the same seed stepped at the same program times agree.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from heatmap import CongestionBand
+from traffic import TrafficLoad, cell_load
+
+SECONDS_PER_DAY = 86400
+
+
+class CongestionDynamics:
+    """ Evolves the congestion levels of a band over time.
+
+        :param band: The band to evolve. Its levels are updated in place and
+        its cells with a level of 0 are left out.
+        :param seed: The seed of the random generator. Defaults to None.
+        :param diffusion: Defaults to None (settings.CONGESTION_DIFFUSION).
+        :param decay: Defaults to None (settings.CONGESTION_DECAY).
+        :param hotspots: Defaults to None (settings.CONGESTION_HOTSPOTS).
+        :param hotspot_level: Defaults to None (settings.CONGESTION_HOTSPOT_LEVEL).
+        :param hotspot_radius: Defaults to None (settings.CONGESTION_HOTSPOT_RADIUS).
+        :param noise: Defaults to None (settings.CONGESTION_NOISE).
+        :param load_gain: Defaults to None (settings.CONGESTION_LOAD_GAIN).
+        :param config: The simulation config. Defaults to None (settings.py).
+
+        Attributes:
+            field (np.ndarray): The unrounded levels of the band.
+    """
+
+    def __init__(
+            self,
+            band: CongestionBand,
+            seed: int = None,
+            diffusion: float = None,
+            decay: float = None,
+            hotspots: int = None,
+            hotspot_level: float = None,
+            hotspot_radius: float = None,
+            noise: float = None,
+            load_gain: float = None,
+            config: SimulationConfig = None
+    ) -> None:
+        self.band = band
+        self.config = config if config is not None else SimulationConfig.from_settings()
+        self.diffusion = settings.CONGESTION_DIFFUSION if diffusion is None else diffusion
+        self.decay = settings.CONGESTION_DECAY if decay is None else decay
+        self.hotspot_level = settings.CONGESTION_HOTSPOT_LEVEL if hotspot_level is None \
+            else hotspot_level
+        self.hotspot_radius = settings.CONGESTION_HOTSPOT_RADIUS if hotspot_radius is None \
+            else hotspot_radius
+        self.noise = settings.CONGESTION_NOISE if noise is None else noise
+        self.load_gain = settings.CONGESTION_LOAD_GAIN if load_gain is None else load_gain
+        if hotspots is None:
+            hotspots = settings.CONGESTION_HOTSPOTS
+        if not 0 <= self.diffusion <= 0.25:
+            # Above 0.25 the explicit diffusion step overshoots and oscillates.
+            raise ValueError("'diffusion' must be between 0 and 0.25")
+        if not 0 <= self.decay <= 1:
+            raise ValueError("'decay' must be between 0 and 1")
+
+        self.rng = np.random.default_rng(seed)
+        self.field = band.levels.astype(float)
+        self._present = band.levels > 0
+        self._top_level = self.config.congestion_complexity + 1
+
+        # Cell centres, in pixels.
+        self._x = (np.arange(band.column_num) + 0.5) * band.cell_size
+        y = (np.arange(len(band.levels)) + band.row_offset + 0.5) * band.cell_size
+        # Every hotspot keeps its latitude and its offset from the peak hour.
+        band_top = band.row_offset * band.cell_size
+        band_bottom = (band.row_offset + len(band.levels)) * band.cell_size
+        hotspot_y = self.rng.uniform(band_top, band_bottom, hotspots)
+        self._hotspot_offsets = self.rng.normal(0, self.hotspot_radius, hotspots)
+        self._hotspot_rows = np.exp(
+            -(y[None, :] - hotspot_y[:, None]) ** 2 / (2 * self.hotspot_radius ** 2))
+
+    def hotspot_centres(self, ticks: float) -> np.ndarray:
+        """ Returns the x position of every hotspot at a program time.
+
+            :param ticks: The program time in milliseconds.
+            :return: The x positions (pixels) of the hotspots.
+        """
+        seconds = ticks / 1000 * settings.ORBIT_TIME_SCALE
+        # The sun is over the centre of the map at noon and moves west.
+        sun_x = settings.WINDOW_WIDTH * (1 - (seconds % SECONDS_PER_DAY) / SECONDS_PER_DAY)
+        peak_x = sun_x + settings.WINDOW_WIDTH * (settings.CONGESTION_PEAK_HOUR - 12) / 24
+        return (peak_x + self._hotspot_offsets) % settings.WINDOW_WIDTH
+
+    def step(self, ticks: float, load: TrafficLoad = None) -> CongestionBand:
+        """ Advances the congestion by one step.
+
+            :param ticks: The program time in milliseconds, placing the hotspots.
+            :param load: The load routed on the last tick, added to the cells
+            its satellites are in. Defaults to None.
+            :return: The band, with its levels updated.
+        """
+        field = self.field
+        if field.size == 0:
+            return self.band
+
+        # Diffuse, the band edges reflect and the map wraps around in longitude.
+        up = np.concatenate((field[:1], field[:-1]))
+        down = np.concatenate((field[1:], field[-1:]))
+        laplacian = up + down + np.roll(field, 1, axis=1) + \
+            np.roll(field, -1, axis=1) - 4 * field
+        field = field + self.diffusion * laplacian
+
+        # Decay towards the lowest level.
+        field = 1 + (field - 1) * (1 - self.decay)
+
+        # Add the hotspots as separable gaussians, the x distance wrapping around.
+        if len(self._hotspot_offsets):
+            width = settings.WINDOW_WIDTH
+            dx = (self._x[None, :] - self.hotspot_centres(ticks)[:, None] + width / 2) \
+                % width - width / 2
+            columns = np.exp(-dx ** 2 / (2 * self.hotspot_radius ** 2))
+            field += self.decay * self.hotspot_level * (self._hotspot_rows.T @ columns)
+
+        if load is not None:
+            stop = self.band.row_offset + len(self.band.levels)
+            field += self.decay * self.load_gain * \
+                cell_load(load, self.band)[self.band.row_offset:stop]
+
+        if self.noise:
+            field += self.rng.normal(0, self.noise, field.shape)
+
+        np.clip(field, 1, self._top_level, out=field)
+        self.field = field
+        self.band.levels[...] = np.where(self._present, np.rint(field), 0)
+        return self.band
@@ -0,0 +1,236 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : export.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        FrameWriter.write()
+        FrameWriter.close()
+        export_run()
+
+    NOTES :
+        - Renders a run offscreen with SDL's dummy video driver, advancing the
+          program time by a fixed 1000 / FPS ms per frame instead of following
+          the wall clock, so exports are reproducible and run as fast as the
+          simulation allows.
+        - Frames are copied out of the screen as raw RGB bytes and handed to a
+          writer thread through a bounded queue, so encoding overlaps with the
+          rendering of the next frames. The queue bound keeps memory in check
+          when the encoder is the slower side.
+        - A path ending in a video extension is encoded by piping the raw frames
+          into ffmpeg when it is installed. Any other path, or a video path
+          without ffmpeg, receives a numbered PNG sequence.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import threading
+
+import numpy as np
+import pygame
+
+import settings
+from camera import Camera
+from entities import Congestion
+from positioning import initialize_heatmap, generate_congestion_heatmap, \
+    refresh_congestion_heatmap
+from renderer import draw_frame
+from simulation import build_constellations, default_ground_stations, run_pipeline
+from visuals import draw_background, draw_congestion, load_background
+
+VIDEO_EXTENSIONS = (".mp4", ".mkv", ".mov", ".webm", ".avi")
+
+
+class FrameWriter:
+    """ Encodes frames on a background thread.
+
+        :param path: A video file to encode to, or a directory to write a PNG
+        sequence to.
+        :param size: The (width, height) of the frames.
+        :param fps: The frame rate of the video.
+        :param queue_size: How many frames may wait for the encoder before
+        write() blocks. Defaults to 8.
+
+        Attributes:
+            path (str): The video file or PNG directory actually written to.
+            frame_count (int): How many frames were queued.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            size: tuple[int, int],
+            fps: float,
+            queue_size: int = 8
+    ) -> None:
+        self.size = size
+        self.frame_count = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._error = None
+        self._encoder = None
+
+        ffmpeg = shutil.which("ffmpeg")
+        if path.lower().endswith(VIDEO_EXTENSIONS) and ffmpeg is not None:
+            self._encoder = subprocess.Popen(
+                [ffmpeg, "-loglevel", "error", "-y",
+                 "-f", "rawvideo", "-pix_fmt", "rgb24",
+                 "-s", f"{size[0]}x{size[1]}", "-r", str(fps), "-i", "-",
+                 "-pix_fmt", "yuv420p", path],
+                stdin=subprocess.PIPE
+            )
+            self.directory = None
+            self.path = path
+        else:
+            if path.lower().endswith(VIDEO_EXTENSIONS):
+                path = os.path.splitext(path)[0]
+                print(f"warning: ffmpeg not found, writing PNG frames to '{path}'")
+            os.makedirs(path, exist_ok=True)
+            self.directory = self.path = path
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        """ Encodes the queued frames until the end marker. """
+        index = 0
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+            if self._error is not None:
+                # Keep draining so write() never blocks on a dead encoder.
+                continue
+            try:
+                if self._encoder is not None:
+                    self._encoder.stdin.write(frame)
+                else:
+                    surface = pygame.image.frombytes(frame, self.size, "RGB")
+                    pygame.image.save(surface, os.path.join(
+                        self.directory, f"frame_{index:06d}.png"))
+            except (OSError, pygame.error) as error:
+                self._error = error
+            index += 1
+
+    def write(self, surface: pygame.Surface) -> None:
+        """ Queues a copy of a frame, blocking while the queue is full.
+
+            :param surface: The frame to encode.
+            :raises OSError: If the encoder failed on an earlier frame.
+        """
+        if self._error is not None:
+            raise OSError(f"frame encoding failed: {self._error}")
+        self._queue.put(pygame.image.tobytes(surface, "RGB"))
+        self.frame_count += 1
+
+    def close(self) -> None:
+        """ Waits for the queued frames to be encoded.
+
+            :raises OSError: If the encoder failed.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self._encoder is not None:
+            self._encoder.stdin.close()
+            if self._encoder.wait() != 0 and self._error is None:
+                self._error = OSError(f"ffmpeg exited with code {self._encoder.returncode}")
+        if self._error is not None:
+            raise OSError(f"frame encoding failed: {self._error}")
+
+    def __enter__(self) -> "FrameWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def export_run(
+        path: str,
+        frame_count: int,
+        seed: int = 0,
+        fps: float = None,
+        queue_size: int = 8
+) -> tuple[str, int]:
+    """ Renders a run offscreen and encodes every frame.
+
+        :param path: A video file or a PNG sequence directory, see FrameWriter.
+        :param frame_count: How many frames to render.
+        :param seed: The seed to initialize np.random with. Defaults to 0.
+        :param fps: The simulated frame rate, which sets both the timestep and
+        the video frame rate. Defaults to settings.FPS.
+        :param queue_size: How many frames may wait for the encoder. Defaults to 8.
+        :return: The video file or PNG directory written to, and the number of
+        frames written.
+    """
+    fps = fps or settings.FPS
+    # Renders offscreen, the dummy driver must be selected before pygame
+    # opens a display. An explicit driver choice is kept.
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode(settings.RESOLUTION)
+    bg = load_background()
+    font = pygame.font.Font(None, 28)
+    camera = Camera()
+
+    leo_orbit_constellation, meo_orbit_constellation = build_constellations()
+    endpoints = default_ground_stations()
+    np.random.seed(seed)
+    congestion = Congestion()
+    initialize_heatmap(congestion)
+    generate_congestion_heatmap(congestion)
+
+    with FrameWriter(path, settings.RESOLUTION, fps, queue_size) as writer:
+        for loop_counter in range(1, frame_count + 1):
+            if loop_counter % settings.HEAT_MAP_REFRESH == 0:
+                congestion.congestion_map = refresh_congestion_heatmap(congestion)
+            pipeline = run_pipeline(
+                leo_orbit_constellation,
+                meo_orbit_constellation,
+                endpoints,
+                congestion,
+                loop_counter * 1000 / fps
+            )
+            draw_background(screen, bg, camera)
+            draw_congestion(screen, congestion, camera)
+            draw_frame(screen, camera, pipeline, endpoints,
+                       leo_orbit_constellation, meo_orbit_constellation, font, fps)
+            writer.write(screen)
+    pygame.quit()
+    return writer.path, writer.frame_count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a run to video or PNG frames.")
+    parser.add_argument("output", help="video file (e.g. run.mp4) or PNG frame directory")
+    parser.add_argument("--frames", type=int, default=600, help="frames to render")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the congestion generator")
+    parser.add_argument("--fps", type=float, help="simulated frame rate")
+    parser.add_argument("--queue", type=int, default=8,
+                        help="frames buffered between rendering and encoding")
+    args = parser.parse_args()
+    output, written = export_run(args.output, args.frames, args.seed, args.fps, args.queue)
+    print(f"{written} frames written to {output}")
@@ -0,0 +1,423 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : faults.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.FailureMask
+        @dataclass.FailureEvent
+        @dataclass.RerouteReport
+        FaultTopology.from_pipeline()
+        FaultTopology.no_failures()
+        FaultTopology.random_failures()
+        FaultTopology.regional_failure()
+        FaultTopology.cell_failure()
+        FaultTopology.route()
+        FaultTopology.evaluate()
+        FailureScript.mask()
+
+    NOTES :
+        - Usage: python faults.py [--scenarios N] [--satellite-rate R]
+          [--link-rate R] [--seed N] evaluates random failure scenarios on one
+          tick between the default ground stations.
+        - A FaultTopology holds the graph of a tick as index arrays once; a
+          failure scenario is only a pair of boolean masks over its nodes and
+          its (undirected) edges, applied to the arc arrays of every search.
+        - Routes are priced like Algorithms.dijskra() and searched with
+          scipy.sparse.csgraph when it is installed, and the heap search of
+          graph.py otherwise.
+        - The reroute latency of a report is the wall-clock time spent finding
+          the new route; its stretch is the new route cost over the cost of the
+          route without failures.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from graph import INF, build_snapshot_graph, shortest_path_tree, reconstruct_path, to_csr
+from heatmap import _grid_geometry
+from simulation import PipelineResult
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+except ImportError:
+    csr_matrix = csgraph_dijkstra = None
+
+
+@dataclass
+class FailureMask:
+    """ A dataclass marking the failed elements of a FaultTopology.
+
+        Attributes:
+            nodes (np.ndarray): An (N,) boolean array, True for failed nodes.
+            edges (np.ndarray): An (E,) boolean array, True for failed edges.
+    """
+    nodes: np.ndarray
+    edges: np.ndarray
+
+    def __or__(self, other: "FailureMask") -> "FailureMask":
+        return FailureMask(nodes=self.nodes | other.nodes, edges=self.edges | other.edges)
+
+
+@dataclass(frozen=True)
+class FailureEvent:
+    """ An immutable dataclass describing a scripted failure.
+
+        Attributes:
+            start (float): The program time (ms) the failure starts at.
+            end (float): The program time (ms) the failure is repaired at.
+            kind (str): 'satellite', 'link', 'cell' or 'region'.
+            target (tuple): The satellite index (as a 1-tuple), the two
+            satellite indices of the link, the (column, row) of the congestion
+            cell, or the (x, y, radius) of the region.
+    """
+    start: float
+    end: float
+    kind: str
+    target: tuple
+
+
+@dataclass
+class RerouteReport:
+    """ A dataclass holding the outcome of a route pair under failures.
+
+        Attributes:
+            pair (tuple): The two ground station positions.
+            baseline_cost (float): The route cost without failures.
+            cost (float): The route cost under failures, infinite if the pair
+            got disconnected.
+            baseline_hops (int): The hop count without failures.
+            hops (int): The hop count under failures, -1 if disconnected.
+            reroute_latency (float): The time spent finding the new route (s).
+            stretch (float): The cost over the baseline cost.
+            path (list): The positions of the nodes along the new route.
+    """
+    pair: tuple
+    baseline_cost: float
+    cost: float
+    baseline_hops: int
+    hops: int
+    reroute_latency: float
+    stretch: float
+    path: list
+
+
+class FaultTopology:
+    """ The graph of a tick as arrays, routed under failure masks.
+
+        :param all_satellite_positions: The positions of all satellites, whose
+        indices are the ones of scripted failures.
+        :param node_cost: A dictionary of the cost of every node.
+        :param edges: A dictionary of edges between nodes with their weights.
+        :param use_scipy: Whether to use scipy.sparse.csgraph when it is
+        installed. Defaults to True.
+        :param config: The simulation config. Defaults to None (settings.py).
+    """
+
+    def __init__(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float],
+            use_scipy: bool = True,
+            config: SimulationConfig = None
+    ) -> None:
+        self.config = config if config is not None else SimulationConfig.from_settings()
+        self.use_scipy = use_scipy and csgraph_dijkstra is not None
+        self.graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+        self.positions = np.array(self.graph.positions, dtype=float).reshape(-1, 3)
+        self.node_cost = np.array(self.graph.node_cost, dtype=float)
+        # Satellites sharing a position are the same node.
+        self.satellite_node = np.array(
+            [self.graph.index[p] for p in all_satellite_positions], dtype=np.int64)
+
+        self._indptr, self._indices, self._weights = to_csr(self.graph)
+        node_count = len(self.graph.positions)
+        self._starts = np.repeat(np.arange(node_count), np.diff(self._indptr))
+        # Both arcs of an undirected edge share its edge index.
+        low = np.minimum(self._starts, self._indices)
+        high = np.maximum(self._starts, self._indices)
+        keys, self._arc_edge = np.unique(low * node_count + high, return_inverse=True)
+        self.edge_ends = np.stack([keys // node_count, keys % node_count], axis=1)
+        self._edge_index = {(int(u), int(v)): e for e, (u, v) in enumerate(self.edge_ends)}
+        self._leo = np.nonzero(self.positions[:, 2] == settings.LEO_ORBIT_HEIGHT)[0]
+        self._baselines = {}
+
+    @classmethod
+    def from_pipeline(
+            cls,
+            result: PipelineResult,
+            use_scipy: bool = True,
+            config: SimulationConfig = None
+    ) -> "FaultTopology":
+        """ Builds the topology of a tick computed by run_pipeline().
+
+            :param result: The PipelineResult of the tick.
+            :param use_scipy: Whether to use scipy.sparse.csgraph.
+            :param config: The config the tick was computed with. Defaults to
+            None (settings.py).
+            :return: A FaultTopology instance.
+        """
+        return cls(result.leo_satellite_positions + result.meo_satellite_positions,
+                   result.node_cost, result.edges, use_scipy, config)
+
+    def no_failures(self) -> FailureMask:
+        """ Returns a mask without any failed element. """
+        return FailureMask(nodes=np.zeros(len(self.positions), dtype=bool),
+                           edges=np.zeros(len(self.edge_ends), dtype=bool))
+
+    def random_failures(
+            self,
+            rng: np.random.Generator,
+            satellite_rate: float = None,
+            link_rate: float = None
+    ) -> FailureMask:
+        """ Fails every node and every edge independently at random.
+
+            :param rng: The random generator to draw the failures from.
+            :param satellite_rate: The failure probability of a node. Defaults
+            to settings.FAULT_SATELLITE_RATE.
+            :param link_rate: The failure probability of an edge. Defaults to
+            settings.FAULT_LINK_RATE.
+            :return: A FailureMask instance.
+        """
+        if satellite_rate is None:
+            satellite_rate = settings.FAULT_SATELLITE_RATE
+        if link_rate is None:
+            link_rate = settings.FAULT_LINK_RATE
+        return FailureMask(nodes=rng.random(len(self.positions)) < satellite_rate,
+                           edges=rng.random(len(self.edge_ends)) < link_rate)
+
+    def regional_failure(self, center: tuple[float, float], radius: float) -> FailureMask:
+        """ Fails every node above a circular region of the map.
+
+            :param center: The (x, y) center of the region.
+            :param radius: The radius of the region (pixels).
+            :return: A FailureMask instance.
+        """
+        offset = self.positions[:, :2] - np.asarray(center[:2], dtype=float)
+        mask = self.no_failures()
+        mask.nodes = np.einsum("ij,ij->i", offset, offset) <= radius ** 2
+        return mask
+
+    def cell_failure(
+            self,
+            cells: list[tuple[int, int]],
+            cell_size: float = None
+    ) -> FailureMask:
+        """ Fails every node above some congestion cells.
+
+            :param cells: The (column, row) indices of the failed cells.
+            :param cell_size: The size of a cell (pixels), such as the cell_size
+            of a Congestion or CongestionBand. Defaults to the cell size
+            initialize_heatmap() gives settings.CONGESTION_GRID_DENSITY.
+            :return: A FailureMask instance.
+        """
+        if cell_size is None:
+            cell_size, _, _ = _grid_geometry(settings.CONGESTION_GRID_DENSITY)
+        node_cells = (self.positions[:, :2] // cell_size).astype(np.int64)
+        failed = np.array(cells, dtype=np.int64).reshape(-1, 2)
+        mask = self.no_failures()
+        mask.nodes = (node_cells[:, None] == failed[None]).all(axis=2).any(axis=1)
+        return mask
+
+    def _uplink(self, station: tuple, mask: FailureMask) -> int:
+        """ Finds the uplink of a ground station like
+            closest_leo_nodes_to_endpoints(), among the LEO nodes still up.
+        """
+        distance = np.linalg.norm(self.positions[self._leo] - np.asarray(station), axis=1)
+        with np.errstate(invalid="ignore"):
+            score = distance * self.node_cost[self._leo]
+        usable = (distance < self.config.leo_max_reachability) & ~mask.nodes[self._leo] & \
+            (score < INF)
+        if not usable.any():
+            return -1
+        return int(self._leo[np.argmin(np.where(usable, score, INF))])
+
+    def _search(self, sources: np.ndarray, mask: FailureMask) -> tuple[np.ndarray, np.ndarray]:
+        """ Runs masked single-source searches. """
+        if self.use_scipy:
+            weights = self._weights + self.node_cost[self._indices]
+            usable = np.isfinite(weights) & ~mask.edges[self._arc_edge] & \
+                ~mask.nodes[self._starts] & ~mask.nodes[self._indices]
+            node_count = len(self.positions)
+            matrix = csr_matrix(
+                (weights[usable], (self._starts[usable], self._indices[usable])),
+                shape=(node_count, node_count))
+            distance, parent = csgraph_dijkstra(
+                matrix, directed=True, indices=sources, return_predecessors=True)
+            parent[parent < 0] = -1
+            return np.atleast_2d(distance), np.atleast_2d(parent)
+
+        banned_nodes = set(np.nonzero(mask.nodes)[0].tolist())
+        failed = self.edge_ends[mask.edges].tolist()
+        banned_edges = {(u, v) for u, v in failed} | {(v, u) for u, v in failed}
+        trees = [shortest_path_tree(self.graph, int(source), banned_nodes=banned_nodes,
+                                    banned_edges=banned_edges) for source in sources]
+        return np.array([tree[0] for tree in trees]), \
+            np.array([tree[1] for tree in trees], dtype=np.int64)
+
+    def route(self, src: tuple, dst: tuple, mask: FailureMask) -> tuple[list[int], float]:
+        """ Routes between two ground stations around the failed elements.
+
+            :param src: The position of the source ground station.
+            :param dst: The position of the destination ground station.
+            :param mask: The failed elements.
+            :return: A tuple of the node indices of the route and its cost. A
+            disconnected pair gets an empty route and an infinite cost.
+        """
+        source, target = self._uplink(src, mask), self._uplink(dst, mask)
+        if source < 0 or target < 0:
+            return [], INF
+        distance, parent = self._search(np.array([source]), mask)
+        if distance[0, target] == INF:
+            return [], INF
+        return reconstruct_path(parent[0].tolist(), source, target), float(distance[0, target])
+
+    def evaluate(
+            self,
+            pairs: list[tuple[tuple, tuple]],
+            mask: FailureMask
+    ) -> list[RerouteReport]:
+        """ Reroutes the ground station pairs whose route a failure scenario
+            breaks. The routes without failures are computed once and kept.
+
+            :param pairs: The (source, destination) ground station positions.
+            :param mask: The failed elements.
+            :return: A RerouteReport for every affected pair.
+        """
+        reports = []
+        for pair in pairs:
+            if pair not in self._baselines:
+                self._baselines[pair] = self.route(*pair, self.no_failures())
+            baseline, baseline_cost = self._baselines[pair]
+            if baseline and not mask.nodes[baseline].any() and not any(
+                    mask.edges[self._edge_index[min(u, v), max(u, v)]]
+                    for u, v in zip(baseline, baseline[1:])) and \
+                    self._uplink(pair[0], mask) == baseline[0] and \
+                    self._uplink(pair[1], mask) == baseline[-1]:
+                continue
+
+            started = time.perf_counter()
+            path, cost = self.route(*pair, mask)
+            reroute_latency = time.perf_counter() - started
+            with np.errstate(invalid="ignore", divide="ignore"):
+                stretch = cost / baseline_cost if baseline_cost else \
+                    (1.0 if cost == baseline_cost else INF)
+            reports.append(RerouteReport(
+                pair=pair,
+                baseline_cost=baseline_cost,
+                cost=cost,
+                baseline_hops=len(baseline) + 1 if baseline else -1,
+                hops=len(path) + 1 if path else -1,
+                reroute_latency=reroute_latency,
+                stretch=stretch,
+                path=[self.graph.positions[i] for i in path]
+            ))
+        return reports
+
+
+class FailureScript:
+    """ Failures scripted by program time.
+
+        :param events: The FailureEvent instances of the script.
+    """
+
+    def __init__(self, events: list[FailureEvent]) -> None:
+        self.events = list(events)
+
+    def mask(self, topology: FaultTopology, ticks: float) -> FailureMask:
+        """ Builds the mask of the failures active at a point in time.
+
+            :param topology: The topology of the tick.
+            :param ticks: The program time (ms).
+            :return: A FailureMask instance.
+            :raises ValueError: If an event has an unknown kind.
+        """
+        mask = topology.no_failures()
+        for event in self.events:
+            if not event.start <= ticks < event.end:
+                continue
+            if event.kind == "satellite":
+                mask.nodes[topology.satellite_node[event.target[0]]] = True
+            elif event.kind == "link":
+                u, v = topology.satellite_node[list(event.target)].tolist()
+                edge = topology._edge_index.get((min(u, v), max(u, v)))
+                if edge is not None:
+                    mask.edges[edge] = True
+            elif event.kind == "cell":
+                mask = mask | topology.cell_failure([event.target])
+            elif event.kind == "region":
+                mask = mask | topology.regional_failure(event.target[:2], event.target[2])
+            else:
+                raise ValueError(f"unknown failure kind '{event.kind}'")
+        return mask
+
+
+if __name__ == "__main__":
+    from entities import Congestion
+    from positioning import initialize_heatmap, generate_congestion_heatmap, get_3D_position
+    from simulation import build_constellations, default_ground_stations, run_pipeline
+
+    parser = argparse.ArgumentParser(description="Evaluate random failure scenarios.")
+    parser.add_argument("--scenarios", type=int, default=1000, help="scenarios to evaluate")
+    parser.add_argument("--satellite-rate", type=float, help="failure rate of satellites")
+    parser.add_argument("--link-rate", type=float, help="failure rate of links")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the congestion generator and the failures")
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    congestion = Congestion()
+    initialize_heatmap(congestion)
+    generate_congestion_heatmap(congestion)
+    leo_orbit_constellation, meo_orbit_constellation = build_constellations()
+    endpoints = [get_3D_position(g) for g in default_ground_stations()]
+    topology = FaultTopology.from_pipeline(run_pipeline(
+        leo_orbit_constellation, meo_orbit_constellation,
+        default_ground_stations(), congestion, 1000))
+
+    rng = np.random.default_rng(args.seed)
+    pairs = [(endpoints[0], endpoints[-1])]
+    reports = []
+    started = time.perf_counter()
+    for _ in range(args.scenarios):
+        reports += topology.evaluate(
+            pairs, topology.random_failures(rng, args.satellite_rate, args.link_rate))
+    elapsed = time.perf_counter() - started
+
+    stretches = [r.stretch for r in reports if r.stretch < INF]
+    print(f"{args.scenarios} scenarios in {elapsed:.2f} s "
+          f"({args.scenarios / elapsed * 3600:.0f} per hour)")
+    print(f"{len(reports)} rerouted pairs, {len(reports) - len(stretches)} disconnected")
+    if stretches:
+        print(f"stretch: mean {np.mean(stretches):.3f}, max {np.max(stretches):.3f}")
+        print(f"reroute latency: mean "
+              f"{np.mean([r.reroute_latency for r in reports]) * 1000:.2f} ms")
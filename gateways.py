@@ -0,0 +1,249 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : gateways.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        GatewayMatrix.compute()
+        GatewayMatrix.refresh()
+        GatewayMatrix.export()
+
+    NOTES :
+        - Computes the cost and hop count between every pair of gateway ground
+          stations with one single-source search per distinct uplink satellite,
+          using scipy.sparse.csgraph when it is installed and the heap search of
+          graph.py otherwise.
+        - Hops are counted as in main.py: the satellites of the route plus one.
+        - refresh() re-prices the same topology after a congestion change and
+          only searches again from the uplinks whose results can have changed:
+          a cost increase matters only on a node used by one of the source's
+          gateway routes, a decrease only if it improves the node's own label.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import numpy as np
+
+from entities import GroundStation
+from graph import INF, build_snapshot_graph, shortest_path_tree, to_csr
+from positioning import get_3D_position, closest_leo_nodes_to_endpoints
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+except ImportError:
+    csr_matrix = csgraph_dijkstra = None
+
+
+class GatewayMatrix:
+    """ The gateway x gateway cost and hop matrices of a tick.
+
+        :param gateways: The gateway ground stations, in matrix order.
+        :param use_scipy: Whether to use scipy.sparse.csgraph when it is
+        installed. Defaults to True.
+
+        Attributes:
+            costs (np.ndarray): A (G, G) array of route costs, infinite when
+            unreachable.
+            hops (np.ndarray): A (G, G) array of hop counts, -1 when unreachable.
+    """
+
+    def __init__(self, gateways: list[GroundStation], use_scipy: bool = True) -> None:
+        self.gateways = gateways
+        self.use_scipy = use_scipy and csgraph_dijkstra is not None
+        self.costs = np.full((len(gateways), len(gateways)), INF)
+        self.hops = np.full((len(gateways), len(gateways)), -1, dtype=np.int64)
+        self._graph = None
+
+    def compute(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            leo_satellite_positions: list[tuple[float, float, int]],
+            node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float]
+    ) -> np.ndarray:
+        """ Computes the full matrices for the graph of a tick.
+
+            :param all_satellite_positions: The positions of all satellites.
+            :param leo_satellite_positions: The positions of the LEO satellites,
+            used as uplinks.
+            :param node_cost: A dictionary of the cost of every node.
+            :param edges: A dictionary of edges between nodes with their weights.
+            :return: The (G, G) cost matrix.
+        """
+        self._graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+        self._leo_satellite_positions = leo_satellite_positions
+        self._indptr, self._indices, self._weights = to_csr(self._graph)
+        self._node_cost = np.array(self._graph.node_cost)
+        self._set_uplinks(node_cost)
+
+        node_count = len(self._graph.positions)
+        self._distance = np.full((len(self._sources), node_count), INF)
+        self._parent = np.full((len(self._sources), node_count), -1, dtype=np.int64)
+        self._used = np.zeros((len(self._sources), node_count), dtype=bool)
+        self._exact = np.ones(len(self._sources), dtype=bool)
+        self._search(np.arange(len(self._sources)))
+        return self.costs
+
+    def _set_uplinks(self, node_cost: dict[tuple, float]) -> None:
+        """ Finds the uplink of every gateway and the distinct search sources. """
+        uplinks = closest_leo_nodes_to_endpoints(
+            leo_satellite_positions=self._leo_satellite_positions,
+            ground_station_positions=[get_3D_position(g) for g in self.gateways],
+            node_cost=node_cost
+        )
+        self._uplinks = np.array([self._graph.index[node] for node, _ in uplinks],
+                                 dtype=np.int64)
+        self._sources, self._gateway_source = np.unique(
+            self._uplinks, return_inverse=True)
+
+    def _search(self, rows: np.ndarray) -> None:
+        """ Runs the single-source searches of some sources and updates the
+            matrix rows of their gateways.
+        """
+        if len(rows) == 0:
+            return
+        sources = self._sources[rows]
+        if self.use_scipy:
+            node_count = len(self._graph.positions)
+            # Fold the cost of the entered node into every directed edge.
+            weights = self._weights + self._node_cost[self._indices]
+            starts = np.repeat(np.arange(node_count), np.diff(self._indptr))
+            usable = np.isfinite(weights)
+            matrix = csr_matrix(
+                (weights[usable], (starts[usable], self._indices[usable])),
+                shape=(node_count, node_count))
+            distance, parent = csgraph_dijkstra(
+                matrix, directed=True, indices=sources, return_predecessors=True)
+            parent[parent < 0] = -1
+        else:
+            self._graph.node_cost = self._node_cost.tolist()
+            trees = [shortest_path_tree(self._graph, int(source)) for source in sources]
+            distance = np.array([tree[0] for tree in trees])
+            parent = np.array([tree[1] for tree in trees], dtype=np.int64)
+
+        self._distance[rows] = distance
+        self._parent[rows] = parent
+        self._exact[rows] = True
+        self._fill(rows)
+
+    def _fill(self, rows: np.ndarray) -> None:
+        """ Walks the routes of some sources to the current uplinks, marking the
+            nodes they depend on, and writes the matrix rows of their gateways.
+        """
+        self._used[rows] = False
+        for row in rows:
+            row_parent = self._parent[row]
+            source = self._sources[row]
+            row_hops = np.full(len(self._uplinks), -1, dtype=np.int64)
+            for j, target in enumerate(self._uplinks):
+                # Walk the route back to mark the nodes it depends on.
+                hops = -1
+                if self._distance[row, target] != INF:
+                    node = target
+                    hops = 2
+                    while node != source:
+                        self._used[row, node] = True
+                        node = row_parent[node]
+                        hops += 1
+                    self._used[row, source] = True
+                row_hops[j] = hops
+            for i in np.nonzero(self._gateway_source == row)[0]:
+                self.costs[i] = self._distance[row, self._uplinks]
+                self.hops[i] = row_hops
+
+    def refresh(self, node_cost: dict[tuple, float]) -> int:
+        """ Re-prices the matrices after the node costs changed on the same
+            topology, such as after a congestion refresh.
+
+            :param node_cost: The new cost of every node.
+            :return: How many single-source searches were run again.
+            :raises RuntimeError: If compute() was never called.
+        """
+        if self._graph is None:
+            raise RuntimeError("compute() must be called before refresh()")
+
+        new_cost = np.array([node_cost.get(p, INF) for p in self._graph.positions])
+        previous_sources = self._sources
+        previous_uplinks = self._uplinks
+        self._set_uplinks(node_cost)
+        if not np.array_equal(previous_sources, self._sources):
+            # The gateways moved to other uplinks, start over.
+            self._node_cost = new_cost
+            node_count = len(self._graph.positions)
+            self._distance = np.full((len(self._sources), node_count), INF)
+            self._parent = np.full((len(self._sources), node_count), -1, dtype=np.int64)
+            self._used = np.zeros((len(self._sources), node_count), dtype=bool)
+            self._exact = np.ones(len(self._sources), dtype=bool)
+            self._search(np.arange(len(self._sources)))
+            return len(self._sources)
+
+        with np.errstate(invalid="ignore"):
+            increased = np.nonzero(new_cost > self._node_cost)[0]
+            decreased = np.nonzero(new_cost < self._node_cost)[0]
+        affected = np.zeros(len(self._sources), dtype=bool)
+
+        if not np.array_equal(previous_uplinks, self._uplinks):
+            # A gateway moved to another of the same uplinks, every row gets a
+            # new column. Rows with stale labels cannot be read, search again.
+            affected |= ~self._exact
+            self._fill(np.nonzero(~affected)[0])
+
+        if len(decreased):
+            # Rows with stale labels cannot evaluate a decrease, search again.
+            affected |= ~self._exact
+            for v in decreased:
+                neighbours = slice(self._indptr[v], self._indptr[v + 1])
+                best = (self._distance[:, self._indices[neighbours]] +
+                        self._weights[neighbours]).min(axis=1, initial=INF) + new_cost[v]
+                affected |= best < self._distance[:, v]
+
+        if len(increased):
+            on_route = self._used[:, increased].any(axis=1)
+            affected |= on_route
+            # Off-route increases leave the gateway costs intact, but the labels
+            # of the nodes behind them are no longer exact.
+            reached = np.isfinite(self._distance[:, increased]).any(axis=1)
+            self._exact &= ~(reached & ~affected)
+
+        self._node_cost = new_cost
+        rows = np.nonzero(affected)[0]
+        self._search(rows)
+        return len(rows)
+
+    def export(self, path: str) -> None:
+        """ Exports the matrices. A '.csv' path gets the cost matrix as text,
+            any other path a NumPy '.npz' archive holding the cost matrix, the
+            hop matrix and the gateway positions.
+
+            :param path: The file to write.
+        """
+        if path.endswith(".csv"):
+            np.savetxt(path, self.costs, delimiter=",")
+        else:
+            np.savez(
+                path,
+                costs=self.costs,
+                hops=self.hops,
+                gateways=np.array([get_3D_position(g) for g in self.gateways],
+                                  dtype=float)
+            )
@@ -0,0 +1,212 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : graph.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.SnapshotGraph
+        build_snapshot_graph()
+        shortest_path_tree()
+        reconstruct_path()
+        path_cost()
+        to_csr()
+
+    NOTES :
+        - A SnapshotGraph is the graph of a single tick with its nodes replaced
+          by integer indices, so searches run on lists instead of position keyed
+          dictionaries.
+        - Costs follow Algorithms.dijskra(): moving from u to v costs the edge
+          weight plus the cost of v. The cost of the source node is never paid.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+from heapq import heappush, heappop
+
+import numpy as np
+
+INF = float("inf")
+
+
+@dataclass
+class SnapshotGraph:
+    """ A dataclass representing the routing graph of a single tick.
+
+        Attributes:
+            positions (list): The 3D position of every node, by node index.
+            index (dict): The node index of every position.
+            adjacency (list): For every node, a list of (neighbour, weight) pairs.
+            node_cost (list): The cost of entering every node.
+    """
+    positions: list
+    index: dict
+    adjacency: list
+    node_cost: list
+
+
+def build_snapshot_graph(
+        all_satellite_positions: list[tuple[float, float, int]],
+        edges: dict[tuple[tuple, tuple], float],
+        node_cost: dict[tuple, float]
+) -> SnapshotGraph:
+    """ Builds the indexed graph of a tick from the outputs of
+        get_edges_between_nodes() and get_node_costs().
+
+        :param all_satellite_positions: A list of tuples representing the
+        positions of all satellites.
+        :param edges: A dictionary of edges between nodes with their weights.
+        :param node_cost: A dictionary of the cost of every node.
+        :return: A SnapshotGraph instance.
+    """
+    index = {}
+    positions = []
+    for position in all_satellite_positions:
+        # Satellites sharing a position are the same node, as in dijskra().
+        if position not in index:
+            index[position] = len(positions)
+            positions.append(position)
+
+    adjacency = [[] for _ in positions]
+    for (u, v), w_uv in edges.items():
+        adjacency[index[u]].append((index[v], w_uv))
+        adjacency[index[v]].append((index[u], w_uv))
+
+    return SnapshotGraph(
+        positions=positions,
+        index=index,
+        adjacency=adjacency,
+        node_cost=[node_cost.get(position, INF) for position in positions]
+    )
+
+
+def shortest_path_tree(
+        graph: SnapshotGraph,
+        source: int,
+        target: int = None,
+        reverse: bool = False,
+        banned_nodes: set = None,
+        banned_edges: set = None,
+        heuristic: list = None
+) -> tuple[list[float], list[int]]:
+    """ Runs a heap based Dijkstra (or A* when a heuristic is given) search.
+
+        :param graph: The graph to search.
+        :param source: The node index to start from.
+        :param target: A node index to stop at once it is settled. Defaults to
+        None, in which case the whole tree is built.
+        :param reverse: Whether to compute costs towards the source instead of
+        from it, i.e. the cost of entering a node is paid when leaving it.
+        Defaults to False.
+        :param banned_nodes: Node indices the search may not visit.
+        :param banned_edges: (u, v) node index pairs the search may not use.
+        Only the given direction is banned.
+        :param heuristic: A lower bound of the remaining cost to the target for
+        every node, such as the distances of a reverse tree. Defaults to None.
+        :return: A tuple holding the distance and the parent of every node. A
+        node that was not reached has an infinite distance and a parent of -1.
+    """
+    node_cost = graph.node_cost
+    adjacency = graph.adjacency
+    distance = [INF] * len(adjacency)
+    parent = [-1] * len(adjacency)
+    settled = [False] * len(adjacency)
+    banned_nodes = banned_nodes or ()
+    banned_edges = banned_edges or ()
+
+    distance[source] = 0
+    queue = [(heuristic[source] if heuristic else 0, source)]
+    while queue:
+        _, u = heappop(queue)
+        if settled[u]:
+            continue
+        settled[u] = True
+        if u == target:
+            break
+        # In a reverse search the cost of u is paid when it is left.
+        leave_cost = node_cost[u] if reverse else 0
+        for v, w_uv in adjacency[u]:
+            if settled[v] or v in banned_nodes or (u, v) in banned_edges:
+                continue
+            candidate = distance[u] + w_uv + (leave_cost if reverse else node_cost[v])
+            if candidate < distance[v]:
+                distance[v] = candidate
+                parent[v] = u
+                if heuristic:
+                    if heuristic[v] == INF:
+                        continue
+                    heappush(queue, (candidate + heuristic[v], v))
+                else:
+                    heappush(queue, (candidate, v))
+    return distance, parent
+
+
+def reconstruct_path(parent: list[int], source: int, target: int) -> list[int]:
+    """ Follows the parents of a shortest path tree from the target back to
+        the source.
+
+        :param parent: The parents returned by shortest_path_tree().
+        :param source: The source node index of the tree.
+        :param target: The node index to build the path to.
+        :return: The node indices from source to target, or an empty list if
+        the target was not reached.
+    """
+    path = [target]
+    while path[-1] != source:
+        if parent[path[-1]] == -1:
+            return []
+        path.append(parent[path[-1]])
+    path.reverse()
+    return path
+
+
+def path_cost(graph: SnapshotGraph, path: list[int]) -> float:
+    """ Computes the cost of a path of node indices.
+
+        :param graph: The graph the path belongs to.
+        :param path: The node indices of the path.
+        :return: The cost of the path, infinite if a hop is not an edge.
+    """
+    cost = 0
+    for u, v in zip(path, path[1:]):
+        weight = next((w_uv for n, w_uv in graph.adjacency[u] if n == v), INF)
+        cost += weight + graph.node_cost[v]
+    return cost
+
+
+def to_csr(graph: SnapshotGraph) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Converts the adjacency lists of a graph into compressed sparse row
+        arrays, for vectorized code and scipy.sparse.csgraph.
+
+        :param graph: The graph to convert.
+        :return: A tuple of the row pointers, the neighbour indices and the edge
+        weights (without node costs) of every node.
+    """
+    degrees = np.fromiter((len(neighbours) for neighbours in graph.adjacency),
+                          dtype=np.int64, count=len(graph.adjacency))
+    indptr = np.zeros(len(degrees) + 1, dtype=np.int64)
+    np.cumsum(degrees, out=indptr[1:])
+    indices = np.fromiter((v for neighbours in graph.adjacency for v, _ in neighbours),
+                          dtype=np.int64, count=int(indptr[-1]))
+    weights = np.fromiter((w_uv for neighbours in graph.adjacency for _, w_uv in neighbours),
+                          dtype=float, count=int(indptr[-1]))
+    return indptr, indices, weights
@@ -0,0 +1,209 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : handover.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.HandoverStats
+        HandoverManager.keep()
+        HandoverManager.adopt()
+
+    NOTES :
+        - Keeps the uplinks and the route of the previous tick while they stay
+          valid, instead of letting every tick pick new ones and the route flap
+          with the congestion noise. Satellites are tracked by their index in
+          the constellation lists, as their positions change every tick.
+        - A kept route is dropped when a link is lost (an uplink out of reach,
+          two satellites of the route no longer linked or a node with an
+          infinite cost) or when its cost grows beyond HANDOVER_COST_MARGIN of
+          its cost when it was adopted.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+from math import dist
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from orbits import OrbitalModel
+from visibility import map_to_ecef, elevation_mask
+
+
+@dataclass
+class HandoverStats:
+    """ A dataclass counting the route changes of a HandoverManager.
+
+        Attributes:
+            ticks (int): The ticks routed so far.
+            recomputations (int): The ticks a new route had to be searched.
+            link_losses (int): The recomputations caused by a lost link.
+            degradations (int): The recomputations caused by a cost increase.
+            handovers (int): The uplink changes, over all ground stations.
+            reroutes (int): The recomputations that changed the route.
+    """
+    ticks: int = 0
+    recomputations: int = 0
+    link_losses: int = 0
+    degradations: int = 0
+    handovers: int = 0
+    reroutes: int = 0
+
+
+class HandoverManager:
+    """ Keeps the uplinks and the route between ticks, with hysteresis.
+
+        :param margin: The relative cost increase a kept route may take before
+        it is searched again. Defaults to None, in which case
+        settings.HANDOVER_COST_MARGIN is used.
+    """
+
+    def __init__(self, margin: float = None) -> None:
+        self.margin = settings.HANDOVER_COST_MARGIN if margin is None else margin
+        self.stats = HandoverStats()
+        self._uplinks = None
+        self._path = None
+        self._cost = None
+
+    def keep(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            endpoint_positions: list[tuple[float, float, int]],
+            node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float],
+            orbits: OrbitalModel = None,
+            config: SimulationConfig = None
+    ) -> tuple[list[tuple[tuple, tuple]], list[tuple], float] | None:
+        """ Moves the current uplinks and route to the satellites' new
+            positions, and keeps them if they are still valid and cheap enough.
+
+            :param all_satellite_positions: The positions of all satellites on
+            this tick, in the order the route was adopted with.
+            :param endpoint_positions: The positions of the ground stations.
+            :param node_cost: A dictionary of the cost of every node.
+            :param edges: A dictionary of edges between nodes with their weights.
+            :param orbits: The orbital model the satellites fly on, whose
+            elevation mask decides if an uplink is still in view. Defaults to
+            None, in which case the uplink must stay within LEO_MAX_REACHABILITY.
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: The uplinks, the route and its cost, or None if a new route
+            must be searched, in which case adopt() is expected next.
+        """
+        self.stats.ticks += 1
+        if self._path is None or len(self._uplinks) != len(endpoint_positions):
+            self.stats.recomputations += 1
+            return None
+
+        uplinks = [all_satellite_positions[i] for i in self._uplinks]
+        path = [all_satellite_positions[i] for i in self._path]
+        if not self._uplinks_visible(uplinks, endpoint_positions, orbits, config):
+            cost = None
+        else:
+            cost = self._route_cost(path, node_cost, edges)
+        if cost is None:
+            self.stats.recomputations += 1
+            self.stats.link_losses += 1
+            return None
+        if cost > self._cost * (1 + self.margin):
+            self.stats.recomputations += 1
+            self.stats.degradations += 1
+            return None
+        return list(zip(uplinks, endpoint_positions)), path, cost
+
+    def adopt(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            leo_nodes_endpoints_link: list[tuple[tuple, tuple]],
+            shortest_path: list[tuple],
+            path_distance: float,
+            edges: dict[tuple[tuple, tuple], float]
+    ) -> None:
+        """ Makes a newly searched route the current one and counts the
+            handovers it causes. Unreachable routes are not kept.
+
+            :param all_satellite_positions: The positions of all satellites.
+            :param leo_nodes_endpoints_link: The uplink of every ground station.
+            :param shortest_path: The positions of the nodes along the route.
+            :param path_distance: The total cost of the route.
+            :param edges: A dictionary of edges between nodes with their weights.
+        """
+        # Satellites sharing a position are the same node, keep the first one.
+        index = {}
+        for i, position in enumerate(all_satellite_positions):
+            index.setdefault(position, i)
+        uplinks = [index[node] for node, _ in leo_nodes_endpoints_link]
+        path = [index[node] for node in shortest_path]
+
+        if self._uplinks is not None and len(self._uplinks) == len(uplinks):
+            self.stats.handovers += sum(
+                old != new for old, new in zip(self._uplinks, uplinks))
+        if self._path is not None and self._path != path:
+            self.stats.reroutes += 1
+
+        reachable = all(_edge_weight(edges, u, v) is not None
+                        for u, v in zip(shortest_path, shortest_path[1:]))
+        self._uplinks = uplinks
+        self._path = path if reachable else None
+        self._cost = path_distance
+
+    def _uplinks_visible(
+            self,
+            uplinks: list[tuple],
+            endpoint_positions: list[tuple],
+            orbits: OrbitalModel = None,
+            config: SimulationConfig = None
+    ) -> bool:
+        """ Checks that every ground station still sees its uplink. """
+        if orbits is None:
+            if config is None:
+                config = SimulationConfig.from_settings()
+            return all(dist(endpoint, node) < config.leo_max_reachability
+                       for node, endpoint in zip(uplinks, endpoint_positions))
+        stations = map_to_ecef([p[0] for p in endpoint_positions],
+                               [p[1] for p in endpoint_positions]).reshape(-1, 3)
+        satellites = orbits.ecef[self._uplinks]
+        return bool(np.diagonal(elevation_mask(stations, satellites)).all())
+
+    @staticmethod
+    def _route_cost(
+            path: list[tuple],
+            node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float]
+    ) -> float | None:
+        """ Prices a route like Algorithms.dijskra(), or returns None if one of
+            its links or nodes is no longer usable.
+        """
+        cost = 0
+        for u, v in zip(path, path[1:]):
+            weight = _edge_weight(edges, u, v)
+            if weight is None or not node_cost.get(v, np.inf) < np.inf:
+                return None
+            cost += weight + node_cost[v]
+        return cost
+
+
+def _edge_weight(edges: dict[tuple[tuple, tuple], float], u: tuple, v: tuple) -> float | None:
+    """ Looks an undirected edge up in both directions. """
+    weight = edges.get((u, v))
+    return edges.get((v, u)) if weight is None else weight
@@ -0,0 +1,348 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : heatmap.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        CongestionBand.from_congestion()
+        CongestionBand.from_grid()
+        CongestionBand.generate()
+        CongestionBand.refresh()
+        CongestionBand.to_grid()
+        CongestionBand.to_congestion()
+        CongestionBand.node_costs()
+        CongestionBand.coarsen()
+        CongestionBand.pyramid()
+
+    NOTES :
+        - Satellites only fly between WINDOW_HEIGHT / 2 - AMPLITUDE and
+          WINDOW_HEIGHT / 2 + AMPLITUDE, so only the grid rows of that band are
+          stored, as one dense uint8 array and the grid row it starts at. A
+          level of 0 marks a cell that is not part of the heatmap.
+        - Lookups resolve positions on cell borders to the same cell as the
+          rectangle keyed map of generate_congestion_heatmap(), whose cells are
+          inserted column by column.
+        - Coarser levels of the pyramid keep the highest level of the cells they
+          merge, so a coarse lookup never underprices a node.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from entities import Congestion
+
+
+def _grid_geometry(grid_density: int) -> tuple[float, int, int]:
+    """ Returns the cell size, column and row numbers of a grid density, as
+        computed by initialize_heatmap().
+    """
+    aspect_ratio = settings.WINDOW_WIDTH / settings.WINDOW_HEIGHT
+    cell_size = settings.WINDOW_WIDTH / aspect_ratio / grid_density
+    return (cell_size, int(settings.WINDOW_WIDTH / cell_size),
+            int(settings.WINDOW_HEIGHT / cell_size))
+
+
+def _band_rows(row_num: int, cell_size: float, config: SimulationConfig) -> tuple[int, int]:
+    """ Returns the first grid row of the orbit band and the row after its
+        last, with the row test of generate_congestion_heatmap().
+    """
+    rows = [row for row in range(row_num) if not (
+        row * cell_size < config.band_top or row * cell_size >= config.band_bottom)]
+    if not rows:
+        return 0, 0
+    return rows[0], rows[-1] + 1
+
+
+def _random_integers(rng, high: int, size: int = None) -> np.ndarray:
+    """ Draws integers in [0, high) from np.random or a np.random.Generator. """
+    return np.floor(rng.random(size) * high).astype(np.int64)
+
+
+def _random_levels(rng, count: int, cell_count: int, config: SimulationConfig) -> np.ndarray:
+    """ Draws congestion levels distributed as in generate_congestion_heatmap(),
+        where a level is one exponential sample divided by the largest of
+        cell_count samples. The largest of the other samples is drawn directly
+        through the inverse of its distribution.
+    """
+    first = rng.exponential(1.0, count)
+    if cell_count > 1:
+        others = -np.log1p(-rng.random(count) ** (1 / (cell_count - 1)))
+    else:
+        others = np.zeros(count)
+    return np.round(first / np.maximum(first, others) * config.congestion_complexity + 1)
+
+
+class CongestionBand:
+    """ The congestion levels of the grid rows the satellites fly over.
+
+        :param levels: A (band rows, column_num) uint8 array of congestion
+        levels, 0 where a cell is not part of the heatmap.
+        :param row_offset: The grid row of the first band row.
+        :param row_num: The number of rows of the whole grid.
+        :param column_num: The number of columns of the grid.
+        :param cell_size: The pixel size of the cells.
+
+        Attributes:
+            levels (np.ndarray): The congestion levels of the band, updated in place.
+            row_offset (int): The grid row of the first band row.
+    """
+
+    def __init__(
+            self,
+            levels: np.ndarray,
+            row_offset: int,
+            row_num: int,
+            column_num: int,
+            cell_size: float
+    ) -> None:
+        self.levels = levels
+        self.row_offset = row_offset
+        self.row_num = row_num
+        self.column_num = column_num
+        self.cell_size = cell_size
+
+    @classmethod
+    def from_congestion(
+            cls,
+            congestion: Congestion,
+            config: SimulationConfig = None
+    ) -> "CongestionBand":
+        """ Copies a rectangle keyed congestion heatmap.
+
+            :param congestion: An initialized instance of the Congestion class.
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: The CongestionBand of the heatmap.
+            :raises ValueError: If a cell of the map lies outside of the band.
+        """
+        if config is None:
+            config = SimulationConfig.from_settings()
+        first, stop = _band_rows(congestion.row_num, congestion.cell_size, config)
+        levels = np.zeros((stop - first, congestion.column_num), dtype=np.uint8)
+        for (cell_top_left_points, _), congestion_level in congestion.congestion_map.items():
+            row = int(round(cell_top_left_points[1] / congestion.cell_size))
+            col = int(round(cell_top_left_points[0] / congestion.cell_size))
+            if not first <= row < stop:
+                raise ValueError(f"cell at row {row} lies outside of the orbit band")
+            levels[row - first, col] = congestion_level
+        return cls(levels, first, congestion.row_num, congestion.column_num,
+                   congestion.cell_size)
+
+    @classmethod
+    def from_grid(
+            cls,
+            grid: np.ndarray,
+            cell_size: float = None,
+            config: SimulationConfig = None
+    ) -> "CongestionBand":
+        """ Wraps the band rows of a dense grid spanning the window, such as a
+            slice of a CongestionTrace, without copying them.
+
+            :param grid: A (row_num, column_num) uint8 array of congestion levels.
+            :param cell_size: The pixel size of the cells. Defaults to None, in
+            which case it is derived from the number of rows.
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: A CongestionBand sharing the memory of the grid.
+        """
+        if config is None:
+            config = SimulationConfig.from_settings()
+        row_num, column_num = grid.shape
+        if cell_size is None:
+            cell_size = _grid_geometry(row_num)[0]
+        first, stop = _band_rows(row_num, cell_size, config)
+        return cls(np.asarray(grid, dtype=np.uint8)[first:stop], first, row_num,
+                   column_num, cell_size)
+
+    @classmethod
+    def generate(
+            cls,
+            grid_density: int = None,
+            config: SimulationConfig = None,
+            rng=None
+    ) -> "CongestionBand":
+        """ Assigns a random congestion level to every cell of the band, like
+            generate_congestion_heatmap() without building the map cell by cell.
+
+            :param grid_density: The number of grid rows. Defaults to None
+            (settings.CONGESTION_GRID_DENSITY).
+            :param config: The simulation config. Defaults to None (settings.py).
+            :param rng: A np.random.Generator. Defaults to None, in which case
+            the global np.random state is used.
+            :return: The generated CongestionBand.
+            :raises TypeError: If grid_density is not an integer above 0.
+        """
+        if config is None:
+            config = SimulationConfig.from_settings()
+        if rng is None:
+            rng = np.random
+        if grid_density is None:
+            grid_density = settings.CONGESTION_GRID_DENSITY
+        if not isinstance(grid_density, int):
+            raise TypeError("'density' must be an integer")
+        if grid_density <= 0:
+            raise TypeError("'density' must be above 0")
+
+        cell_size, column_num, row_num = _grid_geometry(grid_density)
+        first, stop = _band_rows(row_num, cell_size, config)
+        levels = _random_levels(rng, (stop - first) * column_num,
+                                column_num * row_num, config)
+        return cls(levels.astype(np.uint8).reshape(stop - first, column_num),
+                   first, row_num, column_num, cell_size)
+
+    def refresh(self, config: SimulationConfig = None, rng=None) -> np.ndarray:
+        """ Randomly changes the congestion levels of up to 2% of all cells,
+            like refresh_congestion_heatmap().
+
+            :param config: The simulation config. Defaults to None (settings.py).
+            :param rng: A np.random.Generator. Defaults to None, in which case
+            the global np.random state is used.
+            :return: The updated levels of the band.
+        """
+        if config is None:
+            config = SimulationConfig.from_settings()
+        if rng is None:
+            rng = np.random
+        cell_count = self.column_num * self.row_num
+        cells_to_change = int(_random_integers(rng, int(cell_count / 50)))
+        rows = _random_integers(rng, self.row_num - 1, cells_to_change)
+        cols = _random_integers(rng, self.column_num - 1, cells_to_change)
+
+        # Cells outside of the band are picked but left alone.
+        inside = (rows >= self.row_offset) & (rows < self.row_offset + len(self.levels))
+        self.levels[rows[inside] - self.row_offset, cols[inside]] = _random_levels(
+            rng, int(inside.sum()), cell_count, config)
+        return self.levels
+
+    def to_grid(self, missing: float = 0) -> np.ndarray:
+        """ Expands the band into a dense grid spanning the window.
+
+            :param missing: The value of the cells that are not part of the
+            heatmap. Defaults to 0, in which case the grid is uint8.
+            :return: A (row_num, column_num) array of congestion levels.
+        """
+        stop = self.row_offset + len(self.levels)
+        if missing == 0:
+            grid = np.zeros((self.row_num, self.column_num), dtype=np.uint8)
+            grid[self.row_offset:stop] = self.levels
+            return grid
+        grid = np.full((self.row_num, self.column_num), missing, dtype=float)
+        grid[self.row_offset:stop] = np.where(self.levels > 0, self.levels, missing)
+        return grid
+
+    def to_congestion(self, congestion: Congestion = None) -> Congestion:
+        """ Builds the rectangle keyed congestion map of the band, inserting the
+            cells column by column as generate_congestion_heatmap() does.
+
+            :param congestion: The Congestion instance to fill. Defaults to None,
+            in which case a new one is created.
+            :return: The filled Congestion instance.
+        """
+        if congestion is None:
+            congestion = Congestion()
+        congestion.cell_size = self.cell_size
+        congestion.column_num = self.column_num
+        congestion.row_num = self.row_num
+        cell_size = self.cell_size
+        cols, rows = np.nonzero(self.levels.T)
+        congestion.congestion_map = {
+            ((col*cell_size, row*cell_size), ((col+1)*cell_size, (row+1)*cell_size)):
+                float(level)
+            for col, row, level in zip(cols.tolist(), (rows + self.row_offset).tolist(),
+                                       self.levels[rows, cols].tolist())
+        }
+        return congestion
+
+    def node_costs(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            config: SimulationConfig = None
+    ) -> dict[tuple, float]:
+        """ Looks the cost of every node up in the band.
+
+            :param all_satellite_positions: The positions of all nodes.
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: A dictionary of the cost of every node, infinite outside of
+            the heatmap.
+        """
+        if config is None:
+            config = SimulationConfig.from_settings()
+        if not all_satellite_positions:
+            return {}
+        positions = np.asarray(all_satellite_positions, dtype=float)
+        x, y = positions[:, 0], positions[:, 1]
+        column = np.floor(x / self.cell_size).astype(np.int64)
+        row = np.floor(y / self.cell_size).astype(np.int64)
+        stop = self.row_offset + len(self.levels)
+
+        level = np.zeros(len(positions))
+        found = np.zeros(len(positions), dtype=bool)
+        # A position on a border lies in the cells on both sides of it, the
+        # first cell in column by column order wins.
+        for dc in (-1, 0, 1):
+            for dr in (-1, 0, 1):
+                c = column + dc
+                r = row + dr
+                candidate = ~found & (c >= 0) & (c < self.column_num) & \
+                    (r >= self.row_offset) & (r < stop) & \
+                    (c * self.cell_size <= x) & (x <= (c + 1) * self.cell_size) & \
+                    (r * self.cell_size <= y) & (y <= (r + 1) * self.cell_size)
+                cell_level = self.levels[r[candidate] - self.row_offset, c[candidate]]
+                hit = np.flatnonzero(candidate)[cell_level > 0]
+                level[hit] = cell_level[cell_level > 0]
+                found[hit] = True
+
+        costs = np.full(len(positions), float("inf"))
+        costs[found] = config.half_height * level[found]
+        return dict(zip(all_satellite_positions, costs.tolist()))
+
+    def coarsen(self, factor: int) -> "CongestionBand":
+        """ Merges every factor x factor block of cells into one cell holding
+            their highest level.
+
+            :param factor: The number of cells merged along each axis.
+            :return: The coarser CongestionBand.
+        """
+        if factor == 1:
+            return self
+        first = self.row_offset // factor
+        stop = -(-(self.row_offset + len(self.levels)) // factor)
+        column_num = -(-self.column_num // factor)
+        padded = np.zeros(((stop - first) * factor, column_num * factor), dtype=np.uint8)
+        top = self.row_offset - first * factor
+        padded[top:top + len(self.levels), :self.column_num] = self.levels
+        levels = padded.reshape(stop - first, factor, column_num, factor).max(axis=(1, 3))
+        return CongestionBand(levels, first, -(-self.row_num // factor), column_num,
+                              self.cell_size * factor)
+
+    def pyramid(self, depth: int = None) -> list["CongestionBand"]:
+        """ Builds the band at halving resolutions.
+
+            :param depth: The number of coarser levels. Defaults to None
+            (settings.CONGESTION_PYRAMID_DEPTH).
+            :return: The band followed by its coarser levels, each merging 2x2
+            cells of the previous one.
+        """
+        if depth is None:
+            depth = settings.CONGESTION_PYRAMID_DEPTH
+        return [self.coarsen(2 ** level) for level in range(depth + 1)]
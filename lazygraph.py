@@ -0,0 +1,334 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : lazygraph.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        edge_weight()
+        neighbour_edges()
+        LazySnapshotGraph.cost_of()
+        LazySnapshotGraph.explored_node_costs()
+        LazySnapshotGraph.explored_edges()
+        LazySnapshotGraph.shortest_path()
+        route_lazily()
+
+    NOTES :
+        - A LazySnapshotGraph has the same interface as graph.SnapshotGraph, but
+          its adjacency lists and node costs are computed the first time the
+          search asks for them and memoized for the tick. A route between nearby
+          stations only pays for the neighbourhood the search explores, instead
+          of every pair of satellites and every node cost.
+        - Neighbours are found through a uniform grid with cells as large as the
+          longest reach, so only the 3x3 block of cells around a node is tested.
+        - Edges and node costs follow get_edges_between_nodes() and
+          get_node_costs() exactly, so routes match the eager pipeline.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from collections.abc import Iterator
+from math import dist, floor
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from graph import INF, reconstruct_path, shortest_path_tree
+from heatmap import CongestionBand
+from positioning import closest_leo_nodes_to_endpoints, get_node_costs
+
+
+def edge_weight(
+        u: tuple[float, float, int],
+        v: tuple[float, float, int],
+        config: SimulationConfig = None
+) -> float:
+    """ Computes the weight of the edge between two satellites with the rules of
+        get_edges_between_nodes().
+
+        :param u: The position of the first satellite.
+        :param v: The position of the second satellite.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: The weight of the edge, or None if v is out of reach of u.
+    """
+    if u == v:
+        return None
+    if config is None:
+        config = SimulationConfig.from_settings()
+    if u[2] == settings.LEO_ORBIT_HEIGHT and v[2] == settings.LEO_ORBIT_HEIGHT:
+        distance_between_nodes = dist(u, v)
+        if distance_between_nodes <= config.leo_max_reachability:
+            return distance_between_nodes * config.leo_leo_hop_cost
+    elif u[2] == settings.MEO_ORBIT_HEIGHT and v[2] == settings.MEO_ORBIT_HEIGHT:
+        distance_between_nodes = dist(u, v)
+        if distance_between_nodes <= config.meo_max_reachability:
+            return distance_between_nodes * config.meo_meo_hop_cost
+    # Between orbits the reach ignores the altitude, the weight does not.
+    elif dist(u[:-1], v[:-1]) <= config.meo_max_reachability:
+        return dist(u, v) * config.leo_meo_hop_cost
+    return None
+
+
+def neighbour_edges(
+        position: tuple[float, float, int],
+        candidates: list[tuple[float, float, int]],
+        config: SimulationConfig = None
+) -> Iterator[tuple[tuple, float]]:
+    """ Yields the edges from a satellite to the reachable candidates.
+
+        :param position: The position of the satellite.
+        :param candidates: The positions of the satellites that may be in reach.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: An iterator of (neighbour position, weight) tuples.
+    """
+    if config is None:
+        config = SimulationConfig.from_settings()
+    for candidate in candidates:
+        weight = edge_weight(position, candidate, config)
+        if weight is not None:
+            yield candidate, weight
+
+
+class _LazyAdjacency:
+    """ The adjacency lists of a LazySnapshotGraph, built on first access. """
+
+    def __init__(self, graph: "LazySnapshotGraph") -> None:
+        self._graph = graph
+        self._lists = [None] * len(graph.positions)
+
+    def __len__(self) -> int:
+        return len(self._lists)
+
+    def __getitem__(self, u: int) -> list[tuple[int, float]]:
+        neighbours = self._lists[u]
+        if neighbours is None:
+            graph = self._graph
+            index = graph.index
+            neighbours = self._lists[u] = [
+                (index[v], w_uv) for v, w_uv in neighbour_edges(
+                    graph.positions[u], graph._candidates(graph.positions[u]), graph.config)]
+        return neighbours
+
+
+class _LazyNodeCost:
+    """ The node costs of a LazySnapshotGraph, looked up on first access. """
+
+    def __init__(self, graph: "LazySnapshotGraph") -> None:
+        self._graph = graph
+        self._costs = [None] * len(graph.positions)
+
+    def __len__(self) -> int:
+        return len(self._costs)
+
+    def __getitem__(self, v: int) -> float:
+        cost = self._costs[v]
+        if cost is None:
+            cost = self._costs[v] = self._graph.cost_of(self._graph.positions[v])
+        return cost
+
+
+class _LazyHeuristic:
+    """ A lower bound of the cost from every node to a target: the flat
+        distance times the cheapest hop cost.
+    """
+
+    def __init__(self, graph: "LazySnapshotGraph", target: int) -> None:
+        self._positions = graph.positions
+        self._target = graph.positions[target][:-1]
+        self._factor = min(graph.config.leo_leo_hop_cost, graph.config.meo_meo_hop_cost,
+                           graph.config.leo_meo_hop_cost)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __getitem__(self, v: int) -> float:
+        return dist(self._positions[v][:-1], self._target) * self._factor
+
+
+class LazySnapshotGraph:
+    """ The routing graph of a single tick, evaluated on demand.
+
+        :param all_satellite_positions: The positions of all satellites.
+        :param congestion_map: The congestion map, a dense congestion grid or a
+        CongestionBand, as accepted by get_node_costs().
+        :param config: The simulation config. Defaults to None (settings.py).
+
+        Attributes:
+            positions (list): The 3D position of every node, by node index.
+            index (dict): The node index of every position.
+            adjacency (Sequence): The (neighbour, weight) pairs of every node,
+            computed when first read.
+            node_cost (Sequence): The cost of entering every node, computed when
+            first read.
+    """
+
+    def __init__(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            congestion_map: dict[tuple[tuple, tuple], int] | np.ndarray | CongestionBand,
+            config: SimulationConfig = None
+    ) -> None:
+        self.config = SimulationConfig.from_settings() if config is None else config
+        self.index = {}
+        self.positions = []
+        for position in all_satellite_positions:
+            # Satellites sharing a position are the same node, as in dijskra().
+            if position not in self.index:
+                self.index[position] = len(self.positions)
+                self.positions.append(position)
+
+        self._cell_size = max(self.config.leo_max_reachability,
+                              self.config.meo_max_reachability)
+        self._buckets = {}
+        for position in self.positions:
+            self._buckets.setdefault(self._bucket_of(position), []).append(position)
+
+        self._congestion_map = congestion_map
+        if not isinstance(congestion_map, (np.ndarray, CongestionBand)) and congestion_map:
+            # Index the cells by grid coordinates, keeping their map order so
+            # positions on a cell border resolve to the same cell as
+            # get_node_costs().
+            (top_left, bottom_right) = next(iter(congestion_map))
+            self._congestion_cell = bottom_right[0] - top_left[0]
+            self._cells = {}
+            for rank, ((top_left, bottom_right), congestion_level) in enumerate(
+                    congestion_map.items()):
+                key = (round(top_left[0] / self._congestion_cell),
+                       round(top_left[1] / self._congestion_cell))
+                self._cells[key] = (rank, top_left, bottom_right, congestion_level)
+
+        self.adjacency = _LazyAdjacency(self)
+        self.node_cost = _LazyNodeCost(self)
+
+    def _bucket_of(self, position: tuple) -> tuple[int, int]:
+        """ Returns the neighbour grid cell of a position. """
+        return (floor(position[0] / self._cell_size), floor(position[1] / self._cell_size))
+
+    def _candidates(self, position: tuple) -> Iterator[tuple]:
+        """ Yields the positions in the 3x3 grid cells around a position. """
+        column, row = self._bucket_of(position)
+        for bucket_column in (column - 1, column, column + 1):
+            for bucket_row in (row - 1, row, row + 1):
+                yield from self._buckets.get((bucket_column, bucket_row), ())
+
+    def cost_of(self, position: tuple[float, float, int]) -> float:
+        """ Looks the cost of a single position up in the congestion data.
+
+            :param position: The position to price.
+            :return: The cost of the position, infinite outside of the map.
+        """
+        if isinstance(self._congestion_map, (np.ndarray, CongestionBand)):
+            return get_node_costs([position], self._congestion_map, self.config)[position]
+        if not self._congestion_map:
+            return INF
+        x, y = position[0], position[1]
+        column = floor(x / self._congestion_cell)
+        row = floor(y / self._congestion_cell)
+        best = None
+        # A position on a border lies in the cells on both sides of it.
+        for key in ((column - 1, row - 1), (column - 1, row), (column, row - 1), (column, row)):
+            cell = self._cells.get(key)
+            if cell is None or (best is not None and cell[0] > best[0]):
+                continue
+            _, top_left, bottom_right, _ = cell
+            if top_left[0] <= x <= bottom_right[0] and top_left[1] <= y <= bottom_right[1]:
+                best = cell
+        if best is None:
+            return INF
+        return self.config.half_height * best[3]
+
+    def explored_node_costs(self) -> dict[tuple, float]:
+        """ Returns the node costs looked up so far, in the format of
+            get_node_costs().
+        """
+        return {self.positions[v]: cost for v, cost in enumerate(self.node_cost._costs)
+                if cost is not None}
+
+    def explored_edges(self) -> dict[tuple[tuple, tuple], float]:
+        """ Returns the edges computed so far, in the format of
+            get_edges_between_nodes().
+        """
+        edges = {}
+        for u, neighbours in enumerate(self.adjacency._lists):
+            for v, w_uv in neighbours or ():
+                if (self.positions[v], self.positions[u]) not in edges:
+                    edges[(self.positions[u], self.positions[v])] = w_uv
+        return edges
+
+    def shortest_path(
+            self,
+            src_node: tuple[float, float, int],
+            dst_node: tuple[float, float, int]
+    ) -> tuple[list[tuple[float, float, int]], float]:
+        """ Runs an A* search between two satellites, exploring as little of
+            the graph as possible.
+
+            :param src_node: The position of the first satellite.
+            :param dst_node: The position of the last satellite.
+            :return: A tuple of the positions along the path and its cost, as
+            returned by Algorithms.dijskra().
+        """
+        source, target = self.index[src_node], self.index[dst_node]
+        distance, parent = shortest_path_tree(
+            self, source, target=target, heuristic=_LazyHeuristic(self, target))
+        if distance[target] == INF:
+            print("path is not reachable")
+            return [src_node, dst_node], 0
+        return [self.positions[i] for i in reconstruct_path(parent, source, target)], \
+            distance[target]
+
+
+def route_lazily(
+        all_satellite_positions: list[tuple[float, float, int]],
+        endpoint_positions: list[tuple[float, float, int]],
+        congestion_map: dict[tuple[tuple, tuple], int] | np.ndarray | CongestionBand,
+        config: SimulationConfig = None
+) -> tuple[LazySnapshotGraph, list[tuple[tuple, tuple]], list[tuple], float]:
+    """ Finds the uplinks of the ground stations and routes between the first
+        and last one, only evaluating the satellites close to the stations and
+        the route.
+
+        :param all_satellite_positions: The positions of all satellites.
+        :param endpoint_positions: The positions of the ground stations.
+        :param congestion_map: The congestion map, a dense congestion grid or a
+        CongestionBand.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: A tuple of the graph, the uplink of every ground station, the
+        route and its cost.
+    """
+    graph = LazySnapshotGraph(all_satellite_positions, congestion_map, config)
+    leo_nodes_endpoints_link = []
+    for endpoint in endpoint_positions:
+        # Only the satellites near the station can be its uplink.
+        nearby = [position for position in graph._candidates(endpoint)
+                  if position[2] == settings.LEO_ORBIT_HEIGHT]
+        nearby.sort(key=graph.index.get)
+        node_cost = {position: graph.node_cost[graph.index[position]] for position in nearby}
+        leo_nodes_endpoints_link += closest_leo_nodes_to_endpoints(
+            leo_satellite_positions=nearby,
+            ground_station_positions=[endpoint],
+            node_cost=node_cost,
+            config=graph.config
+        )
+    shortest_path, path_distance = graph.shortest_path(
+        leo_nodes_endpoints_link[0][0], leo_nodes_endpoints_link[-1][0])
+    return graph, leo_nodes_endpoints_link, shortest_path, path_distance
@@ -0,0 +1,157 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : linkbudget.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.LinkBudget
+        link_budget()
+        link_costs()
+        reweight_edges()
+
+    NOTES :
+        - Computes the propagation delay, free-space path loss, signal to noise
+          ratio and Shannon rate of every link in one NumPy pass, from the
+          LINK_* radio parameters of settings.py.
+        - Cost functions turn a budget into edge weights:
+            distance          the link length times the hop cost of its layers
+                              (the default weights of get_edges_between_nodes())
+            latency           the propagation delay
+            hops              the same weight for every link
+            inverse_capacity  the reference rate over the achievable rate
+          All of them are scaled to a map pixel, so they stay on the scale of
+          the node costs: latency counts the light time of one pixel, hops and
+          inverse_capacity weigh a reference link as LEO_MAX_REACHABILITY.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+
+# Kilometres covered by one pixel of the equirectangular map at the equator.
+KM_PER_PIXEL = 40075 / settings.WINDOW_WIDTH
+# Speed of light in vacuum (km/s).
+SPEED_OF_LIGHT = 299792.458
+# Boltzmann constant (dBW/K/Hz).
+BOLTZMANN = -228.6
+
+COST_FUNCTIONS = ("distance", "latency", "hops", "inverse_capacity")
+
+
+@dataclass
+class LinkBudget:
+    """ A dataclass holding the link budget of every link, as arrays.
+
+        Attributes:
+            length (np.ndarray): The link lengths (km).
+            delay (np.ndarray): The propagation delays (s).
+            path_loss (np.ndarray): The free-space path losses (dB).
+            snr (np.ndarray): The signal to noise ratios (dB).
+            rate (np.ndarray): The achievable Shannon rates (bit/s).
+    """
+    length: np.ndarray
+    delay: np.ndarray
+    path_loss: np.ndarray
+    snr: np.ndarray
+    rate: np.ndarray
+
+
+def link_budget(length: np.ndarray) -> LinkBudget:
+    """ Computes the link budget of links of the given lengths.
+
+        :param length: The link lengths (km).
+        :return: A LinkBudget instance.
+    """
+    length = np.asarray(length, dtype=float)
+    # Keep zero length links finite.
+    safe_length = np.maximum(length, 1e-3)
+    path_loss = 20 * np.log10(safe_length) + 20 * np.log10(settings.LINK_FREQUENCY_GHZ) + 92.45
+    noise = BOLTZMANN + 10 * np.log10(settings.LINK_NOISE_TEMPERATURE) + \
+        10 * np.log10(settings.LINK_BANDWIDTH)
+    snr = settings.LINK_EIRP + settings.LINK_RECEIVE_GAIN - path_loss - noise
+    rate = settings.LINK_BANDWIDTH * np.log2(1 + 10 ** (snr / 10))
+    return LinkBudget(
+        length=length,
+        delay=length / SPEED_OF_LIGHT,
+        path_loss=path_loss,
+        snr=snr,
+        rate=rate
+    )
+
+
+def link_costs(
+        budget: LinkBudget,
+        cost_function: str,
+        hop_cost: np.ndarray = None,
+        config: SimulationConfig = None
+) -> np.ndarray:
+    """ Turns a link budget into edge weights.
+
+        :param budget: The budget of the links.
+        :param cost_function: One of COST_FUNCTIONS.
+        :param hop_cost: The hop cost multiplier of every link, used by the
+        'distance' cost function. Defaults to None (a multiplier of 1).
+        :param config: The simulation config, whose LEO reach is the weight of
+        one hop. Defaults to None (settings.py).
+        :return: The weight of every link.
+        :raises ValueError: If the cost function is unknown.
+    """
+    if config is None:
+        config = SimulationConfig.from_settings()
+    if cost_function == "distance":
+        weights = budget.length / KM_PER_PIXEL
+        return weights if hop_cost is None else weights * hop_cost
+    if cost_function == "latency":
+        return budget.delay / (KM_PER_PIXEL / SPEED_OF_LIGHT)
+    if cost_function == "hops":
+        return np.full(len(budget.length), float(config.leo_max_reachability))
+    if cost_function == "inverse_capacity":
+        with np.errstate(divide="ignore"):
+            return settings.LINK_REFERENCE_RATE / budget.rate * config.leo_max_reachability
+    raise ValueError(f"unknown cost function '{cost_function}', "
+                     f"expected one of {', '.join(COST_FUNCTIONS)}")
+
+
+def reweight_edges(
+        edges: dict[tuple[tuple, tuple], float],
+        cost_function: str,
+        config: SimulationConfig = None
+) -> dict[tuple[tuple, tuple], float]:
+    """ Replaces the weights of the edges of get_edges_between_nodes() by a
+        link budget cost function. Map distances are converted to kilometres.
+
+        :param edges: A dictionary of edges between nodes with their weights.
+        :param cost_function: One of COST_FUNCTIONS.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: A dictionary of the same edges with the new weights.
+    """
+    if cost_function == "distance" or not edges:
+        return edges
+    ends = np.array(list(edges), dtype=float)
+    length = np.linalg.norm(ends[:, 0] - ends[:, 1], axis=1) * KM_PER_PIXEL
+    weights = link_costs(link_budget(length), cost_function, config=config)
+    return dict(zip(edges, weights.tolist()))
@@ -31,172 +31,224 @@
     1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
 """
 
+import argparse
 import sys
 
 import pygame
 import numpy as np
 
 import settings
-from entities import LEOSatellite, MEOSatellite, GroundStation, Congestion
-from positioning import update_position, get_2D_position, get_3D_position, \
-    closest_leo_nodes_to_endpoints, get_edges_between_nodes, get_node_costs, \
-    initialize_heatmap, generate_congestion_heatmap, refresh_congestion_heatmap
-from visuals import draw_entity, draw_line, draw_congestion
-from routing import Algorithms
-
-
-def main() -> None:
-    """Main program when pygame loop is located."""
+from entities import Congestion
+from heatmap import CongestionBand
+from dynamics import CongestionDynamics
+from positioning import initialize_heatmap, \
+    generate_congestion_heatmap, refresh_congestion_heatmap
+from visuals import draw_congestion, draw_background, load_background
+from camera import Camera
+from simulation import build_constellations, default_ground_stations, run_pipeline
+from recording import SimulationRecorder, SimulationReplayer
+from traces import CongestionTrace
+from renderer import DirtyRectRenderer, draw_frame
+from orbits import OrbitalModel
+from linkbudget import COST_FUNCTIONS
+from handover import HandoverManager
+from scenario import load_scenario
+
+
+def main(
+        record_path: str = None,
+        replay_path: str = None,
+        replay_speed: float = 1.0,
+        seed: int = None,
+        congestion_trace_path: str = None,
+        dirty_rects: bool = False,
+        lazy: bool = False,
+        orbital_mechanics: bool = False,
+        link_cost: str = None,
+        hysteresis: bool = False,
+        scenario_path: str = None,
+        banded_congestion: bool = False,
+        congestion_dynamics: bool = False
+) -> None:
+    """ Main program when pygame loop is located.
+
+        :param record_path: File to record the run to. Defaults to None.
+        :param replay_path: Recording to replay instead of generating congestion.
+        Defaults to None.
+        :param replay_speed: Playback speed of a replay relative to settings.FPS,
+        where 0 replays as fast as possible. Defaults to 1.0.
+        :param seed: Seed for np.random. Defaults to None (a random seed).
+        :param congestion_trace_path: A '.npy' or raw congestion trace to drive
+        the node costs with, one time step per frame. Defaults to None.
+        :param dirty_rects: Whether to push only the changed areas of the screen
+        to the display instead of full frames. Defaults to False.
+        :param lazy: Whether to only compute the edges and node costs the route
+        search explores. Defaults to False.
+        :param orbital_mechanics: Whether to fly the Walker-delta shells of
+        settings.ORBIT_SHELLS along real orbits instead of the sine wave orbits.
+        Defaults to False.
+        :param link_cost: The link budget cost function weighing the edges.
+        Defaults to None (settings.LINK_COST_FUNCTION).
+        :param hysteresis: Whether to keep the uplinks and the route between
+        frames while they stay valid, and print the handover counts on exit.
+        Defaults to False.
+        :param scenario_path: A '.toml', '.json' or '.npz' scenario file to
+        load the satellites, shells and ground stations from. Defaults to None,
+        in which case a replay uses the scenario of its recording.
+        :param banded_congestion: Whether to keep the generated congestion as a
+        CongestionBand, so fine grid densities stay cheap. Defaults to False.
+        :param congestion_dynamics: Whether to evolve the generated congestion
+        with diffusion, decay and terminator hotspots every frame instead of
+        random refreshes. Implies banded_congestion. Defaults to False.
+    """
     pygame.init()
     clock = pygame.time.Clock()
 
     screen = pygame.display.set_mode(settings.RESOLUTION)
     pygame.display.set_caption("Satellite Orbit")
 
-    bg = pygame.image.load("worldmap_light.png").convert()
-    bg = pygame.transform.scale(bg, settings.RESOLUTION)
-
-    leo_orbit_constellation = [LEOSatellite(
-        delay=settings.WINDOW_WIDTH / settings.MAX_LEO_SATELLITE_COUNT * i * 12
-    ) for i in range(settings.MAX_LEO_SATELLITE_COUNT)]
-
-    meo_orbit_constellation = [MEOSatellite(
-        delay=settings.WINDOW_WIDTH / settings.MAX_MEO_SATELLITE_COUNT * i * 7
-    ) for i in range(settings.MAX_MEO_SATELLITE_COUNT)]
-
-    endpoints = [
-        GroundStation(x=300, y=275),
-        GroundStation(x=1475, y=615),
-    ]
-
-    congestion = Congestion()
-    initialize_heatmap(congestion)
-    generate_congestion_heatmap(congestion)
+    bg = load_background()
+
+    scenario = load_scenario(scenario_path) if scenario_path is not None else None
+    replayer = None
+    if replay_path is not None:
+        replayer = SimulationReplayer(replay_path)
+        if scenario is None:
+            # Replay the constellations and ground stations of the recording.
+            scenario = replayer.scenario
+    orbits = None
+    if orbital_mechanics:
+        orbits = scenario.orbital_model() if scenario is not None else OrbitalModel()
+    handover = HandoverManager() if hysteresis else None
+    if scenario is not None:
+        leo_orbit_constellation, meo_orbit_constellation, ground_stations = scenario.build()
+        # The first traffic pair is the one routed and drawn.
+        endpoints = [ground_stations[i] for i in scenario.pairs[0].tolist()]
+    else:
+        leo_orbit_constellation, meo_orbit_constellation = build_constellations()
+        endpoints = default_ground_stations()
+    if orbits is not None:
+        leo_orbit_constellation, meo_orbit_constellation = orbits.build_constellations()
+
+    recorder = None
+    dynamics = None
+    trace = None
+    if replayer is not None:
+        for name in replayer.settings_mismatches():
+            print(f"warning: setting '{name}' differs from the recording")
+        frames = replayer.frames()
+        frame_rate = settings.FPS * replay_speed
+    elif congestion_trace_path is not None:
+        trace = CongestionTrace(congestion_trace_path)
+        congestion = trace.current()
+        frame_rate = settings.FPS
+    else:
+        # Seed the congestion generator so the run can be reproduced.
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % 2**32)
+        np.random.seed(seed)
+        if banded_congestion or congestion_dynamics:
+            congestion = CongestionBand.generate()
+            if congestion_dynamics:
+                dynamics = CongestionDynamics(congestion, seed=seed)
+        else:
+            congestion = Congestion()
+            initialize_heatmap(congestion)
+            generate_congestion_heatmap(congestion)
+        frame_rate = settings.FPS
+        if record_path is not None:
+            recorder = SimulationRecorder(record_path, seed, congestion, scenario=scenario)
 
     font = pygame.font.Font(None, 28)
+    camera = Camera()
+    renderer = DirtyRectRenderer(screen, bg) if dirty_rects else None
 
     # Counts the amount of times we loop through the main program loop.
     loop_counter = 0
 
     running = True
     while running:
-        tick_speed = clock.tick(settings.FPS)
-        screen.blit(bg, (0, 0))
+        tick_speed = clock.tick(frame_rate)
 
         for event in pygame.event.get():
             # 'X' button press.
             if event.type == pygame.QUIT:
                 running = False
                 continue
+            # Mouse wheel zooms around the cursor.
+            if event.type == pygame.MOUSEWHEEL:
+                camera.zoom_at(settings.ZOOM_STEP ** event.y, pygame.mouse.get_pos())
+            # Dragging with the left button pans the view.
+            elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+                camera.pan(-event.rel[0], -event.rel[1])
 
         loop_counter += 1
-        if loop_counter % settings.HEAT_MAP_REFRESH == 0:
-            congestion.congestion_map = refresh_congestion_heatmap(congestion)
-
-        leo_satellite_positions = [update_position(satellite) or get_3D_position(
-            satellite) for satellite in leo_orbit_constellation]
-
-        meo_satellite_positions = [update_position(satellite) or get_3D_position(
-            satellite) for satellite in meo_orbit_constellation]
-
-        endpoint_positions = [get_3D_position(
-            ground_station) for ground_station in endpoints]
-
-        node_cost = get_node_costs(
-            all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
-            congestion_map=congestion.congestion_map
-        )
-        edges = get_edges_between_nodes(
-            all_satellite_positions=leo_satellite_positions + meo_satellite_positions
+        if replayer is not None:
+            # Take the program time and congestion from the recording.
+            try:
+                ticks, congestion = next(frames)
+            except StopIteration:
+                break
+        elif trace is not None:
+            # Read the time step of the frame in place, starting at step 0.
+            congestion = trace.seek(loop_counter - 1)
+            ticks = pygame.time.get_ticks()
+        elif dynamics is not None:
+            ticks = pygame.time.get_ticks()
+            dynamics.step(ticks)
+            if recorder is not None:
+                recorder.record_tick(ticks, congestion)
+        else:
+            if loop_counter % settings.HEAT_MAP_REFRESH == 0:
+                if banded_congestion:
+                    congestion.refresh()
+                else:
+                    congestion.congestion_map = refresh_congestion_heatmap(congestion)
+            ticks = pygame.time.get_ticks()
+            if recorder is not None:
+                recorder.record_tick(ticks, congestion)
+
+        pipeline = run_pipeline(
+            leo_orbit_constellation,
+            meo_orbit_constellation,
+            endpoints,
+            congestion,
+            ticks,
+            lazy=lazy,
+            orbits=orbits,
+            link_cost=link_cost,
+            handover=handover
         )
 
-        leo_nodes_endpoints_link = closest_leo_nodes_to_endpoints(
-            leo_satellite_positions=leo_satellite_positions,
-            ground_station_positions=endpoint_positions,
-            node_cost=node_cost
+        # Draw the map and the congestion heatmap.
+        if renderer is not None:
+            renderer.begin_frame(congestion, camera)
+        else:
+            draw_background(screen, bg, camera)
+            draw_congestion(screen, congestion, camera)
+        drawn_rects = draw_frame(
+            screen,
+            camera,
+            pipeline,
+            endpoints,
+            leo_orbit_constellation,
+            meo_orbit_constellation,
+            font,
+            clock.get_fps()
         )
 
-        routing_results = Algorithms.dijskra(
-            all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
-            leo_nodes_endpoints_link=leo_nodes_endpoints_link,
-            node_cost=node_cost,
-            edges=edges
-        )
-        shortest_path = routing_results[0]
-        path_distance = routing_results[1]
-
-        # Draw the congestion heatmap.
-        draw_congestion(screen, congestion)
-
-        # Drawing visuals for endpoints.
-        for ground_station in endpoints:
-            draw_entity(screen, ground_station)
-
-        # Drawing visuals for satellite links.
-        for j in range(1, len(shortest_path)):
-            draw_line(
-                screen=screen,
-                points=(shortest_path[j], shortest_path[j-1]),
-                colour=settings.LINK_COLOUR
-            )
-        # Drawing visuals for endpoint links.
-        for point_pair in leo_nodes_endpoints_link:
-            draw_line(
-                screen=screen,
-                points=point_pair,
-                colour=settings.LINK_COLOUR
-            )
-
-        pygame.draw.rect(screen, settings.WHITE, pygame.Rect(25, 25, 200, 80))
-        # Show number of hops.
-        screen.blit(font.render(
-            f"Number of hops: {len(shortest_path) + 1}", True, settings.BLACK), (30, 30))
-        # Show path distance.
-        screen.blit(font.render(
-            f"Path cost: {path_distance:.2f}", True, settings.BLACK), (30, 55))
-        # Show fps.
-        screen.blit(font.render(
-            f"FPS: {clock.get_fps():.2f}", True, settings.BLACK), (30, 80))
-
-        # Drawing visuals for LEO satellites.
-        PATH_TO_DRAW = []
-        for satellite in leo_orbit_constellation:
-            if not get_3D_position(satellite) in shortest_path:
-                draw_entity(
-                    screen=screen,
-                    entity=satellite,
-                    colour=settings.LEO_INACTIVE_COLOUR
-                )
-            else:
-                PATH_TO_DRAW.append(satellite)
-
-        for satellite in PATH_TO_DRAW:
-            draw_entity(
-                screen=screen,
-                entity=satellite,
-                colour=settings.LEO_ACTIVE_COLOUR
-            )
-
-        # Drawing visuals for MEO satellites.
-        PATH_TO_DRAW = []
-        for satellite in meo_orbit_constellation:
-            if not get_3D_position(satellite) in shortest_path:
-                draw_entity(
-                    screen=screen,
-                    entity=satellite,
-                    colour=settings.MEO_INACTIVE_COLOUR
-                )
-            else:
-                PATH_TO_DRAW.append(satellite)
-
-        for satellite in PATH_TO_DRAW:
-            draw_entity(
-                screen=screen,
-                entity=satellite,
-                colour=settings.MEO_ACTIVE_COLOUR
-            )
-
-        pygame.display.update()
+        if renderer is not None:
+            renderer.end_frame(drawn_rects)
+        else:
+            pygame.display.update()
+
+    if recorder is not None:
+        recorder.close()
+    if handover is not None:
+        stats = handover.stats
+        print(f"{stats.ticks} ticks, {stats.recomputations} route searches "
+              f"({stats.link_losses} link losses, {stats.degradations} degradations), "
+              f"{stats.handovers} handovers, {stats.reroutes} reroutes")
 
     # Ensures PyGame closes correctly.
     pygame.quit()
@@ -204,4 +256,45 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Satellite network simulation.")
+    parser.add_argument("--record", metavar="PATH",
+                        help="record the run to a binary log")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="replay a run recorded with --record")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="replay speed multiplier (0 = unthrottled)")
+    parser.add_argument("--seed", type=int, help="seed for the congestion generator")
+    parser.add_argument("--congestion-trace", metavar="PATH",
+                        help="drive congestion from a memory-mapped trace")
+    parser.add_argument("--dirty-rects", action="store_true",
+                        help="push only the changed areas of the screen to the display")
+    parser.add_argument("--lazy", action="store_true",
+                        help="only evaluate the part of the graph the route search explores")
+    parser.add_argument("--orbits", action="store_true",
+                        help="fly real Walker-delta shells instead of sine wave orbits")
+    parser.add_argument("--link-cost", choices=COST_FUNCTIONS,
+                        help="link budget cost function weighing the edges")
+    parser.add_argument("--hysteresis", action="store_true",
+                        help="keep uplinks and routes while they stay valid")
+    parser.add_argument("--scenario", metavar="PATH",
+                        help="load satellites, shells and stations from a TOML/JSON/NPZ file")
+    parser.add_argument("--band", action="store_true",
+                        help="store the generated congestion as a dense orbit band")
+    parser.add_argument("--dynamics", action="store_true",
+                        help="evolve congestion with diffusion and terminator hotspots")
+    args = parser.parse_args()
+    main(
+        record_path=args.record,
+        replay_path=args.replay,
+        replay_speed=args.speed,
+        seed=args.seed,
+        congestion_trace_path=args.congestion_trace,
+        dirty_rects=args.dirty_rects,
+        lazy=args.lazy,
+        orbital_mechanics=args.orbits,
+        link_cost=args.link_cost,
+        hysteresis=args.hysteresis,
+        scenario_path=args.scenario,
+        banded_congestion=args.band,
+        congestion_dynamics=args.dynamics
+    )
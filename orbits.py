@@ -0,0 +1,384 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : orbits.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.WalkerShell
+        WalkerShell.elements()
+        OrbitalModel.build_constellations()
+        OrbitalModel.propagate()
+        OrbitalModel.update()
+        OrbitalModel.candidate_links()
+        OrbitalModel.edges()
+        OrbitalModel.uplinks()
+        ecef_to_map()
+        orbital_node_costs()
+
+    NOTES :
+        - An optional physics mode replacing the sine wave orbits of
+          update_position() with circular Keplerian orbits. Every Walker-delta
+          shell is propagated at once in NumPy, rotated into Earth-fixed (ECEF)
+          coordinates and projected onto the equirectangular world map.
+        - Satellites keep the z of their layer (LEO_ORBIT_HEIGHT or
+          MEO_ORBIT_HEIGHT) in their positions, so the rest of the program can
+          still tell the layers apart.
+        - Links use true 3D distances. LEO candidate pairs are found by hashing
+          the satellites into cubes as large as the link range and testing
+          neighbouring cubes only; the few MEO satellites are tested against
+          everything in chunks. Shells of several thousand satellites stay
+          interactive.
+        - Links through the Earth and uplinks below the minimum elevation of a
+          ground station are masked out with the bulk tests of visibility.py.
+        - Edge weights are the link length converted to map pixels, times the
+          hop cost of the layer pair, so they stay on the scale of the node costs.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from entities import LEOSatellite, MEOSatellite, Congestion
+from heatmap import CongestionBand
+from positioning import get_node_costs
+from linkbudget import link_budget, link_costs
+from visibility import EARTH_RADIUS, map_to_ecef, earth_occlusion_mask, elevation_mask
+
+# Standard gravitational parameter of the Earth (km^3/s^2).
+EARTH_MU = 398600.4418
+# Rotation rate of the Earth (rad/s).
+EARTH_ROTATION_RATE = 7.2921159e-5
+# Kilometres covered by one pixel of the equirectangular map at the equator.
+KM_PER_PIXEL = 2 * np.pi * EARTH_RADIUS / settings.WINDOW_WIDTH
+
+
+@dataclass(frozen=True)
+class WalkerShell:
+    """ A dataclass representing a Walker-delta shell i:t/p/f of circular orbits.
+
+        Attributes:
+            layer (str): 'leo' or 'meo', the layer the satellites route in.
+            altitude (float): The altitude of the orbits (km).
+            inclination (float): The inclination of the orbits (degrees).
+            planes (int): The number of equally spaced orbital planes.
+            satellites_per_plane (int): The number of satellites in every plane.
+            phasing (int): The Walker phasing factor f. Defaults to 1.
+    """
+    layer: str
+    altitude: float
+    inclination: float
+    planes: int
+    satellites_per_plane: int
+    phasing: int = 1
+
+    def elements(self) -> tuple[np.ndarray, np.ndarray]:
+        """ Computes the orbital elements of every satellite of the shell.
+
+            :return: A tuple of the right ascension of the ascending node and
+            the initial argument of latitude (radians) of every satellite.
+        """
+        total = self.planes * self.satellites_per_plane
+        plane = np.repeat(np.arange(self.planes), self.satellites_per_plane)
+        slot = np.tile(np.arange(self.satellites_per_plane), self.planes)
+        raan = 2 * np.pi * plane / self.planes
+        anomaly = 2 * np.pi * slot / self.satellites_per_plane + \
+            2 * np.pi * self.phasing * plane / total
+        return raan, anomaly
+
+
+def ecef_to_map(ecef: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """ Projects Earth-fixed positions onto the equirectangular world map.
+
+        :param ecef: An (N, 3) array of ECEF positions (km).
+        :return: The x and y map coordinates (pixels) of every position.
+    """
+    longitude = np.arctan2(ecef[:, 1], ecef[:, 0])
+    latitude = np.arcsin(ecef[:, 2] / np.linalg.norm(ecef, axis=1))
+    x = (longitude + np.pi) / (2 * np.pi) * settings.WINDOW_WIDTH
+    y = (np.pi / 2 - latitude) / np.pi * settings.WINDOW_HEIGHT
+    return x, y
+
+
+def orbital_node_costs(
+        all_satellite_positions: list[tuple[float, float, int]],
+        congestion: Congestion | np.ndarray | CongestionBand,
+        config: SimulationConfig = None
+) -> dict[tuple, float]:
+    """ Prices thousands of satellites at once by reading the congestion
+        heatmap as a dense grid, where cells missing from the map cost infinity.
+
+        :param all_satellite_positions: The positions of all satellites.
+        :param congestion: The congestion heatmap, a dense congestion grid or a
+        CongestionBand.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: A dictionary of the cost of every satellite.
+    """
+    if isinstance(congestion, CongestionBand):
+        return congestion.node_costs(all_satellite_positions, config)
+    if not isinstance(congestion, np.ndarray):
+        grid = np.full((congestion.row_num, congestion.column_num), np.inf)
+        for (cell_top_left_points, _), congestion_level in congestion.congestion_map.items():
+            grid[int(round(cell_top_left_points[1] / congestion.cell_size)),
+                 int(round(cell_top_left_points[0] / congestion.cell_size))] = congestion_level
+        congestion = grid
+    return get_node_costs(all_satellite_positions, congestion, config)
+
+
+class OrbitalModel:
+    """ Propagates Walker-delta shells and builds their links.
+
+        :param shells: The shells to simulate. Defaults to settings.ORBIT_SHELLS,
+        a list of (layer, altitude, inclination, planes, satellites per plane,
+        phasing) tuples.
+        :param time_scale: Simulated seconds per second of program time.
+        Defaults to settings.ORBIT_TIME_SCALE.
+
+        Attributes:
+            layers (np.ndarray): The z of the layer of every satellite, LEO
+            shells first.
+            ecef (np.ndarray): The (N, 3) ECEF positions (km) of the last
+            propagation.
+    """
+
+    def __init__(self, shells: list[WalkerShell] = None, time_scale: float = None) -> None:
+        if shells is None:
+            shells = [WalkerShell(*shell) for shell in settings.ORBIT_SHELLS]
+        # LEO shells first, matching the order of the satellite positions.
+        self.shells = sorted(shells, key=lambda shell: shell.layer != "leo")
+        self.time_scale = settings.ORBIT_TIME_SCALE if time_scale is None else time_scale
+
+        raan, anomaly, radius, inclination, layers = [], [], [], [], []
+        for shell in self.shells:
+            shell_raan, shell_anomaly = shell.elements()
+            raan.append(shell_raan)
+            anomaly.append(shell_anomaly)
+            count = len(shell_raan)
+            radius.append(np.full(count, EARTH_RADIUS + shell.altitude))
+            inclination.append(np.full(count, np.radians(shell.inclination)))
+            layers.append(np.full(count, settings.LEO_ORBIT_HEIGHT if shell.layer == "leo"
+                                  else settings.MEO_ORBIT_HEIGHT))
+        self._raan = np.concatenate(raan)
+        self._anomaly = np.concatenate(anomaly)
+        self._radius = np.concatenate(radius)
+        self._mean_motion = np.sqrt(EARTH_MU / self._radius ** 3)
+        self._cos_inclination = np.cos(np.concatenate(inclination))
+        self._sin_inclination = np.sin(np.concatenate(inclination))
+        self.layers = np.concatenate(layers).astype(np.int64)
+        self.ecef = np.zeros((len(self.layers), 3))
+
+    def build_constellations(self) -> tuple[list[LEOSatellite], list[MEOSatellite]]:
+        """ Builds the satellites of the shells, to be moved by update().
+
+            :return: A tuple containing the list of LEO satellites and the list
+            of MEO satellites.
+        """
+        leo_count = int(np.count_nonzero(self.layers == settings.LEO_ORBIT_HEIGHT))
+        return [LEOSatellite() for _ in range(leo_count)], \
+            [MEOSatellite() for _ in range(len(self.layers) - leo_count)]
+
+    def propagate(self, seconds: float) -> np.ndarray:
+        """ Computes the ECEF position of every satellite.
+
+            :param seconds: The simulated time since the epoch (s).
+            :return: The (N, 3) ECEF positions (km), also kept in self.ecef.
+        """
+        argument_of_latitude = self._anomaly + self._mean_motion * seconds
+        # Earth-fixed right ascension of the ascending node.
+        node = self._raan - EARTH_ROTATION_RATE * seconds
+        cos_u, sin_u = np.cos(argument_of_latitude), np.sin(argument_of_latitude)
+        cos_node, sin_node = np.cos(node), np.sin(node)
+        self.ecef[:, 0] = self._radius * (cos_u * cos_node - sin_u * self._cos_inclination * sin_node)
+        self.ecef[:, 1] = self._radius * (cos_u * sin_node + sin_u * self._cos_inclination * cos_node)
+        self.ecef[:, 2] = self._radius * sin_u * self._sin_inclination
+        return self.ecef
+
+    def update(
+            self,
+            leo_orbit_constellation: list[LEOSatellite],
+            meo_orbit_constellation: list[MEOSatellite],
+            ticks: float = None
+    ) -> None:
+        """ Moves the satellites built by build_constellations() to a point in
+            time.
+
+            :param leo_orbit_constellation: The LEO satellites.
+            :param meo_orbit_constellation: The MEO satellites.
+            :param ticks: The program time in milliseconds. Defaults to None,
+            in which case the pygame clock is read.
+        """
+        if ticks is None:
+            import pygame
+            ticks = pygame.time.get_ticks()
+        x, y = ecef_to_map(self.propagate(ticks / 1000 * self.time_scale))
+        for satellite, satellite_x, satellite_y in zip(
+                leo_orbit_constellation + meo_orbit_constellation, x.tolist(), y.tolist()):
+            satellite.x = satellite_x
+            satellite.y = satellite_y
+
+    def _link_ranges(self, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """ Returns the maximum link length (km) of every pair. """
+        leo_i = self.layers[i] == settings.LEO_ORBIT_HEIGHT
+        leo_j = self.layers[j] == settings.LEO_ORBIT_HEIGHT
+        return np.where(leo_i & leo_j, settings.ORBIT_LEO_LINK_RANGE,
+                        np.where(leo_i | leo_j, settings.ORBIT_LEO_MEO_LINK_RANGE,
+                                 settings.ORBIT_MEO_LINK_RANGE))
+
+    def _cell_pairs(self, nodes: np.ndarray, cell_size: float) -> tuple[list, list, list]:
+        """ Finds the pairs of some satellites closer than cell_size by hashing
+            them into cubic cells and only testing neighbouring cells.
+        """
+        cells = np.floor(self.ecef[nodes] / cell_size).astype(np.int64)
+        span = int(np.abs(cells).max(initial=0)) + 2
+        width = 2 * span + 1
+        keys = ((cells[:, 0] + span) * width + cells[:, 1] + span) * width + cells[:, 2] + span
+        order = np.argsort(keys, kind="stable")
+        keys, nodes = keys[order], nodes[order]
+        cell_keys, starts, sizes = np.unique(keys, return_index=True, return_counts=True)
+
+        firsts, seconds, lengths = [], [], []
+        # Half of the 26 neighbours plus the cell itself cover every pair once.
+        offsets = [(dx, dy, dz) for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                   for dz in (-1, 0, 1) if (dx, dy, dz) >= (0, 0, 0)]
+        for dx, dy, dz in offsets:
+            wanted = cell_keys + (dx * width + dy) * width + dz
+            found = np.searchsorted(cell_keys, wanted)
+            found[found == len(cell_keys)] = 0
+            match = np.nonzero(cell_keys[found] == wanted)[0]
+            size_a, size_b = sizes[match], sizes[found[match]]
+            # Every member of the first cell against every member of the second.
+            counts = size_a * size_b
+            pair = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            a = np.repeat(starts[match], counts) + pair // np.repeat(size_b, counts)
+            b = np.repeat(starts[found[match]], counts) + pair % np.repeat(size_b, counts)
+            if (dx, dy, dz) == (0, 0, 0):
+                a, b = a[a < b], b[a < b]
+            i, j = nodes[a], nodes[b]
+            length = np.linalg.norm(self.ecef[i] - self.ecef[j], axis=1)
+            keep = length <= self._link_ranges(i, j)
+            firsts.append(i[keep])
+            seconds.append(j[keep])
+            lengths.append(length[keep])
+        return firsts, seconds, lengths
+
+    def candidate_links(self, chunk_size: int = 16) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Finds every pair of satellites within link range of each other.
+
+            :param chunk_size: How many MEO satellites are tested against all
+            satellites at once. Defaults to 16.
+            :return: A tuple of the first satellite, the second satellite and
+            the length (km) of every link with a clear line of sight, with i < j.
+        """
+        leo = np.nonzero(self.layers == settings.LEO_ORBIT_HEIGHT)[0]
+        meo = np.nonzero(self.layers != settings.LEO_ORBIT_HEIGHT)[0]
+        # The dense LEO layer is hashed with its own, short, range.
+        firsts, seconds, lengths = self._cell_pairs(leo, settings.ORBIT_LEO_LINK_RANGE)
+        # The few MEO satellites are tested against everything.
+        for start in range(0, len(meo), chunk_size):
+            rows = meo[start:start + chunk_size]
+            length = np.linalg.norm(self.ecef[rows, None] - self.ecef[None], axis=2)
+            i, j = np.nonzero(length <= self._link_ranges(
+                rows[:, None], np.arange(len(self.layers))[None]))
+            i = rows[i]
+            # Every MEO pair is found from both ends, keep it once.
+            keep = (i != j) & ((self.layers[j] == settings.LEO_ORBIT_HEIGHT) | (i < j))
+            firsts.append(i[keep])
+            seconds.append(j[keep])
+            lengths.append(self.ecef[i[keep]] - self.ecef[j[keep]])
+            lengths[-1] = np.linalg.norm(lengths[-1], axis=1)
+
+        if not firsts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+        i, j, length = np.concatenate(firsts), np.concatenate(seconds), np.concatenate(lengths)
+        # Drop the links whose line of sight goes through the Earth.
+        visible = earth_occlusion_mask(self.ecef[i], self.ecef[j])
+        i, j, length = i[visible], j[visible], length[visible]
+        swap = i > j
+        i[swap], j[swap] = j[swap], i[swap]
+        return i, j, length
+
+    def edges(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            cost_function: str = "distance",
+            config: SimulationConfig = None
+    ) -> dict[tuple[tuple, tuple], float]:
+        """ Builds the edges of the last propagation in the format of
+            get_edges_between_nodes().
+
+            :param all_satellite_positions: The positions of all satellites, in
+            the order of update().
+            :param cost_function: The link budget cost function weighing the
+            edges, one of linkbudget.COST_FUNCTIONS. Defaults to 'distance'.
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: A dictionary of edges between nodes with their weights.
+        """
+        if config is None:
+            config = SimulationConfig.from_settings()
+        i, j, length = self.candidate_links()
+        leo_i = self.layers[i] == settings.LEO_ORBIT_HEIGHT
+        leo_j = self.layers[j] == settings.LEO_ORBIT_HEIGHT
+        hop_cost = np.where(leo_i & leo_j, config.leo_leo_hop_cost,
+                            np.where(leo_i | leo_j, config.leo_meo_hop_cost,
+                                     config.meo_meo_hop_cost))
+        weights = link_costs(link_budget(length), cost_function, hop_cost, config) \
+            if cost_function != "distance" else length / KM_PER_PIXEL * hop_cost
+        return {(all_satellite_positions[u], all_satellite_positions[v]): w_uv
+                for u, v, w_uv in zip(i.tolist(), j.tolist(), weights.tolist())}
+
+    def uplinks(
+            self,
+            endpoint_positions: list[tuple[float, float, int]],
+            all_satellite_positions: list[tuple[float, float, int]],
+            node_cost: dict[tuple, float]
+    ) -> list[tuple[tuple, tuple]]:
+        """ Finds the uplink of every ground station like
+            closest_leo_nodes_to_endpoints(), among the LEO satellites above the
+            station's minimum elevation and by slant range.
+
+            :param endpoint_positions: The positions of the ground stations.
+            :param all_satellite_positions: The positions of all satellites, in
+            the order of update().
+            :param node_cost: A dictionary of the cost of every satellite.
+            :return: A list of (uplink position, ground station position) tuples.
+            :raises LookupError: If a station sees no LEO satellite.
+        """
+        leo = np.nonzero(self.layers == settings.LEO_ORBIT_HEIGHT)[0]
+        stations = map_to_ecef([p[0] for p in endpoint_positions],
+                               [p[1] for p in endpoint_positions]).reshape(-1, 3)
+        satellites = self.ecef[leo]
+        visible = elevation_mask(stations, satellites)
+        slant_range = np.linalg.norm(satellites[None] - stations[:, None], axis=2)
+        cost = np.array([node_cost[all_satellite_positions[i]] for i in leo.tolist()])
+        with np.errstate(invalid="ignore"):
+            score = np.where(visible, slant_range / KM_PER_PIXEL * cost, np.inf)
+
+        leo_nodes_endpoints_link = []
+        for endpoint, station_score in zip(endpoint_positions, score):
+            best = int(np.argmin(station_score))
+            if not station_score[best] < np.inf:
+                raise LookupError(f"ground station at {endpoint[:2]} sees no satellite")
+            leo_nodes_endpoints_link.append((all_satellite_positions[leo[best]], endpoint))
+        return leo_nodes_endpoints_link
@@ -0,0 +1,361 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : packets.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.PacketStream
+        @dataclass.PacketStats
+        propagation_delay()
+        PacketSimulator.add_stream()
+        PacketSimulator.run()
+
+    NOTES :
+        - A discrete-event engine driven by a heap of (time, sequence, event)
+          entries. Events and packets use __slots__ and are recycled through free
+          lists, so the steady state allocates next to nothing.
+        - Every link is a FIFO queue with a capacity (bits per second), a buffer
+          limit (packets) and a propagation delay derived from the math.dist()
+          length of the edge, using the map scale of the equirectangular window.
+        - The topology is a snapshot of one tick; packet latencies are orders of
+          magnitude shorter than the time it takes the constellation to move.
+        - Usage: python packets.py [--duration S] [--rate PPS] runs a headless
+          demo between the default ground stations and reports events/second.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import argparse
+import random
+import time as timer
+from collections import deque
+from dataclasses import dataclass
+from heapq import heappush, heappop
+from math import dist
+
+import numpy as np
+
+import settings
+from entities import GroundStation
+from graph import INF, build_snapshot_graph, shortest_path_tree, reconstruct_path
+from positioning import get_3D_position, closest_leo_nodes_to_endpoints
+
+# Kilometres covered by one pixel of the equirectangular map at the equator.
+KM_PER_PIXEL = 40075 / settings.WINDOW_WIDTH
+# Speed of light in vacuum (km/s).
+SPEED_OF_LIGHT = 299792.458
+
+_GENERATE = 0
+_TRANSMITTED = 1
+_ARRIVE = 2
+
+
+def propagation_delay(u: tuple, v: tuple) -> float:
+    """ Returns the propagation delay of a link between two positions.
+
+        :param u: The 3D position of one end of the link.
+        :param v: The 3D position of the other end of the link.
+        :return: The delay in seconds.
+    """
+    return dist(u, v) * KM_PER_PIXEL / SPEED_OF_LIGHT
+
+
+@dataclass
+class PacketStream:
+    """ A dataclass representing a stream of packets between two ground stations.
+
+        Attributes:
+            src (GroundStation): The ground station sending the packets.
+            dst (GroundStation): The ground station receiving the packets.
+            rate (float): Packets per second.
+            packet_size (int): Size of every packet in bits. Defaults to 12000.
+            start (float): When the stream starts (s). Defaults to 0.
+            stop (float): When the stream stops (s). Defaults to infinity.
+            poisson (bool): Whether inter-arrival times are exponential instead
+            of constant. Defaults to True.
+    """
+    src: GroundStation
+    dst: GroundStation
+    rate: float
+    packet_size: int = 12000
+    start: float = 0
+    stop: float = INF
+    poisson: bool = True
+
+
+@dataclass
+class PacketStats:
+    """ A dataclass holding the results of a packet simulation.
+
+        Attributes:
+            generated (int): Packets injected by the streams.
+            delivered (int): Packets that reached their destination.
+            dropped (int): Packets lost to a full link buffer.
+            unroutable (int): Packets of streams without a route.
+            mean_latency (float): Mean end-to-end latency (s).
+            p99_latency (float): 99th percentile end-to-end latency (s).
+            mean_queueing_delay (float): Mean time spent waiting in queues (s).
+            loss_rate (float): Share of the injected packets that were dropped.
+            events (int): Events processed.
+            events_per_second (float): Events processed per second of wall time.
+    """
+    generated: int
+    delivered: int
+    dropped: int
+    unroutable: int
+    mean_latency: float
+    p99_latency: float
+    mean_queueing_delay: float
+    loss_rate: float
+    events: int
+    events_per_second: float
+
+
+class _Event:
+    __slots__ = ("kind", "target", "packet")
+
+
+class _Packet:
+    __slots__ = ("route", "hop", "created", "enqueued", "queueing", "size")
+
+
+class _Link:
+    __slots__ = ("capacity", "delay", "buffer", "queue")
+
+    def __init__(self, capacity: float, delay: float, buffer: int) -> None:
+        self.capacity = capacity
+        self.delay = delay
+        self.buffer = buffer
+        self.queue = deque()
+
+
+class PacketSimulator:
+    """ A packet-level discrete-event simulator over the routing graph of a tick.
+        It runs headless and independently of the pygame frame loop.
+
+        :param all_satellite_positions: The positions of all satellites.
+        :param leo_satellite_positions: The positions of the LEO satellites,
+        used as uplinks.
+        :param node_cost: The cost of every node, used to route the streams.
+        :param edges: The edges between nodes, used to route the streams.
+        :param link_capacity: Capacity of the inter-satellite links (bit/s).
+        Defaults to 1e8.
+        :param ground_link_capacity: Capacity of the ground links (bit/s).
+        Defaults to 5e7.
+        :param buffer: Packets a link can hold, including the one being sent.
+        Defaults to 64.
+        :param seed: Seed of the inter-arrival times. Defaults to None.
+    """
+
+    def __init__(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            leo_satellite_positions: list[tuple[float, float, int]],
+            node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float],
+            link_capacity: float = 1e8,
+            ground_link_capacity: float = 5e7,
+            buffer: int = 64,
+            seed: int = None
+    ) -> None:
+        self._graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+        self._leo_satellite_positions = leo_satellite_positions
+        self._node_cost = node_cost
+        self._link_capacity = link_capacity
+        self._ground_link_capacity = ground_link_capacity
+        self._buffer = buffer
+        self._random = random.Random(seed)
+        self._links = {}
+        self._trees = {}
+        self._streams = []
+
+    def _link(self, u: tuple, v: tuple, capacity: float) -> _Link:
+        """ Returns the directed link between two positions, creating it once. """
+        link = self._links.get((u, v))
+        if link is None:
+            link = self._links[(u, v)] = _Link(
+                capacity, propagation_delay(u, v), self._buffer)
+        return link
+
+    def add_stream(self, stream: PacketStream) -> bool:
+        """ Routes a stream over the graph and schedules it for injection.
+
+            :param stream: The stream to add.
+            :return: Whether a route between the ground stations exists.
+        """
+        src, dst = get_3D_position(stream.src), get_3D_position(stream.dst)
+        (src_uplink, _), (dst_uplink, _) = closest_leo_nodes_to_endpoints(
+            leo_satellite_positions=self._leo_satellite_positions,
+            ground_station_positions=[src, dst],
+            node_cost=self._node_cost
+        )
+        source = self._graph.index[src_uplink]
+        target = self._graph.index[dst_uplink]
+
+        # Streams leaving from the same uplink share one search tree.
+        if source not in self._trees:
+            self._trees[source] = shortest_path_tree(self._graph, source)
+        distance, parent = self._trees[source]
+        route = None
+        if distance[target] != INF:
+            hops = [self._graph.positions[n]
+                    for n in reconstruct_path(parent, source, target)]
+            route = [self._link(src, src_uplink, self._ground_link_capacity)]
+            route += [self._link(u, v, self._link_capacity)
+                      for u, v in zip(hops, hops[1:])]
+            route.append(self._link(dst_uplink, dst, self._ground_link_capacity))
+        self._streams.append((stream, route))
+        return route is not None
+
+    def run(self, until: float) -> PacketStats:
+        """ Runs the simulation until a point in simulated time.
+
+            :param until: The simulated time to stop at (s).
+            :return: A PacketStats instance.
+        """
+        queue = []
+        event_pool = []
+        packet_pool = []
+        sequence = 0
+        latencies = []
+        queueing_delays = []
+        generated = dropped = unroutable = events = 0
+        expovariate = self._random.expovariate
+
+        def schedule(at, kind, target, packet):
+            nonlocal sequence
+            event = event_pool.pop() if event_pool else _Event()
+            event.kind = kind
+            event.target = target
+            event.packet = packet
+            heappush(queue, (at, sequence, event))
+            sequence += 1
+
+        for stream, route in self._streams:
+            schedule(stream.start, _GENERATE, (stream, route), None)
+
+        started = timer.perf_counter()
+        while queue:
+            now, _, event = heappop(queue)
+            if now > until:
+                break
+            events += 1
+            kind, target, packet = event.kind, event.target, event.packet
+            event.target = event.packet = None
+            event_pool.append(event)
+
+            if kind == _GENERATE:
+                stream, route = target
+                interval = expovariate(stream.rate) if stream.poisson else 1 / stream.rate
+                if now + interval < stream.stop:
+                    schedule(now + interval, _GENERATE, target, None)
+                generated += 1
+                if route is None:
+                    unroutable += 1
+                    continue
+                packet = packet_pool.pop() if packet_pool else _Packet()
+                packet.route = route
+                packet.hop = 0
+                packet.created = now
+                packet.queueing = 0
+                packet.size = stream.packet_size
+                link = route[0]
+            elif kind == _TRANSMITTED:
+                # The head of the queue has left, start sending the next one.
+                link = target
+                link.queue.popleft()
+                schedule(now + link.delay, _ARRIVE, None, packet)
+                if link.queue:
+                    waiting = link.queue[0]
+                    waiting.queueing += now - waiting.enqueued
+                    schedule(now + waiting.size / link.capacity,
+                             _TRANSMITTED, link, waiting)
+                continue
+            else:
+                packet.hop += 1
+                if packet.hop == len(packet.route):
+                    latencies.append(now - packet.created)
+                    queueing_delays.append(packet.queueing)
+                    packet.route = None
+                    packet_pool.append(packet)
+                    continue
+                link = packet.route[packet.hop]
+
+            # Put the packet on its next link, dropping it if the buffer is full.
+            if len(link.queue) >= link.buffer:
+                dropped += 1
+                packet.route = None
+                packet_pool.append(packet)
+                continue
+            packet.enqueued = now
+            link.queue.append(packet)
+            if len(link.queue) == 1:
+                schedule(now + packet.size / link.capacity, _TRANSMITTED, link, packet)
+        elapsed = timer.perf_counter() - started
+
+        latencies = np.array(latencies)
+        return PacketStats(
+            generated=generated,
+            delivered=len(latencies),
+            dropped=dropped,
+            unroutable=unroutable,
+            mean_latency=float(latencies.mean()) if len(latencies) else INF,
+            p99_latency=float(np.percentile(latencies, 99)) if len(latencies) else INF,
+            mean_queueing_delay=float(np.mean(queueing_delays)) if queueing_delays else 0,
+            loss_rate=dropped / generated if generated else 0,
+            events=events,
+            events_per_second=events / elapsed if elapsed > 0 else INF
+        )
+
+
+if __name__ == "__main__":
+    from entities import Congestion
+    from positioning import initialize_heatmap, generate_congestion_heatmap
+    from simulation import build_constellations, default_ground_stations, run_pipeline
+
+    parser = argparse.ArgumentParser(description="Run a headless packet simulation.")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="simulated seconds")
+    parser.add_argument("--rate", type=float, default=2000,
+                        help="packets per second of each direction")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    np.random.seed(args.seed)
+    congestion = Congestion()
+    initialize_heatmap(congestion)
+    generate_congestion_heatmap(congestion)
+    leo_orbit_constellation, meo_orbit_constellation = build_constellations()
+    endpoints = default_ground_stations()
+    tick = run_pipeline(leo_orbit_constellation, meo_orbit_constellation,
+                        endpoints, congestion, 0)
+
+    simulator = PacketSimulator(
+        tick.leo_satellite_positions + tick.meo_satellite_positions,
+        tick.leo_satellite_positions,
+        tick.node_cost,
+        tick.edges,
+        seed=args.seed
+    )
+    simulator.add_stream(PacketStream(endpoints[0], endpoints[-1], args.rate))
+    simulator.add_stream(PacketStream(endpoints[-1], endpoints[0], args.rate))
+    print(simulator.run(args.duration))
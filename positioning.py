@@ -20,7 +20,8 @@
         refresh_congestion_heatmap()
 
     NOTES :
-        - ...
+        - Every function takes an optional SimulationConfig, built from
+          settings.py when it is not given.
 
     AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
 
@@ -39,34 +40,52 @@
     1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
 """
 
-from math import sin, pi, radians, dist
+from math import sin, radians, dist
 
 import numpy as np
-import pygame
 
 import settings
+from config import SimulationConfig
 from entities import LEOSatellite, MEOSatellite, GroundStation, Congestion
+from heatmap import CongestionBand
 
 
-def update_position(satellite: LEOSatellite | MEOSatellite) -> None:
+def update_position(
+        satellite: LEOSatellite | MEOSatellite,
+        ticks: float = None,
+        config: SimulationConfig = None
+) -> None:
     """ This function updates the position of a satellite based on the program
         time and a predetermined orbit equation.
         
         :param satellite: An instance of LEOSatellite or MEOSatellite.
+        :param ticks: The program time in milliseconds. Defaults to None, in
+        which case the pygame clock is read. Passing an explicit value makes the
+        position reproducible (e.g. when replaying a recorded run).
+        :param config: The simulation config. Defaults to None (settings.py).
     """
+    # Use the pygame clock unless the caller supplies a program time.
+    if ticks is None:
+        # Imported here so the engine runs headless without pygame.
+        import pygame
+        ticks = pygame.time.get_ticks()
+    if config is None:
+        config = SimulationConfig.from_settings()
     # Get program tickrate/clockspeed to calculate our positional values
-    time = pygame.time.get_ticks() * satellite.speed * \
-        settings.SIMULATION_SPEED_MULTIPLIER + satellite.delay
+    time = ticks * satellite.speed * \
+        config.simulation_speed_multiplier + satellite.delay
 
+    angular_frequency = config.leo_angular_frequency \
+        if isinstance(satellite, LEOSatellite) else config.meo_angular_frequency
     # Utilize the sinwave formula to get y-coordinate, using an offset of
     # 'WINDOW_HEIGHT / 2' to center the y-coordinate on the screen.
-    satellite.y = settings.AMPLITUDE * \
-        sin(2 * pi * satellite.frequency * time +
-            radians(satellite.phase)) + settings.WINDOW_HEIGHT / 2
+    satellite.y = config.amplitude * \
+        sin(angular_frequency * time +
+            radians(satellite.phase)) + config.half_height
 
     # Set the x-coordinate to be the time value with WINDOW_WIDTH modulus to
     # prevent x-coordinate from going over WINDOW_WIDTH value.
-    satellite.x = time % settings.WINDOW_WIDTH
+    satellite.x = time % config.window_width
 
 
 def get_2D_position(
@@ -94,7 +113,8 @@ def get_3D_position(
 def closest_leo_nodes_to_endpoints(
         leo_satellite_positions: list[tuple[float, float, int]],
         ground_station_positions: list[tuple[float, float, int]],
-        node_cost: dict[tuple, float]
+        node_cost: dict[tuple, float],
+        config: SimulationConfig = None
 ) -> list[tuple[tuple, tuple]]:
     """
         This function finds the closest LEO satellite node for each ground station
@@ -107,26 +127,35 @@ def closest_leo_nodes_to_endpoints(
         :param node_cost: A dictionary with keys as tuples representing the
         positions of LEO satellites and values as floats representing the
         cost of using that satellite.
+        :param config: The simulation config. Defaults to None (settings.py).
         :return: A list of tuples where each tuple contains two tuples representing 
         the positions of the closest LEO satellite node andthe corresponding ground 
         station endpoint.
+        :raises LookupError: If a ground station has no usable LEO satellite
+        within reach.
     """
+    if config is None:
+        config = SimulationConfig.from_settings()
+    leo_max_reachability = config.leo_max_reachability
     # Initialize coordinate pair list.
     leo_nodes_endpoints_link = []
     # Find nearest node for each endpoint.
     for endpoint in ground_station_positions:
         # Initial the minimum distance variable with infinity value.
         min_dist = float("inf")
+        endpoint_node = None
         # Loop through each node to find nearest to endpoint.
         for node in leo_satellite_positions:
             # Get distance between node and endpoint.
             distance_to_endpoint = dist(endpoint, node)
             # If the node is a better fit than previously best fit node.
             if (distance_to_endpoint * node_cost[node] < min_dist) \
-                    and distance_to_endpoint < settings.LEO_MAX_REACHABILITY:
+                    and distance_to_endpoint < leo_max_reachability:
                 # Set it as the new nearest node and save its position.
                 min_dist = distance_to_endpoint * node_cost[node]
                 endpoint_node = node
+        if endpoint_node is None:
+            raise LookupError(f"ground station at {endpoint[:2]} has no satellite in reach")
         # Add node and endpoint positions to list
         leo_nodes_endpoints_link.append((endpoint_node, endpoint))
     # Return nearest nodes for each endpoints
@@ -135,6 +164,7 @@ def closest_leo_nodes_to_endpoints(
 
 def get_edges_between_nodes(
         all_satellite_positions: list[tuple[float, float, int]],
+        config: SimulationConfig = None
 ) -> dict[tuple[tuple, tuple], float]:
     """ Calculates the edges between nodes in a graph.
 
@@ -144,65 +174,102 @@ def get_edges_between_nodes(
         two nodes, and differs if both nodes are in LEO orbit, MEO orbit, or
         seperate orbits.
 
+        Reachability is checked in NumPy for every pair of orbits at once:
+        candidates come from a sweep along x, are rejected on their y offset,
+        then compared by squared distance, and only the accepted edges get a
+        square root.
+
         :param all_satellite_positions: A list of tuples representing the 
         positions of all satellites.
         :type all_satellite_positions: list[tuple[float, float, int]]
+        :param config: The simulation config. Defaults to None (settings.py).
+        :type config: SimulationConfig
         :return: A dictionary of edges between nodes with their respective costs.
         :rtype: dict[tuple[tuple, tuple], float]
     """
-    edges = {}
-    # Iterate through all node positions.
-    for i in range(len(all_satellite_positions)):
-        # Iterate through all other node positions, not previously iterated in parent loop.
-        for j in range(i+1, len(all_satellite_positions)):
-            if all_satellite_positions[i] == all_satellite_positions[j]:
-                # Skip if the two nodes are the sames
-                continue
-
-            # Calculate the distance between the two nodes.
-            distance_between_nodes = dist(
-                all_satellite_positions[i], all_satellite_positions[j])
-
-            # Check if both nodes are in LEO orbit.
-            if (all_satellite_positions[i][2] == settings.LEO_ORBIT_HEIGHT) and (
-                    all_satellite_positions[j][2] == settings.LEO_ORBIT_HEIGHT):
-                # Check if the distance is within reachability and the edge doesn't already exist.
-                if (distance_between_nodes <= settings.LEO_MAX_REACHABILITY) and (
-                        (all_satellite_positions[j], all_satellite_positions[i]) not in edges):
-                    # Add the edge with a cost of twice the distance between the nodes.
-                    edges[(all_satellite_positions[i], all_satellite_positions[j])
-                          ] = distance_between_nodes * settings.LEO_LEO_HOP_COST
-
-            # Check if both nodes are in MEO orbit
-            elif (all_satellite_positions[i][2] == settings.MEO_ORBIT_HEIGHT) and (
-                    all_satellite_positions[j][2] == settings.MEO_ORBIT_HEIGHT):
-                # Check if the distance is within reachability and the edge doesn't already exist.
-                if (distance_between_nodes <= settings.MEO_MAX_REACHABILITY) and (
-                        (all_satellite_positions[j], all_satellite_positions[i]) not in edges):
-                    # Add the edge with a cost equal to the distance between the nodes.
-                    edges[(all_satellite_positions[i], all_satellite_positions[j])
-                          ] = distance_between_nodes * settings.MEO_MEO_HOP_COST
-
-            # If one node is in LEO orbit and the other is in MEO orbit.
-            else:
-                # Calculate the distance between the two nodes ignoring the z-coordinate.
-                distance_between_nodes = dist(
-                    all_satellite_positions[i][:-1], all_satellite_positions[j][:-1])
-                # Check if the distance is within reachability and the edge doesn't already exist.
-                if (distance_between_nodes <= settings.MEO_MAX_REACHABILITY) and (
-                        (all_satellite_positions[j], all_satellite_positions[i]) not in edges):
-                    # Include the z-coordinate in the distance metric.
-                    distance_between_nodes = dist(
-                        all_satellite_positions[i], all_satellite_positions[j])
-                    # Add the edge with a cost of 2.5 times the distance between the nodes.
-                    edges[(all_satellite_positions[i], all_satellite_positions[j])
-                          ] = distance_between_nodes * settings.LEO_MEO_HOP_COST
-    return edges
+    if config is None:
+        config = SimulationConfig.from_settings()
+    # Satellites sharing a position are one node, keyed in order of appearance.
+    nodes = list(dict.fromkeys(all_satellite_positions))
+    if len(nodes) < 2:
+        return {}
+    points = np.array(nodes, dtype=float)
+    leo = np.nonzero(points[:, 2] == settings.LEO_ORBIT_HEIGHT)[0]
+    meo = np.nonzero(points[:, 2] == settings.MEO_ORBIT_HEIGHT)[0]
+    # Pairs that are neither both LEO nor both MEO follow the LEO to MEO rules.
+    other = np.setdiff1d(np.arange(len(nodes)), np.concatenate([leo, meo]))
+
+    firsts, seconds, hop_costs = [], [], []
+    for a, b, reach, reach_squared, planar, hop_cost in (
+            (leo, leo, config.leo_max_reachability, config.leo_reach_squared, False,
+             config.leo_leo_hop_cost),
+            (meo, meo, config.meo_max_reachability, config.meo_reach_squared, False,
+             config.meo_meo_hop_cost),
+            (leo, meo, config.meo_max_reachability, config.meo_reach_squared, True,
+             config.leo_meo_hop_cost),
+            (other, np.arange(len(nodes)), config.meo_max_reachability,
+             config.meo_reach_squared, True, config.leo_meo_hop_cost)):
+        i, j = _reachable_pairs(points, a, b, reach, reach_squared, planar)
+        firsts.append(np.minimum(i, j))
+        seconds.append(np.maximum(i, j))
+        hop_costs.append(np.full(len(i), hop_cost))
+
+    i, j = np.concatenate(firsts), np.concatenate(seconds)
+    hop_costs = np.concatenate(hop_costs)
+    # Keep every pair once, in the order the pairwise loop would find them.
+    _, first = np.unique(i * len(nodes) + j, return_index=True)
+    i, j, hop_costs = i[first], j[first], hop_costs[first]
+    # The square root is only taken for the accepted edges.
+    return {(nodes[u], nodes[v]): dist(nodes[u], nodes[v]) * w
+            for u, v, w in zip(i.tolist(), j.tolist(), hop_costs.tolist())}
+
+
+def _reachable_pairs(
+        points: np.ndarray,
+        a: np.ndarray,
+        b: np.ndarray,
+        reach: float,
+        reach_squared: float,
+        planar: bool
+) -> tuple[np.ndarray, np.ndarray]:
+    """ Finds the pairs of nodes of two groups within reach of each other.
+        Candidates are found by a sweep along x, rejected on their y offset,
+        and only then compared by squared distance.
+
+        :param points: The (N, 3) node positions.
+        :param a: The node indices of the first group.
+        :param b: The node indices of the second group.
+        :param reach: The maximum distance of a pair.
+        :param reach_squared: The squared maximum distance.
+        :param planar: Whether to ignore the altitude in the distance.
+        :return: The node indices of both ends of every distinct pair.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # Widen the window slightly so rounding never drops a candidate.
+    margin = reach * (1 + 1e-9)
+    order = b[np.argsort(points[b, 0], kind="stable")]
+    sorted_x = points[order, 0]
+    low = np.searchsorted(sorted_x, points[a, 0] - margin, side="left")
+    high = np.searchsorted(sorted_x, points[a, 0] + margin, side="right")
+    counts = high - low
+    i = np.repeat(a, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    j = order[np.repeat(low, counts) + offsets]
+
+    keep = (i != j) & (np.abs(points[i, 1] - points[j, 1]) <= margin)
+    i, j = i[keep], j[keep]
+    offset = points[i] - points[j]
+    if planar:
+        offset = offset[:, :2]
+    keep = np.einsum("ij,ij->i", offset, offset) <= reach_squared
+    return i[keep], j[keep]
 
 
 def get_node_costs(
         all_satellite_positions: list[tuple[float, float, int]],
-        congestion_map: dict[tuple[tuple, tuple], int]
+        congestion_map: dict[tuple[tuple, tuple], int] | np.ndarray | CongestionBand,
+        config: SimulationConfig = None
 ) -> dict[tuple, float]:
     """ Calculates the cost for each node based on its position and the 
         congestion level of the cell it is in.
@@ -213,9 +280,21 @@ def get_node_costs(
         :param congestion_map: A dictionary representing the congestion map. The 
         keys are tuples representing the top left and bottom right points of each 
         cell. The values are integers representing the congestion level of each cell.
+        A (rows, columns) array of congestion levels spanning the whole window,
+        such as a slice of a CongestionTrace, is also accepted and read in place,
+        as is a CongestionBand. In both, a level of 0 marks a cell that is not
+        part of the heatmap and costs infinity.
+        :param config: The simulation config. Defaults to None (settings.py).
         :return: A dictionary where the keys are tuples representing the positions 
         of all nodes and the values are floats representing the cost for each node.
     """
+    if config is None:
+        config = SimulationConfig.from_settings()
+    if isinstance(congestion_map, np.ndarray):
+        return _get_node_costs_from_grid(all_satellite_positions, congestion_map, config)
+    if isinstance(congestion_map, CongestionBand):
+        return congestion_map.node_costs(all_satellite_positions, config)
+
     # Set the initial cost for each node to infinity.
     node_cost = {all_satellite_positions[i]: float(
         "inf") for i in range(len(all_satellite_positions))}
@@ -229,11 +308,39 @@ def get_node_costs(
                     cell_top_left_points[1] <= all_satellite_positions[i][1] <= cell_bottom_right_points[1]:
                 # Update the cost of the node based on the congestion level of the cell.
                 node_cost[all_satellite_positions[i]
-                          ] = settings.WINDOW_HEIGHT / 2 * congestion_level
+                          ] = config.half_height * congestion_level
                 break
     return node_cost
 
 
+def _get_node_costs_from_grid(
+        all_satellite_positions: list[tuple[float, float, int]],
+        congestion_grid: np.ndarray,
+        config: SimulationConfig
+) -> dict[tuple, float]:
+    """ Looks the node costs up in a dense congestion grid covering the window.
+        Nodes outside of the window, or in a cell of level 0 (not part of the
+        heatmap, as in congestion_map_to_grid()), cost infinity.
+    """
+    if not all_satellite_positions:
+        return {}
+    row_num, column_num = congestion_grid.shape
+    positions = np.asarray(all_satellite_positions, dtype=float)
+    # Map every position onto its cell, the far window edges belong to the last cell.
+    cols = np.floor(positions[:, 0] * column_num / settings.WINDOW_WIDTH).astype(int)
+    rows = np.floor(positions[:, 1] * row_num / settings.WINDOW_HEIGHT).astype(int)
+    inside = (positions[:, 0] >= 0) & (positions[:, 0] <= settings.WINDOW_WIDTH) & \
+        (positions[:, 1] >= 0) & (positions[:, 1] <= settings.WINDOW_HEIGHT)
+    cols = np.clip(cols, 0, column_num - 1)
+    rows = np.clip(rows, 0, row_num - 1)
+
+    levels = np.zeros(len(positions))
+    levels[inside] = congestion_grid[rows[inside], cols[inside]]
+    costs = np.full(len(positions), float("inf"))
+    costs[levels > 0] = config.half_height * levels[levels > 0]
+    return dict(zip(all_satellite_positions, costs.tolist()))
+
+
 def initialize_heatmap(congestion: Congestion) -> None:
     """ Initializes the heatmap by calculating the cell size, number of 
         columns and rows for the cell grid based on the program window's 
@@ -259,22 +366,25 @@ def initialize_heatmap(congestion: Congestion) -> None:
     congestion.row_num = int(settings.WINDOW_HEIGHT / congestion.cell_size)
 
 
-def generate_congestion_heatmap(congestion) -> dict:
+def generate_congestion_heatmap(congestion, config: SimulationConfig = None) -> dict:
     """ Generates a congestion heatmap by assigning random congestion levels 
         to each cell in the grid.
 
         :param congestion: An instance of the Congestion class.
+        :param config: The simulation config. Defaults to None (settings.py).
         :return: A dictionary representing the congestion map. The keys are 
         tuples representing the top left and bottom right points of each cell. 
         The values are integers representing the congestion level of each cell.
     """
+    if config is None:
+        config = SimulationConfig.from_settings()
     initialize_heatmap(congestion)
     # Go through each cell in the grid
     for col in range(congestion.column_num):
         for row in range(congestion.row_num):
             # Ensure that we don't create unnecessary cells where satellites won't travel.
-            if (row * congestion.cell_size) < (settings.WINDOW_HEIGHT / 2 - settings.AMPLITUDE) or (
-                    row * congestion.cell_size) >= (settings.WINDOW_HEIGHT / 2 + settings.AMPLITUDE):
+            if (row * congestion.cell_size) < config.band_top or (
+                    row * congestion.cell_size) >= config.band_bottom:
                 continue
             else:
                 scale = 1.0
@@ -282,7 +392,7 @@ def generate_congestion_heatmap(congestion) -> dict:
                 random_numbers = np.random.exponential(scale, size)
                 # Scale the values to be within the desired range
                 random_numbers = random_numbers / \
-                    np.max(random_numbers) * settings.CONGESTION_COMPLEXITY + 1
+                    np.max(random_numbers) * config.congestion_complexity + 1
                 # Round the values to the nearest integer
                 random_numbers = np.round(random_numbers)
                 # Assign the first random number in the list to the congestion map cell
@@ -294,15 +404,21 @@ def generate_congestion_heatmap(congestion) -> dict:
     return congestion.congestion_map
 
 
-def refresh_congestion_heatmap(congestion: Congestion) -> dict:
+def refresh_congestion_heatmap(
+        congestion: Congestion,
+        config: SimulationConfig = None
+) -> dict:
     """ Refreshes the congestion heatmap by randomly changing the congestion 
         levels of up to 2% of all cells.
 
         :param congestion: An instance of the Congestion class.
+        :param config: The simulation config. Defaults to None (settings.py).
         :return: A dictionary representing the updated congestion map. The keys 
         are tuples representing the top left and bottom right points of each cell. 
         The values are integers representing the congestion level of each cell.
     """
+    if config is None:
+        config = SimulationConfig.from_settings()
     # Change up to 2% of all cells inside the heatmap.
     cells_to_change = np.random.randint(
         0, int(congestion.column_num * congestion.row_num / 50))
@@ -313,15 +429,15 @@ def refresh_congestion_heatmap(congestion: Congestion) -> dict:
         col_to_change = np.random.randint(1, congestion.column_num) - 1
 
         # Makes sure that the select cell is within
-        if not ((row_to_change * congestion.cell_size) < (settings.WINDOW_HEIGHT / 2 - settings.AMPLITUDE) or (
-                row_to_change * congestion.cell_size) >= (settings.WINDOW_HEIGHT / 2 + settings.AMPLITUDE)):
+        if not ((row_to_change * congestion.cell_size) < config.band_top or (
+                row_to_change * congestion.cell_size) >= config.band_bottom):
             # The chosen cell in the grid
             scale = 1.0
             size = congestion.column_num * congestion.row_num
             random_numbers = np.random.exponential(scale, size)
             # Scale the values to be within the desired range
             random_numbers = random_numbers / \
-                np.max(random_numbers) * settings.CONGESTION_COMPLEXITY + 1
+                np.max(random_numbers) * config.congestion_complexity + 1
             # Round the values to the nearest integer
             random_numbers = np.round(random_numbers)
             # Assign the first random number in the list to the congestion map cell
@@ -0,0 +1,395 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : recording.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        settings_snapshot()
+        congestion_map_to_grid()
+        congestion_from_grid()
+        SimulationRecorder.record_tick()
+        SimulationRecorder.close()
+        SimulationReplayer.settings_mismatches()
+        SimulationReplayer.initial_congestion()
+        SimulationReplayer.frames()
+        record_headless_run()
+        replay_pipeline()
+
+    NOTES :
+        - A recording holds the seed, the settings, the scenario, the initial
+          congestion grid and the per-tick congestion deltas. Satellite positions
+          are left out as they are recomputed from the recorded program time.
+          Recordings without a scenario replay the default constellations and
+          ground stations.
+        - File layout (little-endian):
+              magic (8 bytes) | header size (uint32) | JSON header |
+              initial grid (row_num * column_num uint8, 0 = no cell) |
+              chunk* | end tag
+          where each chunk is a 'CHNK' tag, the tick count, the raw size and the
+          compressed size (uint32 each) followed by a zlib stream of ticks. Every
+          tick is a float64 program time, a uint32 delta count and that many
+          (uint16 row, uint16 column, uint8 level) records.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import json
+import struct
+import zlib
+from typing import Iterator
+
+import numpy as np
+
+import settings
+from entities import Congestion
+from heatmap import CongestionBand
+from positioning import initialize_heatmap, generate_congestion_heatmap, \
+    refresh_congestion_heatmap
+from scenario import ScenarioDefinition, scenario_from_dict
+from simulation import PipelineResult, build_constellations, \
+    default_ground_stations, run_pipeline
+
+RECORDING_MAGIC = b"SNSREC\x00\x01"
+RECORDING_VERSION = 1
+
+_CHUNK_TAG = b"CHNK"
+_END_TAG = b"END\x00"
+_SIZE = struct.Struct("<I")
+_CHUNK_HEADER = struct.Struct("<4sIII")
+_TICK_HEADER = struct.Struct("<dI")
+_DELTA_DTYPE = np.dtype([("row", "<u2"), ("col", "<u2"), ("level", "u1")])
+
+
+def settings_snapshot() -> dict:
+    """ Captures every setting of the simulation in a JSON friendly form.
+
+        :return: A dictionary mapping each setting name to its value.
+    """
+    snapshot = {name: getattr(settings, name)
+                for name in dir(settings) if name.isupper()}
+    # Round trip through JSON so tuples compare equal to the stored lists.
+    return json.loads(json.dumps(snapshot))
+
+
+def congestion_map_to_grid(congestion: Congestion | CongestionBand) -> np.ndarray:
+    """ Converts the rectangle keyed congestion map into a dense grid.
+
+        :param congestion: An initialized instance of the Congestion class, or a
+        CongestionBand.
+        :return: A (row_num, column_num) uint8 array of congestion levels, where
+        0 marks a cell that is not part of the congestion map.
+    """
+    if isinstance(congestion, CongestionBand):
+        return congestion.to_grid()
+    grid = np.zeros((congestion.row_num, congestion.column_num), dtype=np.uint8)
+    for (cell_top_left_points, _), congestion_level in congestion.congestion_map.items():
+        row = int(round(cell_top_left_points[1] / congestion.cell_size))
+        col = int(round(cell_top_left_points[0] / congestion.cell_size))
+        grid[row, col] = congestion_level
+    return grid
+
+
+def congestion_from_grid(
+        grid: np.ndarray,
+        congestion: Congestion = None
+) -> Congestion:
+    """ Rebuilds the rectangle keyed congestion map from a dense grid.
+
+        Cells are inserted in the same column-major order as
+        generate_congestion_heatmap() so node costs are resolved identically.
+
+        :param grid: A (row_num, column_num) uint8 array of congestion levels.
+        :param congestion: The Congestion instance to fill. Defaults to None, in
+        which case a new one is initialized.
+        :return: The filled Congestion instance.
+    """
+    if congestion is None:
+        congestion = Congestion()
+        initialize_heatmap(congestion)
+    congestion.congestion_map = {}
+    for col in range(congestion.column_num):
+        for row in range(congestion.row_num):
+            if grid[row, col]:
+                congestion.congestion_map[_cell_key(congestion, row, col)] = float(
+                    grid[row, col])
+    return congestion
+
+
+def _cell_key(congestion: Congestion, row: int, col: int) -> tuple[tuple, tuple]:
+    """ Returns the congestion map key of a grid cell. """
+    return ((col*congestion.cell_size, row*congestion.cell_size), ((
+        col+1)*congestion.cell_size, (row+1)*congestion.cell_size))
+
+
+class SimulationRecorder:
+    """ Writes the seed, settings and per-tick congestion deltas of a run into a
+        compact, chunked binary log.
+
+        :param path: The file to write the recording to.
+        :param seed: The seed np.random was initialized with for this run.
+        :param congestion: The congestion heatmap at the start of the run.
+        :param chunk_ticks: How many ticks are buffered before a chunk is
+        compressed and written. Defaults to 256.
+        :param scenario: The scenario of the run. Defaults to None (the default
+        constellations and ground stations).
+    """
+
+    def __init__(
+            self,
+            path: str,
+            seed: int,
+            congestion: Congestion | CongestionBand,
+            chunk_ticks: int = 256,
+            scenario: ScenarioDefinition = None
+    ) -> None:
+        if chunk_ticks <= 0:
+            raise ValueError("'chunk_ticks' must be above 0")
+
+        self._file = open(path, "wb")
+        self._chunk_ticks = chunk_ticks
+        self._pending = []
+        self._grid = congestion_map_to_grid(congestion)
+
+        header = json.dumps({
+            "version": RECORDING_VERSION,
+            "seed": seed,
+            "settings": settings_snapshot(),
+            "row_num": congestion.row_num,
+            "column_num": congestion.column_num,
+            "cell_size": congestion.cell_size,
+            "scenario": scenario.to_dict() if scenario is not None else None,
+        }).encode("utf-8")
+        self._file.write(RECORDING_MAGIC)
+        self._file.write(_SIZE.pack(len(header)))
+        self._file.write(header)
+        self._file.write(self._grid.tobytes())
+
+    def record_tick(self, ticks: float, congestion: Congestion | CongestionBand) -> None:
+        """ Records the program time of a tick and the congestion cells that
+            changed since the previous tick.
+
+            :param ticks: The program time (ms) the tick is computed for.
+            :param congestion: The congestion heatmap used for the tick.
+        """
+        grid = congestion_map_to_grid(congestion)
+        rows, cols = np.nonzero(grid != self._grid)
+
+        deltas = np.empty(len(rows), dtype=_DELTA_DTYPE)
+        deltas["row"] = rows
+        deltas["col"] = cols
+        deltas["level"] = grid[rows, cols]
+
+        self._pending.append(_TICK_HEADER.pack(ticks, len(deltas)))
+        self._pending.append(deltas.tobytes())
+        self._grid = grid
+
+        # Every tick adds a header and a delta block to the buffer.
+        if len(self._pending) >= 2 * self._chunk_ticks:
+            self._flush()
+
+    def _flush(self) -> None:
+        """ Compresses the buffered ticks and writes them as one chunk. """
+        if not self._pending:
+            return
+        raw = b"".join(self._pending)
+        compressed = zlib.compress(raw)
+        self._file.write(_CHUNK_HEADER.pack(
+            _CHUNK_TAG, len(self._pending) // 2, len(raw), len(compressed)))
+        self._file.write(compressed)
+        self._pending = []
+
+    def close(self) -> None:
+        """ Writes the remaining ticks and terminates the recording. """
+        if self._file.closed:
+            return
+        self._flush()
+        self._file.write(_END_TAG)
+        self._file.close()
+
+    def __enter__(self) -> "SimulationRecorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class SimulationReplayer:
+    """ Streams a recording written by SimulationRecorder back, one chunk at a
+        time, so long runs never have to fit in memory.
+
+        :param path: The recording to read.
+        :raises ValueError: If the file is not a recording of a known version.
+
+        Attributes:
+            scenario (ScenarioDefinition): The scenario of the run, None if it
+            used the default constellations and ground stations.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as file:
+            if file.read(len(RECORDING_MAGIC)) != RECORDING_MAGIC:
+                raise ValueError(f"'{path}' is not a simulation recording")
+            (header_size,) = _SIZE.unpack(file.read(_SIZE.size))
+            header = json.loads(file.read(header_size).decode("utf-8"))
+            if header["version"] != RECORDING_VERSION:
+                raise ValueError(
+                    f"unsupported recording version {header['version']}")
+
+            self.seed = header["seed"]
+            self.settings = header["settings"]
+            self.row_num = header["row_num"]
+            self.column_num = header["column_num"]
+            self.cell_size = header["cell_size"]
+            # Recordings made before scenarios were stored have no entry.
+            self.scenario = None
+            if header.get("scenario") is not None:
+                self.scenario = scenario_from_dict(header["scenario"], path)
+            self._initial_grid = np.frombuffer(
+                file.read(self.row_num * self.column_num), dtype=np.uint8
+            ).reshape(self.row_num, self.column_num).copy()
+            self._data_offset = file.tell()
+
+    def settings_mismatches(self) -> list[str]:
+        """ Lists the settings that differ between the recording and the
+            current settings module.
+
+            :return: A list of the names of the differing settings.
+        """
+        current = settings_snapshot()
+        names = set(current) | set(self.settings)
+        return sorted(name for name in names
+                      if current.get(name) != self.settings.get(name))
+
+    def initial_congestion(self) -> Congestion:
+        """ Rebuilds the congestion heatmap the run started with.
+
+            :return: A new Congestion instance.
+        """
+        congestion = Congestion()
+        congestion.cell_size = self.cell_size
+        congestion.column_num = self.column_num
+        congestion.row_num = self.row_num
+        return congestion_from_grid(self._initial_grid, congestion)
+
+    def frames(self) -> Iterator[tuple[float, Congestion]]:
+        """ Yields the program time and congestion heatmap of every recorded
+            tick. The same Congestion instance is updated in place between ticks.
+
+            :return: An iterator of (ticks, congestion) tuples.
+            :raises ValueError: If the recording is truncated or corrupt.
+        """
+        congestion = self.initial_congestion()
+        with open(self.path, "rb") as file:
+            file.seek(self._data_offset)
+            while True:
+                tag = file.read(len(_END_TAG))
+                if tag == _END_TAG:
+                    return
+                if len(tag) < len(_CHUNK_TAG):
+                    raise ValueError(f"'{self.path}' is truncated")
+                tag += file.read(_CHUNK_HEADER.size - len(tag))
+                _, tick_count, raw_size, compressed_size = _CHUNK_HEADER.unpack(tag)
+                raw = zlib.decompress(file.read(compressed_size))
+                if len(raw) != raw_size:
+                    raise ValueError(f"'{self.path}' has a corrupt chunk")
+
+                offset = 0
+                for _ in range(tick_count):
+                    ticks, delta_count = _TICK_HEADER.unpack_from(raw, offset)
+                    offset += _TICK_HEADER.size
+                    deltas = np.frombuffer(
+                        raw, dtype=_DELTA_DTYPE, count=delta_count, offset=offset)
+                    offset += deltas.nbytes
+
+                    # Apply the changed cells onto the heatmap.
+                    for row, col, level in deltas.tolist():
+                        key = _cell_key(congestion, row, col)
+                        if level:
+                            congestion.congestion_map[key] = float(level)
+                        else:
+                            congestion.congestion_map.pop(key, None)
+                    yield ticks, congestion
+
+
+def record_headless_run(
+        path: str,
+        seed: int,
+        tick_count: int,
+        chunk_ticks: int = 256,
+        scenario: ScenarioDefinition = None
+) -> None:
+    """ Records a run without a display, stepping the program time by one
+        frame (1000 / FPS ms) per tick. Useful to generate identical inputs for
+        benchmarking routing algorithms.
+
+        :param path: The file to write the recording to.
+        :param seed: The seed to initialize np.random with.
+        :param tick_count: How many ticks to record.
+        :param chunk_ticks: How many ticks are written per chunk.
+        :param scenario: The scenario to store for the replay. Defaults to None
+        (the default constellations and ground stations).
+    """
+    np.random.seed(seed)
+    congestion = Congestion()
+    initialize_heatmap(congestion)
+    generate_congestion_heatmap(congestion)
+
+    with SimulationRecorder(path, seed, congestion, chunk_ticks, scenario) as recorder:
+        for loop_counter in range(1, tick_count + 1):
+            if loop_counter % settings.HEAT_MAP_REFRESH == 0:
+                congestion.congestion_map = refresh_congestion_heatmap(congestion)
+            recorder.record_tick(loop_counter * 1000 / settings.FPS, congestion)
+
+
+def replay_pipeline(path: str, strict: bool = True) -> Iterator[PipelineResult]:
+    """ Streams a recording back through the simulation pipeline, with the
+        constellations and ground stations of its scenario.
+
+        :param path: The recording to replay.
+        :param strict: Whether to refuse recordings made with different
+        settings. Defaults to True.
+        :return: An iterator of the PipelineResult of every recorded tick.
+        :raises ValueError: If strict and the settings differ from the recording.
+    """
+    replayer = SimulationReplayer(path)
+    mismatches = replayer.settings_mismatches()
+    if strict and mismatches:
+        raise ValueError(
+            f"recording was made with different settings: {', '.join(mismatches)}")
+
+    if replayer.scenario is not None:
+        leo_orbit_constellation, meo_orbit_constellation, ground_stations = \
+            replayer.scenario.build()
+        # The first traffic pair is the one routed, as in main().
+        endpoints = [ground_stations[i] for i in replayer.scenario.pairs[0].tolist()]
+    else:
+        leo_orbit_constellation, meo_orbit_constellation = build_constellations()
+        endpoints = default_ground_stations()
+    for ticks, congestion in replayer.frames():
+        yield run_pipeline(
+            leo_orbit_constellation,
+            meo_orbit_constellation,
+            endpoints,
+            congestion,
+            ticks
+        )
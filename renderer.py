@@ -0,0 +1,265 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : renderer.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        DirtyRectRenderer.begin_frame()
+        DirtyRectRenderer.end_frame()
+        draw_satellites()
+        draw_frame()
+
+    NOTES :
+        - Keeps the map and congestion heat map of the current view in a cached
+          scene surface. Every frame only the areas drawn on during the previous
+          frame and the congestion cells that changed level are restored from
+          it, and only those areas plus the ones drawn on this frame are pushed
+          to the display.
+        - Moving or zooming the camera rebuilds the scene and pushes a full frame.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import numpy as np
+import pygame
+
+import settings
+from camera import Camera, SpatialGrid, density_tiles
+from entities import Congestion
+from heatmap import CongestionBand
+from recording import congestion_map_to_grid
+from simulation import PipelineResult
+from visuals import CONGESTION_COLOURS, draw_background, draw_congestion, \
+    draw_entity, draw_line, draw_density_tiles, congestion_band_level
+
+
+class DirtyRectRenderer:
+    """ Pushes only the changed areas of the screen to the display.
+
+        :param screen: The display surface.
+        :param background: The world map, scaled to the window.
+    """
+
+    def __init__(self, screen: pygame.Surface, background: pygame.Surface) -> None:
+        self.screen = screen
+        self.background = background
+        self._base = pygame.Surface(screen.get_size()).convert()
+        self._scene = pygame.Surface(screen.get_size()).convert()
+        self._camera_state = None
+        self._grid = None
+        self._row_offset = 0
+        self._previous_rects = []
+        self._dirty_rects = []
+
+    def begin_frame(
+            self,
+            congestion: Congestion | np.ndarray | CongestionBand,
+            camera: Camera
+    ) -> None:
+        """ Erases the previous frame and applies the congestion changes, leaving
+            the screen ready for the satellites, links and HUD to be drawn.
+
+            :param congestion: The congestion of the frame.
+            :param camera: The camera to draw through.
+        """
+        row_offset = 0
+        if isinstance(congestion, CongestionBand):
+            # Only the rows of the band are compared, at the level of its
+            # pyramid the scene is drawn with.
+            level = congestion_band_level(congestion, camera)
+            grid, row_offset = level.levels, level.row_offset
+            cell_width = cell_height = level.cell_size
+        else:
+            if isinstance(congestion, np.ndarray):
+                grid = np.asarray(congestion, dtype=np.uint8)
+            else:
+                grid = congestion_map_to_grid(congestion)
+            cell_width = settings.WINDOW_WIDTH / grid.shape[1]
+            cell_height = settings.WINDOW_HEIGHT / grid.shape[0]
+
+        camera_state = (camera.x, camera.y, camera.zoom)
+        if camera_state != self._camera_state or self._grid is None or \
+                grid.shape != self._grid.shape or row_offset != self._row_offset:
+            # The view changed, rebuild the scene and push everything.
+            draw_background(self._base, self.background, camera)
+            self._scene.blit(self._base, (0, 0))
+            draw_congestion(self._scene, congestion, camera)
+            self.screen.blit(self._scene, (0, 0))
+            self._camera_state = camera_state
+            self._grid = grid.copy()
+            self._row_offset = row_offset
+            self._previous_rects = []
+            self._dirty_rects = [self.screen.get_rect()]
+            return
+
+        # Erase what was drawn over the scene last frame.
+        self._dirty_rects = self._previous_rects
+        for rect in self._previous_rects:
+            self.screen.blit(self._scene, rect, rect)
+
+        # Recolour the congestion cells that changed level.
+        screen_rect = self.screen.get_rect()
+        for row, col in zip(*np.nonzero(grid != self._grid)):
+            left, top = camera.world_to_screen(
+                (col * cell_width, (row_offset + row) * cell_height))
+            right, bottom = camera.world_to_screen(
+                ((col + 1) * cell_width, (row_offset + row + 1) * cell_height))
+            rect = pygame.Rect(int(left), int(top), int(np.ceil(right)) - int(left),
+                               int(np.ceil(bottom)) - int(top)).clip(screen_rect)
+            if not rect.width or not rect.height:
+                continue
+            self._scene.blit(self._base, rect, rect)
+            if grid[row, col]:
+                cell = pygame.Surface(rect.size, pygame.SRCALPHA)
+                cell.fill(tuple(CONGESTION_COLOURS[grid[row, col]]))
+                self._scene.blit(cell, rect)
+            self.screen.blit(self._scene, rect, rect)
+            self._dirty_rects.append(rect)
+        self._grid = grid.copy()
+
+    def end_frame(self, drawn_rects: list[pygame.Rect]) -> None:
+        """ Pushes the changed areas of the frame to the display.
+
+            :param drawn_rects: The areas drawn on since begin_frame().
+        """
+        self._previous_rects = [rect.inflate(2, 2) for rect in drawn_rects if rect]
+        pygame.display.update(self._dirty_rects + self._previous_rects)
+
+
+def draw_satellites(
+        screen: pygame.display,
+        camera: Camera,
+        constellation: list,
+        positions: list[tuple[float, float, int]],
+        on_path: set,
+        inactive_colour: tuple[int, int, int],
+        active_colour: tuple[int, int, int]
+) -> list[pygame.Rect]:
+    """ Draws the satellites of a constellation that are inside the view, or
+        density tiles of them when too many are visible to draw one by one.
+        Satellites on the path are always drawn on top.
+
+        :param screen: The screen to draw on.
+        :param camera: The camera to draw through.
+        :param constellation: The satellites of the constellation.
+        :param positions: The 3D positions of the satellites, in the same order.
+        :param on_path: The positions of the shortest path.
+        :param inactive_colour: The colour of satellites off the path.
+        :param active_colour: The colour of satellites on the path.
+        :return: The areas of the screen drawn on.
+    """
+    if not positions:
+        return []
+    points = np.array(positions, dtype=float)[:, :2]
+    view = camera.visible_rect()
+    visible = SpatialGrid(points, settings.SPATIAL_INDEX_CELL_SIZE).query(view)
+
+    active = []
+    drawn_rects = []
+    if len(visible) > settings.LOD_SATELLITE_THRESHOLD:
+        counts = density_tiles(
+            points[visible], view, settings.LOD_TILE_SIZE / camera.zoom)
+        drawn_rects.append(draw_density_tiles(
+            screen, counts, inactive_colour, settings.LOD_TILE_SIZE))
+        active = [satellite for satellite, position in zip(constellation, positions)
+                  if position in on_path]
+    else:
+        for i in visible:
+            if positions[i] in on_path:
+                active.append(constellation[i])
+            else:
+                drawn_rects.append(draw_entity(
+                    screen, constellation[i], inactive_colour, camera))
+
+    for satellite in active:
+        drawn_rects.append(draw_entity(screen, satellite, active_colour, camera))
+    return drawn_rects
+
+
+def draw_frame(
+        screen: pygame.Surface,
+        camera: Camera,
+        pipeline: PipelineResult,
+        endpoints: list,
+        leo_orbit_constellation: list,
+        meo_orbit_constellation: list,
+        font: pygame.font.Font,
+        fps: float
+) -> list[pygame.Rect]:
+    """ Draws the ground stations, links, HUD and satellites of a tick over the
+        map and congestion heat map.
+
+        :param screen: The surface to draw on.
+        :param camera: The camera to draw through.
+        :param pipeline: The result of run_pipeline() for the tick.
+        :param endpoints: The ground stations.
+        :param leo_orbit_constellation: The LEO satellites.
+        :param meo_orbit_constellation: The MEO satellites.
+        :param font: The font of the HUD.
+        :param fps: The frame rate shown in the HUD.
+        :return: The areas of the surface drawn on.
+    """
+    shortest_path = pipeline.shortest_path
+    drawn_rects = []
+
+    # Drawing visuals for endpoints.
+    for ground_station in endpoints:
+        drawn_rects.append(draw_entity(screen, ground_station, camera=camera))
+
+    # Drawing visuals for satellite links.
+    for j in range(1, len(shortest_path)):
+        drawn_rects.append(draw_line(
+            screen=screen,
+            points=(shortest_path[j], shortest_path[j-1]),
+            colour=settings.LINK_COLOUR,
+            camera=camera
+        ))
+    # Drawing visuals for endpoint links.
+    for point_pair in pipeline.leo_nodes_endpoints_link:
+        drawn_rects.append(draw_line(
+            screen=screen,
+            points=point_pair,
+            colour=settings.LINK_COLOUR,
+            camera=camera
+        ))
+
+    drawn_rects.append(pygame.draw.rect(
+        screen, settings.WHITE, pygame.Rect(25, 25, 200, 80)))
+    # Show number of hops.
+    screen.blit(font.render(
+        f"Number of hops: {len(shortest_path) + 1}", True, settings.BLACK), (30, 30))
+    # Show path distance.
+    screen.blit(font.render(
+        f"Path cost: {pipeline.path_distance:.2f}", True, settings.BLACK), (30, 55))
+    # Show fps.
+    screen.blit(font.render(
+        f"FPS: {fps:.2f}", True, settings.BLACK), (30, 80))
+
+    # Drawing visuals for LEO and MEO satellites.
+    on_path = set(shortest_path)
+    drawn_rects += draw_satellites(
+        screen, camera, leo_orbit_constellation, pipeline.leo_satellite_positions,
+        on_path, settings.LEO_INACTIVE_COLOUR, settings.LEO_ACTIVE_COLOUR)
+    drawn_rects += draw_satellites(
+        screen, camera, meo_orbit_constellation, pipeline.meo_satellite_positions,
+        on_path, settings.MEO_INACTIVE_COLOUR, settings.MEO_ACTIVE_COLOUR)
+    return drawn_rects
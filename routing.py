@@ -10,6 +10,7 @@
 
     FUNCTIONS :
         Algorithms.dijskra()
+        Algorithms.k_shortest_paths()
 
     NOTES :
         - ...
@@ -31,6 +32,11 @@
     1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
 """
 
+from heapq import heappush, heappop
+
+from graph import INF, SnapshotGraph, build_snapshot_graph, shortest_path_tree
+
+
 class Algorithms:
     def dijskra(
             all_satellite_positions: list[tuple[float, float, int]],
@@ -136,3 +142,118 @@ class Algorithms:
 
         # Return node path of shortest distance, along with its distance
         return node_path, cumulative_distance
+
+
+    def k_shortest_paths(
+            all_satellite_positions: list[tuple[float, float, int]],
+            leo_nodes_endpoints_link: list[tuple[tuple, tuple]],
+            node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float],
+            k: int = 3,
+            edge_disjoint: bool = False,
+            graph: SnapshotGraph = None
+    ) -> list[tuple[list[tuple[float, float, int]], float]]:
+        """ This function finds up to k loopless routes between two nodes,
+            ranked by cost, using Yen's algorithm so traffic can be split
+            across them.
+
+            A single reverse search tree from the destination is built and
+            reused: it yields the first route directly and serves as an exact
+            A* heuristic for every spur search, so each spur search only
+            expands the nodes around the best detour.
+
+            :param all_satellite_positions: A list of tuples representing the
+            positions of all satellites.
+            :param leo_nodes_endpoints_link: A list of tuples where each tuple
+            contains two tuples representing the positions of the closest LEO
+            satellite node and the corresponding ground station endpoint.
+            :param node_cost: A dictionary with keys as tuples representing the
+            positions of satellites and values as floats representing the cost
+            of using that satellite.
+            :param edges: A dictionary with keys as tuples representing pairs of
+            connected nodes and values as floats representing the distance between
+            those nodes.
+            :param k: The maximum number of routes to return. Defaults to 3.
+            :param edge_disjoint: Whether the routes may not share any link.
+            Defaults to False.
+            :param graph: The SnapshotGraph of the same tick, to reuse it across
+            calls. Defaults to None, in which case it is built from the edges.
+            :return: A list of (node path, cost) tuples, cheapest first. Costs are
+            computed as in dijskra(). The list is empty if the destination is not
+            reachable.
+        """
+        if k <= 0:
+            raise ValueError("'k' must be above 0")
+
+        if graph is None:
+            graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+        src = graph.index[leo_nodes_endpoints_link[0][0]]
+        dst = graph.index[leo_nodes_endpoints_link[-1][0]]
+
+        # Exact remaining cost to the destination from every node.
+        to_destination, next_hop = shortest_path_tree(graph, dst, reverse=True)
+        if to_destination[src] == INF:
+            return []
+
+        # The first route follows the reverse tree from the source.
+        path = [src]
+        while path[-1] != dst:
+            path.append(next_hop[path[-1]])
+        routes = [(path, to_destination[src])]
+
+        if edge_disjoint:
+            # Ban the links of every route found so far, in both directions.
+            banned_edges = set()
+            while len(routes) < k:
+                for u, v in zip(routes[-1][0], routes[-1][0][1:]):
+                    banned_edges.update(((u, v), (v, u)))
+                distance, parent = shortest_path_tree(
+                    graph, src, target=dst, banned_edges=banned_edges,
+                    heuristic=to_destination)
+                if distance[dst] == INF:
+                    break
+                path = [dst]
+                while path[-1] != src:
+                    path.append(parent[path[-1]])
+                routes.append((path[::-1], distance[dst]))
+        else:
+            candidates = []
+            seen = {tuple(routes[0][0])}
+            while len(routes) < k:
+                previous_path = routes[-1][0]
+                # Cost of the root path up to every node of the previous route.
+                root_cost = 0
+                for i in range(len(previous_path) - 1):
+                    spur_node = previous_path[i]
+                    root_path = previous_path[:i + 1]
+                    if i > 0:
+                        root_cost += next(w_uv for n, w_uv in graph.adjacency[
+                            previous_path[i - 1]] if n == spur_node) + \
+                            graph.node_cost[spur_node]
+
+                    # Remove the links used by known routes sharing this root.
+                    banned_edges = {
+                        (route[i], route[i + 1]) for route, _ in routes
+                        if route[:i + 1] == root_path}
+                    banned_nodes = set(root_path[:-1])
+
+                    distance, parent = shortest_path_tree(
+                        graph, spur_node, target=dst, banned_nodes=banned_nodes,
+                        banned_edges=banned_edges, heuristic=to_destination)
+                    if distance[dst] == INF:
+                        continue
+                    spur_path = [dst]
+                    while spur_path[-1] != spur_node:
+                        spur_path.append(parent[spur_path[-1]])
+                    candidate = root_path[:-1] + spur_path[::-1]
+                    if tuple(candidate) not in seen:
+                        seen.add(tuple(candidate))
+                        heappush(candidates, (root_cost + distance[dst], candidate))
+
+                if not candidates:
+                    break
+                cost, path = heappop(candidates)
+                routes.append((path, cost))
+
+        # Translate node indices back into positions.
+        return [([graph.positions[n] for n in path], cost) for path, cost in routes]
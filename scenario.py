@@ -0,0 +1,323 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : scenario.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.ScenarioDefinition
+        ScenarioDefinition.build()
+        ScenarioDefinition.demands()
+        ScenarioDefinition.orbital_model()
+        ScenarioDefinition.to_dict()
+        default_scenario()
+        scenario_from_dict()
+        load_scenario()
+        save_scenario()
+
+    NOTES :
+        - A scenario file holds the satellites, shells, ground stations and
+          traffic pairs of a run, as TOML or JSON:
+
+              stations = [[300, 275], [1475, 615]]
+              pairs = [[0, 1]]        # station indices, optionally a third volume
+              catalogue = "big.npz"   # optional, relative to the file
+              [leo]                   # or: delays = [...]
+              count = 500
+              spacing = 12            # delay i is WINDOW_WIDTH / count * i * spacing
+              [meo]
+              count = 125
+              spacing = 7
+              [[shells]]              # WalkerShell fields, for --orbits
+              layer = "leo"
+              ...
+
+          Missing sections fall back to the defaults of simulation.py.
+        - Large catalogues are '.npz' archives holding any of the arrays
+          leo_delays, meo_delays, stations, pairs and volumes, plus the shells
+          as a JSON string. A catalogue overrides the arrays of its file.
+        - A parsed TOML or JSON file is cached as '.npz' in SCENARIO_CACHE_DIR
+          next to it, keyed by its size and modification time, so it is only
+          parsed again after it changes. Its catalogue is not part of the cache.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+import settings
+from entities import LEOSatellite, MEOSatellite, GroundStation
+from orbits import OrbitalModel, WalkerShell
+from simulation import default_ground_stations
+from traffic import TrafficDemand
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+SCENARIO_CACHE_DIR = ".scenario_cache"
+
+# Keeps the files parsed by this process, keyed by path and file stat.
+_loaded = {}
+
+
+@dataclass
+class ScenarioDefinition:
+    """ A dataclass holding the contents of a scenario file as arrays.
+
+        Attributes:
+            leo_delays (np.ndarray): The delay of every LEO satellite.
+            meo_delays (np.ndarray): The delay of every MEO satellite.
+            stations (np.ndarray): The (G, 2) positions of the ground stations.
+            pairs (np.ndarray): The (P, 2) station indices of the traffic pairs.
+            volumes (np.ndarray): The traffic volume of every pair.
+            shells (tuple): The WalkerShell instances of the orbital mechanics
+            mode, empty to use settings.ORBIT_SHELLS.
+    """
+    leo_delays: np.ndarray
+    meo_delays: np.ndarray
+    stations: np.ndarray
+    pairs: np.ndarray
+    volumes: np.ndarray
+    shells: tuple = field(default=())
+
+    def build(self) -> tuple[list[LEOSatellite], list[MEOSatellite], list[GroundStation]]:
+        """ Builds the satellites and ground stations of the scenario.
+
+            :return: A tuple containing the list of LEO satellites, the list of
+            MEO satellites and the list of ground stations.
+        """
+        return [LEOSatellite(delay=delay) for delay in self.leo_delays.tolist()], \
+            [MEOSatellite(delay=delay) for delay in self.meo_delays.tolist()], \
+            [GroundStation(x=x, y=y) for x, y in self.stations.tolist()]
+
+    def demands(self, ground_stations: list[GroundStation]) -> list[TrafficDemand]:
+        """ Builds the traffic demands of the pairs.
+
+            :param ground_stations: The ground stations returned by build().
+            :return: A list of TrafficDemand instances.
+        """
+        return [TrafficDemand(src=ground_stations[i], dst=ground_stations[j], volume=volume)
+                for (i, j), volume in zip(self.pairs.tolist(), self.volumes.tolist())]
+
+    def orbital_model(self) -> OrbitalModel:
+        """ Builds the orbital model of the shells of the scenario.
+
+            :return: An OrbitalModel instance, flying settings.ORBIT_SHELLS if
+            the scenario has no shells.
+        """
+        return OrbitalModel(list(self.shells) or None)
+
+    def to_dict(self) -> dict:
+        """ Converts the scenario into the contents of a JSON scenario file,
+            with explicit delays.
+
+            :return: A JSON friendly dictionary, see scenario_from_dict().
+        """
+        return {
+            "stations": self.stations.tolist(),
+            "pairs": [[i, j, volume] for (i, j), volume in
+                      zip(self.pairs.tolist(), self.volumes.tolist())],
+            "leo": {"delays": self.leo_delays.tolist()},
+            "meo": {"delays": self.meo_delays.tolist()},
+            "shells": [asdict(shell) for shell in self.shells]
+        }
+
+
+def default_scenario() -> ScenarioDefinition:
+    """ Builds the scenario of build_constellations() and
+        default_ground_stations().
+
+        :return: A ScenarioDefinition instance.
+    """
+    return _from_dict({}, "<default>")
+
+
+def scenario_from_dict(data: dict, name: str = "<dict>") -> ScenarioDefinition:
+    """ Builds a scenario from the contents of a JSON scenario file, such as
+        the output of ScenarioDefinition.to_dict().
+
+        :param data: The dictionary to read.
+        :param name: The name of the scenario in error messages. Defaults to
+        '<dict>'.
+        :return: A ScenarioDefinition instance.
+        :raises ValueError: If its traffic pairs cannot be routed.
+    """
+    return _from_dict(data, name)
+
+
+def _delays(section: dict, count: int, spacing: float) -> np.ndarray:
+    """ Reads the delays of a constellation section. """
+    if "delays" in section:
+        return np.asarray(section["delays"], dtype=float)
+    count = section.get("count", count)
+    spacing = section.get("spacing", spacing)
+    return settings.WINDOW_WIDTH / count * np.arange(count) * spacing if count else np.empty(0)
+
+
+def _validate(definition: ScenarioDefinition, path: str) -> ScenarioDefinition:
+    """ Checks that the traffic pairs of a definition can be routed.
+
+        :raises ValueError: If there are no pairs, or a pair does not join two
+        different existing ground stations.
+    """
+    station_count = len(definition.stations)
+    if station_count < 2:
+        raise ValueError(f"scenario '{path}' needs at least two ground stations, "
+                         f"it has {station_count}")
+    if len(definition.pairs) == 0:
+        raise ValueError(f"scenario '{path}' has no traffic pairs")
+    if len(definition.volumes) != len(definition.pairs):
+        raise ValueError(f"scenario '{path}' has {len(definition.volumes)} volumes "
+                         f"for {len(definition.pairs)} pairs")
+    for index, (i, j) in enumerate(definition.pairs.tolist()):
+        if not (0 <= i < station_count and 0 <= j < station_count):
+            raise ValueError(f"pair {index} of scenario '{path}' refers to a ground "
+                             f"station outside of 0..{station_count - 1}")
+        if i == j:
+            raise ValueError(f"pair {index} of scenario '{path}' routes ground "
+                             f"station {i} to itself")
+    return definition
+
+
+def _from_dict(data: dict, path: str) -> ScenarioDefinition:
+    """ Builds a definition from the contents of a TOML or JSON file. """
+    stations = [(s["x"], s["y"]) if isinstance(s, dict) else tuple(s)
+                for s in data.get("stations", [(g.x, g.y) for g in default_ground_stations()])]
+    pairs = data.get("pairs", [(0, len(stations) - 1)])
+    if any(len(pair) not in (2, 3) for pair in pairs):
+        raise ValueError(f"scenario '{path}' has a pair that is not [src, dst] "
+                         f"or [src, dst, volume]")
+    return _validate(ScenarioDefinition(
+        leo_delays=_delays(data.get("leo", {}), settings.MAX_LEO_SATELLITE_COUNT, 12),
+        meo_delays=_delays(data.get("meo", {}), settings.MAX_MEO_SATELLITE_COUNT, 7),
+        stations=np.array(stations, dtype=float).reshape(-1, 2),
+        pairs=np.array([pair[:2] for pair in pairs], dtype=np.int64).reshape(-1, 2),
+        volumes=np.array([pair[2] if len(pair) > 2 else 1 for pair in pairs], dtype=float),
+        shells=tuple(WalkerShell(**shell) for shell in data.get("shells", []))
+    ), path)
+
+
+def _from_npz(path: str, base: ScenarioDefinition = None) -> ScenarioDefinition:
+    """ Reads a '.npz' scenario, filling its missing arrays from a base. """
+    base = base or default_scenario()
+    with np.load(path, allow_pickle=False) as archive:
+        arrays = {name: archive[name] for name in archive.files}
+    shells = base.shells
+    if "shells" in arrays:
+        shells = tuple(WalkerShell(**shell) for shell in json.loads(str(arrays["shells"])))
+    if "pairs" in arrays and (arrays["pairs"].ndim != 2 or arrays["pairs"].shape[1] != 2):
+        raise ValueError(f"scenario '{path}' must store its pairs as a (P, 2) array")
+    pairs = arrays.get("pairs", base.pairs).reshape(-1, 2).astype(np.int64)
+    volumes = arrays.get("volumes")
+    if volumes is None:
+        volumes = base.volumes if "pairs" not in arrays else np.ones(len(pairs))
+    return _validate(ScenarioDefinition(
+        leo_delays=arrays.get("leo_delays", base.leo_delays).astype(float),
+        meo_delays=arrays.get("meo_delays", base.meo_delays).astype(float),
+        stations=arrays.get("stations", base.stations).reshape(-1, 2).astype(float),
+        pairs=pairs,
+        volumes=volumes.astype(float),
+        shells=shells
+    ), path)
+
+
+def save_scenario(definition: ScenarioDefinition, path: str, **extra) -> None:
+    """ Writes a scenario as a '.npz' archive, which loads without parsing.
+
+        :param definition: The scenario to write.
+        :param path: The file to write.
+        :param extra: More arrays to store in the archive.
+    """
+    np.savez(
+        path,
+        **extra,
+        leo_delays=definition.leo_delays,
+        meo_delays=definition.meo_delays,
+        stations=definition.stations,
+        pairs=definition.pairs,
+        volumes=definition.volumes,
+        shells=np.array(json.dumps([asdict(shell) for shell in definition.shells]))
+    )
+
+
+def _parse(path: str, cache: bool) -> tuple[ScenarioDefinition, str]:
+    """ Reads a scenario file without its catalogue, through the caches. """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if cache and key in _loaded:
+        return _loaded[key]
+
+    extension = os.path.splitext(path)[1].lower()
+    cache_path = os.path.join(
+        os.path.dirname(path), SCENARIO_CACHE_DIR,
+        f"{os.path.basename(path)}.{stat.st_size}.{stat.st_mtime_ns}.npz")
+    if extension == ".npz":
+        parsed = _from_npz(path), ""
+    elif extension not in (".toml", ".json"):
+        raise ValueError(f"unsupported scenario file '{path}', expected .toml, .json or .npz")
+    elif cache and os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as archive:
+            catalogue = str(archive["catalogue"])
+        parsed = _from_npz(cache_path), catalogue
+    else:
+        if extension == ".toml":
+            if tomllib is None:
+                raise ImportError("TOML scenarios need tomllib (Python 3.11+)")
+            with open(path, "rb") as file:
+                data = tomllib.load(file)
+        else:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        parsed = _from_dict(data, path), data.get("catalogue", "")
+        if cache:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            save_scenario(parsed[0], cache_path, catalogue=np.array(parsed[1]))
+
+    if cache:
+        _loaded[key] = parsed
+    return parsed
+
+
+def load_scenario(path: str, cache: bool = True) -> ScenarioDefinition:
+    """ Loads a '.toml', '.json' or '.npz' scenario file.
+
+        :param path: The file to load.
+        :param cache: Whether to reuse the files already parsed by this process
+        and the '.npz' cache of parsed files. Defaults to True.
+        :return: A ScenarioDefinition instance. Its arrays may be shared between
+        the calls loading the same unchanged file, and should not be modified.
+        :raises ValueError: If the file type is not supported, or its traffic
+        pairs cannot be routed.
+        :raises ImportError: If a TOML file is loaded without tomllib
+        (Python < 3.11).
+    """
+    path = os.path.abspath(path)
+    definition, catalogue = _parse(path, cache)
+    if catalogue:
+        # Catalogues are read on every load, so they can change on their own.
+        definition = _from_npz(os.path.join(os.path.dirname(path), catalogue), definition)
+    return definition
@@ -0,0 +1,433 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : service.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        RouteService.snapshot()
+        RouteService.route()
+        RouteService.serve()
+        RouteClient.connect()
+        RouteClient.routes()
+        RouteClient.route()
+        RouteClient.close()
+        load_test()
+
+    NOTES :
+        - Protocol: newline delimited JSON over TCP or a Unix socket. A request is
+          {"id": ..., "queries": [{"src": i, "dst": j, "t": tick}, ...]} where i
+          and j index the ground stations of the service and "t" is optional
+          (defaults to the current tick). The response is {"id": ...,
+          "routes": [{"tick": t, "path": [[x, y, z], ...], "cost": c}, ...]},
+          with an empty path when no route exists, or {"id": ..., "error": ...}.
+        - Queries arriving within the same event loop iteration are coalesced:
+          all queries of a tick leaving from the same uplink are answered from
+          a single shortest path tree.
+        - Satellite positions are computed for the queried tick; node costs use
+          the congestion heatmap of the current tick.
+        - Usage: python service.py serve [--port N | --unix PATH]
+                 python service.py bench [--port N | --unix PATH] [--requests N]
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from math import dist
+
+import numpy as np
+
+from config import SimulationConfig
+from entities import GroundStation
+from graph import INF, SnapshotGraph, build_snapshot_graph, shortest_path_tree, \
+    reconstruct_path
+from heatmap import CongestionBand
+from positioning import update_position, get_3D_position, \
+    closest_leo_nodes_to_endpoints, get_edges_between_nodes, get_node_costs
+from simulation import build_constellations, default_ground_stations
+
+
+class RouteService:
+    """ An asyncio route-query server owning the simulation state.
+
+        :param ground_stations: The ground stations queries refer to by index.
+        Defaults to None (the default ground stations).
+        :param tick_interval: Wall time between two ticks (s). Defaults to
+        1 / config.fps.
+        :param seed: Seed of the congestion generator. Defaults to None.
+        :param cache_size: How many tick snapshots are kept. Defaults to 8.
+        :param config: The simulation config. Defaults to None (settings.py).
+    """
+
+    def __init__(
+            self,
+            ground_stations: list[GroundStation] = None,
+            tick_interval: float = None,
+            seed: int = None,
+            cache_size: int = 8,
+            config: SimulationConfig = None
+    ) -> None:
+        self.ground_stations = ground_stations or default_ground_stations()
+        self.config = config if config is not None else SimulationConfig.from_settings()
+        self.tick_interval = tick_interval or 1 / self.config.fps
+        self.tick = 0
+        self.searches = 0
+        self.queries = 0
+
+        # The service keeps its own generator so it never touches the global
+        # np.random state of the process it is embedded in.
+        self._rng = np.random.default_rng(seed)
+        self._congestion = CongestionBand.generate(
+            self.config.congestion_grid_density, self.config, self._rng)
+        self._leo_orbit_constellation, self._meo_orbit_constellation = \
+            build_constellations(self.config)
+        self._snapshots = OrderedDict()
+        self._cache_size = cache_size
+        self._pending = []
+        self._flush_scheduled = False
+
+    def _advance(self) -> None:
+        """ Moves the simulation on by one tick. """
+        self.tick += 1
+        if self.tick % self.config.heat_map_refresh == 0:
+            self._congestion.refresh(self.config, self._rng)
+            # Cached snapshots were priced with the previous heatmap.
+            self._snapshots.clear()
+
+    def snapshot(self, tick: int) -> tuple[SnapshotGraph, dict]:
+        """ Builds (or returns the cached) routing graph of a tick.
+
+            :param tick: The tick to build the graph for.
+            :return: A tuple of the SnapshotGraph and a list of the uplink node
+            index of every ground station, None for a station that no satellite
+            reaches.
+        """
+        if tick in self._snapshots:
+            self._snapshots.move_to_end(tick)
+            return self._snapshots[tick]
+
+        config = self.config
+        ticks = tick * 1000 / config.fps
+        leo_satellite_positions = [update_position(satellite, ticks, config) or get_3D_position(
+            satellite) for satellite in self._leo_orbit_constellation]
+        meo_satellite_positions = [update_position(satellite, ticks, config) or get_3D_position(
+            satellite) for satellite in self._meo_orbit_constellation]
+        all_satellite_positions = leo_satellite_positions + meo_satellite_positions
+
+        node_cost = get_node_costs(all_satellite_positions, self._congestion, config)
+        edges = get_edges_between_nodes(all_satellite_positions, config)
+        graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+        uplinks = []
+        for station in self.ground_stations:
+            endpoint = get_3D_position(station)
+            # Only the satellites the station can use, it may have none.
+            reachable = [node for node in leo_satellite_positions
+                         if dist(endpoint, node) < config.leo_max_reachability and
+                         dist(endpoint, node) * node_cost[node] < INF]
+            if not reachable:
+                uplinks.append(None)
+                continue
+            (node, _), = closest_leo_nodes_to_endpoints(
+                leo_satellite_positions=reachable,
+                ground_station_positions=[endpoint],
+                node_cost=node_cost,
+                config=config
+            )
+            uplinks.append(graph.index[node])
+        snapshot = (graph, uplinks)
+
+        self._snapshots[tick] = snapshot
+        if len(self._snapshots) > self._cache_size:
+            self._snapshots.popitem(last=False)
+        return snapshot
+
+    def _answer(self, batch: list[tuple[int, int, int, asyncio.Future]]) -> None:
+        """ Answers a batch of queries, one search per (tick, uplink) pair. """
+        groups = {}
+        for tick, src, dst, future in batch:
+            groups.setdefault(tick, {}).setdefault(src, []).append((dst, future))
+
+        for tick, sources in groups.items():
+            graph, uplinks = self.snapshot(tick)
+            for src, queries in sources.items():
+                source = uplinks[src]
+                for dst, future in queries:
+                    station = src if source is None else dst
+                    if uplinks[station] is None and not future.done():
+                        future.set_exception(LookupError(
+                            f"ground station {station} has no uplink at tick {tick}"))
+                queries = [(dst, future) for dst, future in queries if not future.done()]
+                if not queries:
+                    continue
+                # One tree serves every destination queried from this uplink.
+                distance, parent = shortest_path_tree(graph, source)
+                self.searches += 1
+                for dst, future in queries:
+                    target = uplinks[dst]
+                    if distance[target] == INF:
+                        route = {"tick": tick, "path": [], "cost": None}
+                    else:
+                        route = {
+                            "tick": tick,
+                            "path": [graph.positions[n]
+                                     for n in reconstruct_path(parent, source, target)],
+                            "cost": distance[target],
+                        }
+                    if not future.done():
+                        future.set_result(route)
+
+    def _flush(self) -> None:
+        """ Answers every query queued during the last loop iteration. """
+        batch, self._pending = self._pending, []
+        self._flush_scheduled = False
+        try:
+            self._answer(batch)
+        except Exception as error:
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+
+    def route(self, src: int, dst: int, tick: int = None) -> asyncio.Future:
+        """ Queues a route query to be coalesced with the other queries of the
+            current loop iteration.
+
+            :param src: The index of the source ground station.
+            :param dst: The index of the destination ground station.
+            :param tick: The tick to route at. Defaults to None (current tick).
+            :return: A future resolving to the route dictionary.
+            :raises IndexError: If a ground station index does not exist.
+        """
+        for station in (src, dst):
+            if not 0 <= station < len(self.ground_stations):
+                raise IndexError(f"no ground station {station}")
+        self.queries += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((self.tick if tick is None else int(tick), src, dst, future))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush)
+        return future
+
+    async def _handle(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter
+    ) -> None:
+        """ Serves one connection, answering its requests as they complete. """
+        async def respond(request: dict) -> None:
+            request_id = request.get("id") if isinstance(request, dict) else None
+            try:
+                if not isinstance(request, dict):
+                    raise TypeError("a request must be a JSON object")
+                routes = await asyncio.gather(*(self.route(
+                    query["src"], query["dst"], query.get("t"))
+                    for query in request["queries"]))
+                response = {"id": request_id, "routes": routes}
+            except Exception as error:
+                # Every request gets a response line, or its client waits forever.
+                response = {"id": request_id, "error": f"{type(error).__name__}: {error}"}
+            writer.write(json.dumps(response).encode("utf-8") + b"\n")
+
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as error:
+                    writer.write(json.dumps({"id": None, "error": str(error)}
+                                            ).encode("utf-8") + b"\n")
+                    continue
+                task = asyncio.create_task(respond(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _run_clock(self) -> None:
+        """ Advances the simulation on a fixed timer. """
+        while True:
+            await asyncio.sleep(self.tick_interval)
+            self._advance()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765,
+                    unix_path: str = None) -> None:
+        """ Serves route queries until cancelled.
+
+            :param host: The TCP host to bind. Defaults to "127.0.0.1".
+            :param port: The TCP port to bind. Defaults to 8765.
+            :param unix_path: A Unix socket path to bind instead of TCP.
+        """
+        if unix_path is not None:
+            server = await asyncio.start_unix_server(self._handle, path=unix_path)
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+        clock = asyncio.create_task(self._run_clock())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            clock.cancel()
+
+
+class RouteClient:
+    """ A local client of RouteService that pipelines requests over one
+        connection.
+    """
+
+    def __init__(self) -> None:
+        self._reader = None
+        self._writer = None
+        self._waiting = {}
+        self._next_id = 0
+        self._receiver = None
+
+    async def connect(self, host: str = "127.0.0.1", port: int = 8765,
+                      unix_path: str = None) -> "RouteClient":
+        """ Connects to a RouteService.
+
+            :param host: The TCP host. Defaults to "127.0.0.1".
+            :param port: The TCP port. Defaults to 8765.
+            :param unix_path: A Unix socket path to connect to instead of TCP.
+            :return: The connected client.
+        """
+        if unix_path is not None:
+            self._reader, self._writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            self._reader, self._writer = await asyncio.open_connection(host, port)
+        self._receiver = asyncio.create_task(self._receive())
+        return self
+
+    async def _receive(self) -> None:
+        """ Resolves the pending requests as their responses arrive. """
+        while line := await self._reader.readline():
+            response = json.loads(line)
+            future = self._waiting.pop(response["id"], None)
+            if future is None or future.done():
+                continue
+            if "error" in response:
+                future.set_exception(RuntimeError(response["error"]))
+            else:
+                future.set_result(response["routes"])
+        for future in self._waiting.values():
+            future.set_exception(ConnectionError("connection closed"))
+        self._waiting.clear()
+
+    async def routes(self, queries: list[tuple[int, int, int]]) -> list[dict]:
+        """ Sends a batch of route queries.
+
+            :param queries: A list of (src, dst, tick) tuples, where tick may be
+            None for the current tick.
+            :return: The route dictionaries, in the order of the queries.
+        """
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[request_id] = future
+        self._writer.write(json.dumps({"id": request_id, "queries": [
+            {"src": src, "dst": dst, "t": tick} for src, dst, tick in queries
+        ]}).encode("utf-8") + b"\n")
+        await self._writer.drain()
+        return await future
+
+    async def route(self, src: int, dst: int, tick: int = None) -> dict:
+        """ Sends a single route query.
+
+            :param src: The index of the source ground station.
+            :param dst: The index of the destination ground station.
+            :param tick: The tick to route at. Defaults to None (current tick).
+            :return: The route dictionary.
+        """
+        return (await self.routes([(src, dst, tick)]))[0]
+
+    async def close(self) -> None:
+        """ Closes the connection. """
+        self._writer.close()
+        await self._writer.wait_closed()
+        if self._receiver is not None:
+            await self._receiver
+
+
+async def load_test(
+        requests: int = 1000,
+        concurrency: int = 50,
+        batch: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        unix_path: str = None
+) -> dict:
+    """ Fires route queries at a running RouteService and measures throughput.
+
+        :param requests: How many requests to send.
+        :param concurrency: How many requests are in flight at once.
+        :param batch: How many queries every request holds.
+        :param host: The TCP host. Defaults to "127.0.0.1".
+        :param port: The TCP port. Defaults to 8765.
+        :param unix_path: A Unix socket path to connect to instead of TCP.
+        :return: A dictionary of the measured throughput and latencies.
+    """
+    client = await RouteClient().connect(host, port, unix_path)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await client.routes([(0, 1, None)] * batch)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    await client.close()
+    return {
+        "requests_per_second": requests / elapsed,
+        "queries_per_second": requests * batch / elapsed,
+        "mean_latency": float(np.mean(latencies)),
+        "p99_latency": float(np.percentile(latencies, 99)),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Route-query service.")
+    parser.add_argument("mode", choices=("serve", "bench"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="use a Unix socket")
+    parser.add_argument("--seed", type=int, help="seed of the congestion generator")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--batch", type=int, default=1)
+    args = parser.parse_args()
+
+    if args.mode == "serve":
+        try:
+            asyncio.run(RouteService(seed=args.seed).serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+    else:
+        print(asyncio.run(load_test(args.requests, args.concurrency, args.batch,
+                                    args.host, args.port, args.unix)))
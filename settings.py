@@ -36,6 +36,10 @@ WINDOW_WIDTH = 1920
 WINDOW_HEIGHT = 960
 RESOLUTION = (WINDOW_WIDTH, WINDOW_HEIGHT)
 
+# World map drawn behind the simulation, and where its scaled copies are cached.
+BACKGROUND_IMAGE = "worldmap_light.png"
+ASSET_CACHE_DIR = ".asset_cache"
+
 # Frame rate of program
 FPS = 50
 
@@ -58,9 +62,31 @@ LINK_COLOUR = (50, 50, 50)  # Dark gray.
 CONGESTION_COMPLEXITY = 10
 # Sets the density of rows and columns in the congestion grid.
 CONGESTION_GRID_DENSITY = 30
+# How many halving resolutions of a CongestionBand are kept for drawing.
+CONGESTION_PYRAMID_DEPTH = 3
+# The smallest on-screen size of a drawn congestion cell (pixels), finer grids
+# are drawn from a coarser level of the pyramid.
+CONGESTION_MIN_CELL_PIXELS = 8
 # How frequent the congestion map generates a new heatmap.
 HEAT_MAP_REFRESH = 2
 
+# Congestion dynamics (dynamics.py), applied once per step.
+# Share of the level difference to the four neighbouring cells that diffuses.
+CONGESTION_DIFFUSION = 0.1
+# Share of the excess over the lowest level that decays away.
+CONGESTION_DECAY = 0.05
+# Number of hotspots riding the evening side of the day/night terminator.
+CONGESTION_HOTSPOTS = 6
+# Level a hotspot adds at its centre once settled, and its radius (pixels).
+CONGESTION_HOTSPOT_LEVEL = 6
+CONGESTION_HOTSPOT_RADIUS = 100
+# Local solar hour the hotspots sit at.
+CONGESTION_PEAK_HOUR = 20
+# Standard deviation of the random level change of every cell.
+CONGESTION_NOISE = 0.3
+# Level a unit of routed traffic load adds to its cell once settled.
+CONGESTION_LOAD_GAIN = 1.0
+
 # How many LEO and MEO satellites are in orbit.
 MAX_LEO_SATELLITE_COUNT = 500
 MAX_MEO_SATELLITE_COUNT = 125
@@ -74,6 +100,28 @@ LEO_LEO_HOP_COST = 2
 MEO_MEO_HOP_COST = 1
 LEO_MEO_HOP_COST = (LEO_LEO_HOP_COST + MEO_MEO_HOP_COST) / 2
 
+# Radio parameters of the link budget: carrier frequency (GHz), bandwidth (Hz),
+# transmit EIRP (dBW), receive antenna gain (dBi) and system noise temperature (K).
+LINK_FREQUENCY_GHZ = 12
+LINK_BANDWIDTH = 250e6
+LINK_EIRP = 36
+LINK_RECEIVE_GAIN = 34
+LINK_NOISE_TEMPERATURE = 500
+# Rate (bit/s) of a link weighing as much as a LEO hop under 'inverse_capacity'.
+LINK_REFERENCE_RATE = 1e9
+# Edge weights: 'distance', 'latency', 'hops' or 'inverse_capacity'.
+LINK_COST_FUNCTION = "distance"
+
+# Relative cost increase a kept route may take before it is searched again.
+HANDOVER_COST_MARGIN = 0.2
+
+# Failure probabilities of a satellite and of a link in random failure scenarios.
+FAULT_SATELLITE_RATE = 0.01
+FAULT_LINK_RATE = 0.01
+
+# Routes between satellites closer than this (pixels) skip the MEO backbone.
+HIERARCHICAL_MIN_DISTANCE = 600
+
 # How fast the satellites move (will alter orbit).
 SIMULATION_SPEED_MULTIPLIER = 1/500
 
@@ -90,8 +138,40 @@ AMPLITUDE = WINDOW_HEIGHT / 2 - WINDOW_WIDTH / 10
 LEO_ORBIT_HEIGHT = 45
 MEO_ORBIT_HEIGHT = 450
 
+# Walker-delta shells of the orbital mechanics mode, as (layer, altitude km,
+# inclination degrees, planes, satellites per plane, phasing) tuples.
+ORBIT_SHELLS = [
+    ("leo", 550, 53.0, 72, 22, 17),
+    ("leo", 540, 53.2, 72, 22, 17),
+    ("leo", 570, 70.0, 36, 20, 11),
+    ("leo", 560, 97.6, 6, 58, 1),
+    ("leo", 565, 97.6, 4, 43, 1),
+    ("meo", 8062, 0.0, 1, 20, 0),
+]
+# Simulated seconds per second of program time in the orbital mechanics mode.
+ORBIT_TIME_SCALE = 60
+# Maximum link lengths of the orbital mechanics mode (km).
+ORBIT_LEO_LINK_RANGE = 1200
+ORBIT_MEO_LINK_RANGE = 6000
+ORBIT_LEO_MEO_LINK_RANGE = 9000
+# Height above the surface links must clear, keeping them out of the atmosphere (km).
+ORBIT_LINK_CLEARANCE = 80
+# Lowest elevation a ground station can use a satellite at (degrees).
+ORBIT_MIN_ELEVATION = 25
+
 # Satellite size on screen (pixels).
 LEO_WIDTH = 5
 MEO_WIDTH = 6
 GROUND_STATION_WIDTH = 7.5
 LINK_WIDTH = 2
+
+# Camera zoom limit and zoom multiplier of one mouse wheel step.
+MAX_ZOOM = 8
+ZOOM_STEP = 1.25
+
+# Above this many visible satellites, density tiles are drawn instead of dots.
+LOD_SATELLITE_THRESHOLD = 2000
+# Size of a density tile on screen (pixels).
+LOD_TILE_SIZE = 24
+# Size of a cell of the spatial index used to cull satellites (pixels).
+SPATIAL_INDEX_CELL_SIZE = 64
@@ -0,0 +1,331 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : simulation.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.PipelineResult
+        build_constellations()
+        default_ground_stations()
+        run_pipeline()
+
+    NOTES :
+        - The pipeline never touches the display, so it can be driven by the
+          pygame loop, a replayed log or a headless worker alike.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+import settings
+from config import SimulationConfig
+from entities import LEOSatellite, MEOSatellite, GroundStation, Congestion
+from heatmap import CongestionBand
+from positioning import update_position, get_3D_position, \
+    closest_leo_nodes_to_endpoints, get_edges_between_nodes, get_node_costs
+from routing import Algorithms
+from graph import INF, build_snapshot_graph, shortest_path_tree, reconstruct_path
+from orbits import OrbitalModel, orbital_node_costs
+from lazygraph import route_lazily
+from linkbudget import reweight_edges
+from handover import HandoverManager
+from traffic import TrafficEngine, TrafficLoad, load_node_costs
+
+
+@dataclass
+class PipelineResult:
+    """ A dataclass holding everything computed for a single simulation tick.
+
+        Attributes:
+            ticks (float): The program time (ms) the tick was computed for.
+            leo_satellite_positions (list): The 3D positions of the LEO satellites.
+            meo_satellite_positions (list): The 3D positions of the MEO satellites.
+            endpoint_positions (list): The 3D positions of the ground stations.
+            node_cost (dict): The cost of every satellite node.
+            edges (dict): The reachable edges between satellite nodes.
+            leo_nodes_endpoints_link (list): The uplink of every ground station.
+            shortest_path (list): The positions of the nodes along the route.
+            path_distance (float): The total cost of the route.
+            traffic_load (TrafficLoad): The load of the routed traffic, if a
+            TrafficEngine was given. Defaults to None.
+    """
+    ticks: float
+    leo_satellite_positions: list
+    meo_satellite_positions: list
+    endpoint_positions: list
+    node_cost: dict
+    edges: dict
+    leo_nodes_endpoints_link: list
+    shortest_path: list
+    path_distance: float
+    traffic_load: TrafficLoad = None
+
+
+def build_constellations(
+        config: SimulationConfig = None
+) -> tuple[list[LEOSatellite], list[MEOSatellite]]:
+    """ Builds the default LEO and MEO constellations, spreading the satellites
+        evenly along their orbit.
+
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: A tuple containing the list of LEO satellites and the list of
+        MEO satellites.
+    """
+    if config is None:
+        config = SimulationConfig.from_settings()
+    leo_orbit_constellation = [LEOSatellite(
+        delay=config.window_width / config.max_leo_satellite_count * i * 12
+    ) for i in range(config.max_leo_satellite_count)]
+
+    meo_orbit_constellation = [MEOSatellite(
+        delay=config.window_width / config.max_meo_satellite_count * i * 7
+    ) for i in range(config.max_meo_satellite_count)]
+
+    return leo_orbit_constellation, meo_orbit_constellation
+
+
+def default_ground_stations() -> list[GroundStation]:
+    """ Builds the default pair of ground station endpoints.
+
+        :return: A list of GroundStation instances.
+    """
+    return [
+        GroundStation(x=300, y=275),
+        GroundStation(x=1475, y=615),
+    ]
+
+
+def _heap_route(
+        all_satellite_positions: list[tuple[float, float, int]],
+        leo_nodes_endpoints_link: list[tuple[tuple, tuple]],
+        node_cost: dict[tuple, float],
+        edges: dict[tuple[tuple, tuple], float]
+) -> tuple[list[tuple[float, float, int]], float]:
+    """ Routes like Algorithms.dijskra() with the heap search of graph.py. """
+    graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+    src_node = leo_nodes_endpoints_link[0][0]
+    dst_node = leo_nodes_endpoints_link[-1][0]
+    source, target = graph.index[src_node], graph.index[dst_node]
+    distance, parent = shortest_path_tree(graph, source, target=target)
+    if distance[target] == INF:
+        print("path is not reachable")
+        return [src_node, dst_node], 0
+    return [graph.positions[i] for i in reconstruct_path(parent, source, target)], \
+        distance[target]
+
+
+def run_pipeline(
+        leo_orbit_constellation: list[LEOSatellite],
+        meo_orbit_constellation: list[MEOSatellite],
+        endpoints: list[GroundStation],
+        congestion: Congestion | np.ndarray | CongestionBand,
+        ticks: float = None,
+        traffic_engine: TrafficEngine = None,
+        lazy: bool = False,
+        orbits: OrbitalModel = None,
+        link_cost: str = None,
+        handover: HandoverManager = None,
+        config: SimulationConfig = None
+) -> PipelineResult:
+    """ Runs one tick of the simulation: moves the satellites, prices the nodes,
+        builds the graph and routes between the first and last ground station.
+
+        :param leo_orbit_constellation: The LEO satellites to move and route over.
+        :param meo_orbit_constellation: The MEO satellites to move and route over.
+        :param endpoints: The ground stations to route between.
+        :param congestion: The congestion heatmap used to price the nodes, or a
+        dense congestion grid such as the current slice of a CongestionTrace, or
+        a CongestionBand.
+        :param ticks: The program time in milliseconds. Defaults to None, in
+        which case the pygame clock is read by update_position().
+        :param traffic_engine: Routes its demands on the tick and prices the
+        nodes of the route by the resulting load. Defaults to None.
+        :param lazy: Whether to only compute the edges and node costs the route
+        search explores. The node_cost and edges of the result then only hold
+        the explored part of the graph. Defaults to False.
+        :param orbits: Moves the satellites, which must come from its
+        build_constellations(), along real orbits and links them by true 3D
+        distance. The route is then found with a heap search, which scales to
+        the thousands of satellites of real shells. Defaults to None.
+        :param link_cost: The link budget cost function weighing the edges, one
+        of linkbudget.COST_FUNCTIONS. Defaults to None, in which case
+        settings.LINK_COST_FUNCTION is used.
+        :param handover: Keeps the uplinks and the route of the previous tick
+        while they stay valid and cheap enough. Defaults to None, in which case
+        they are searched again on every tick.
+        :param config: The simulation config of the tick. Defaults to None, in
+        which case it is built from settings.py.
+        :return: A PipelineResult holding the state of the tick.
+        :raises ValueError: If lazy is combined with a traffic_engine, with
+        orbits, with a cost function other than 'distance' or with a handover
+        manager, which need the whole graph or their own links.
+    """
+    if link_cost is None:
+        link_cost = settings.LINK_COST_FUNCTION
+    if config is None:
+        config = SimulationConfig.from_settings()
+    if lazy and traffic_engine is not None:
+        raise ValueError("lazy evaluation cannot be combined with a traffic engine")
+    if lazy and orbits is not None:
+        raise ValueError("lazy evaluation cannot be combined with orbital mechanics")
+    if lazy and link_cost != "distance":
+        raise ValueError("lazy evaluation only supports the 'distance' cost function")
+    if lazy and handover is not None:
+        raise ValueError("lazy evaluation cannot be combined with a handover manager")
+
+    if orbits is not None:
+        orbits.update(leo_orbit_constellation, meo_orbit_constellation, ticks)
+        leo_satellite_positions = [get_3D_position(
+            satellite) for satellite in leo_orbit_constellation]
+        meo_satellite_positions = [get_3D_position(
+            satellite) for satellite in meo_orbit_constellation]
+    else:
+        # Move every satellite to the same point in time.
+        leo_satellite_positions = [update_position(satellite, ticks, config) or get_3D_position(
+            satellite) for satellite in leo_orbit_constellation]
+
+        meo_satellite_positions = [update_position(satellite, ticks, config) or get_3D_position(
+            satellite) for satellite in meo_orbit_constellation]
+
+    endpoint_positions = [get_3D_position(
+        ground_station) for ground_station in endpoints]
+
+    if lazy:
+        graph, leo_nodes_endpoints_link, shortest_path, path_distance = route_lazily(
+            all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
+            endpoint_positions=endpoint_positions,
+            congestion_map=congestion if isinstance(
+                congestion, (np.ndarray, CongestionBand)) else congestion.congestion_map,
+            config=config
+        )
+        return PipelineResult(
+            ticks=ticks,
+            leo_satellite_positions=leo_satellite_positions,
+            meo_satellite_positions=meo_satellite_positions,
+            endpoint_positions=endpoint_positions,
+            node_cost=graph.explored_node_costs(),
+            edges=graph.explored_edges(),
+            leo_nodes_endpoints_link=leo_nodes_endpoints_link,
+            shortest_path=shortest_path,
+            path_distance=path_distance
+        )
+
+    if orbits is not None:
+        node_cost = orbital_node_costs(
+            all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
+            congestion=congestion,
+            config=config
+        )
+        edges = orbits.edges(leo_satellite_positions + meo_satellite_positions, link_cost,
+                             config)
+    else:
+        node_cost = get_node_costs(
+            all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
+            congestion_map=congestion if isinstance(
+                congestion, (np.ndarray, CongestionBand)) else congestion.congestion_map,
+            config=config
+        )
+        edges = reweight_edges(get_edges_between_nodes(
+            all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
+            config=config
+        ), link_cost, config)
+
+    traffic_load = None
+    if traffic_engine is not None:
+        # Price the nodes by the traffic they carry, blended with congestion.
+        traffic_load = traffic_engine.step(
+            leo_satellite_positions + meo_satellite_positions,
+            leo_satellite_positions,
+            node_cost,
+            edges,
+            config
+        )
+        node_cost = load_node_costs(
+            traffic_load, traffic_engine.capacity, node_cost, traffic_engine.blend, config)
+
+    kept = None
+    if handover is not None:
+        kept = handover.keep(
+            leo_satellite_positions + meo_satellite_positions,
+            endpoint_positions,
+            node_cost,
+            edges,
+            orbits,
+            config
+        )
+
+    if kept is not None:
+        leo_nodes_endpoints_link, shortest_path, path_distance = kept
+    else:
+        if orbits is not None:
+            leo_nodes_endpoints_link = orbits.uplinks(
+                endpoint_positions,
+                leo_satellite_positions + meo_satellite_positions,
+                node_cost
+            )
+        else:
+            leo_nodes_endpoints_link = closest_leo_nodes_to_endpoints(
+                leo_satellite_positions=leo_satellite_positions,
+                ground_station_positions=endpoint_positions,
+                node_cost=node_cost,
+                config=config
+            )
+
+        if orbits is not None:
+            shortest_path, path_distance = _heap_route(
+                leo_satellite_positions + meo_satellite_positions,
+                leo_nodes_endpoints_link,
+                node_cost,
+                edges
+            )
+        else:
+            shortest_path, path_distance = Algorithms.dijskra(
+                all_satellite_positions=leo_satellite_positions + meo_satellite_positions,
+                leo_nodes_endpoints_link=leo_nodes_endpoints_link,
+                node_cost=node_cost,
+                edges=edges
+            )
+
+        if handover is not None:
+            handover.adopt(
+                leo_satellite_positions + meo_satellite_positions,
+                leo_nodes_endpoints_link,
+                shortest_path,
+                path_distance,
+                edges
+            )
+
+    return PipelineResult(
+        ticks=ticks,
+        leo_satellite_positions=leo_satellite_positions,
+        meo_satellite_positions=meo_satellite_positions,
+        endpoint_positions=endpoint_positions,
+        node_cost=node_cost,
+        edges=edges,
+        leo_nodes_endpoints_link=leo_nodes_endpoints_link,
+        shortest_path=shortest_path,
+        path_distance=path_distance,
+        traffic_load=traffic_load
+    )
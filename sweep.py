@@ -0,0 +1,255 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : sweep.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.Scenario
+        expand_grid()
+        run_scenario()
+        load_results()
+        run_sweep()
+
+    NOTES :
+        - Usage: python sweep.py GRID.json RESULTS.jsonl [--ticks N] [--processes N]
+          where GRID.json maps SimulationConfig field names to lists of values.
+        - Every finished scenario is appended to the results file straight away,
+          so an interrupted sweep resumes by skipping the scenarios already there.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+
+from config import SimulationConfig
+from entities import Congestion
+from positioning import initialize_heatmap, generate_congestion_heatmap, \
+    refresh_congestion_heatmap
+from simulation import PipelineResult, build_constellations, \
+    default_ground_stations, run_pipeline
+
+
+@dataclass(frozen=True)
+class Scenario:
+    """ An immutable dataclass describing one run of a sweep.
+
+        Attributes:
+            params (tuple): The swept (name, value) pairs, sorted by name.
+            config (SimulationConfig): The full config of the run.
+            seed (int): The seed of the congestion generator.
+            tick_count (int): How many ticks to simulate.
+            scenario_id (str): A stable identifier derived from the config,
+            seed and tick count.
+    """
+    params: tuple
+    config: SimulationConfig
+    seed: int
+    tick_count: int
+    scenario_id: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        key = json.dumps([asdict(self.config), self.seed, self.tick_count],
+                         sort_keys=True)
+        object.__setattr__(self, "scenario_id",
+                           hashlib.sha1(key.encode("utf-8")).hexdigest()[:16])
+
+
+def expand_grid(
+        grid: dict[str, list],
+        base_config: SimulationConfig = None,
+        seed: int = 0,
+        tick_count: int = 100
+) -> list[Scenario]:
+    """ Expands a parameter grid into the cartesian product of its scenarios.
+
+        :param grid: A dictionary mapping SimulationConfig field names to the
+        list of values to sweep.
+        :param base_config: The config the swept values are applied to. Defaults
+        to SimulationConfig.from_settings().
+        :param seed: The seed of the congestion generator of every scenario.
+        :param tick_count: How many ticks every scenario simulates.
+        :return: A list of Scenario instances.
+        :raises ValueError: If the grid names an unknown tunable.
+    """
+    if base_config is None:
+        base_config = SimulationConfig.from_settings()
+    names = sorted(grid)
+    scenarios = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        params = tuple(zip(names, values))
+        scenarios.append(Scenario(
+            params=params,
+            config=base_config.replace(**dict(params)),
+            seed=seed,
+            tick_count=tick_count
+        ))
+    return scenarios
+
+
+def _route_is_complete(result: PipelineResult) -> bool:
+    """ Checks that every hop of the computed route is an existing edge. """
+    path = result.shortest_path
+    return all((path[i-1], path[i]) in result.edges or (path[i], path[i-1])
+               in result.edges for i in range(1, len(path)))
+
+
+def run_scenario(scenario: Scenario) -> dict:
+    """ Runs one scenario headless and aggregates its per-tick results.
+
+        :param scenario: The scenario to run.
+        :return: A JSON friendly dictionary holding the scenario and its metrics.
+    """
+    config = scenario.config
+    path_costs = []
+    hops = []
+    edge_counts = []
+    unreachable_ticks = 0
+    failed_ticks = 0
+
+    started = time.perf_counter()
+    np.random.seed(scenario.seed)
+    congestion = Congestion()
+    congestion.grid_density = config.congestion_grid_density
+    initialize_heatmap(congestion)
+    generate_congestion_heatmap(congestion, config)
+    leo_orbit_constellation, meo_orbit_constellation = build_constellations(config)
+    endpoints = default_ground_stations()
+
+    for loop_counter in range(1, scenario.tick_count + 1):
+        if loop_counter % config.heat_map_refresh == 0:
+            congestion.congestion_map = refresh_congestion_heatmap(congestion, config)
+        try:
+            result = run_pipeline(
+                leo_orbit_constellation,
+                meo_orbit_constellation,
+                endpoints,
+                congestion,
+                loop_counter * 1000 / config.fps,
+                config=config
+            )
+        except LookupError:
+            # No satellite within reach of a ground station.
+            failed_ticks += 1
+            continue
+        edge_counts.append(len(result.edges))
+        if not _route_is_complete(result):
+            unreachable_ticks += 1
+            continue
+        path_costs.append(result.path_distance)
+        hops.append(len(result.shortest_path) + 1)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario_id": scenario.scenario_id,
+        "params": dict(scenario.params),
+        "seed": scenario.seed,
+        "tick_count": scenario.tick_count,
+        "metrics": {
+            "mean_path_cost": float(np.mean(path_costs)) if path_costs else None,
+            "max_path_cost": float(np.max(path_costs)) if path_costs else None,
+            "mean_hops": float(np.mean(hops)) if hops else None,
+            "mean_edges": float(np.mean(edge_counts)) if edge_counts else None,
+            "unreachable_ticks": unreachable_ticks,
+            "failed_ticks": failed_ticks,
+            "seconds_per_tick": elapsed / scenario.tick_count,
+        },
+    }
+
+
+def load_results(path: str) -> dict[str, dict]:
+    """ Loads the results of a (possibly interrupted) sweep.
+
+        A partially written last line, left by an interrupted sweep, is ignored.
+
+        :param path: The results file.
+        :return: A dictionary mapping scenario ids to their results.
+    """
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            results[result["scenario_id"]] = result
+    return results
+
+
+def run_sweep(
+        scenarios: list[Scenario],
+        results_path: str,
+        processes: int = None
+) -> dict[str, dict]:
+    """ Runs the scenarios not yet in the results file across a process pool,
+        appending each result as soon as it finishes.
+
+        :param scenarios: The scenarios of the sweep.
+        :param results_path: The JSON lines file holding the results.
+        :param processes: The size of the process pool. Defaults to None (one
+        process per CPU).
+        :return: A dictionary mapping scenario ids to the results of the sweep.
+    """
+    results = load_results(results_path)
+    pending = [s for s in scenarios if s.scenario_id not in results]
+
+    # Rewrite the completed results, dropping a line truncated by an interruption.
+    with open(results_path, "w", encoding="utf-8") as file:
+        file.writelines(json.dumps(result) + "\n" for result in results.values())
+
+    with open(results_path, "a", encoding="utf-8") as file, \
+            ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [executor.submit(run_scenario, s) for s in pending]
+        for future in as_completed(futures):
+            result = future.result()
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+            results[result["scenario_id"]] = result
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a scenario sweep.")
+    parser.add_argument("grid", help="JSON file mapping tunables to value lists")
+    parser.add_argument("results", help="JSON lines file to append results to")
+    parser.add_argument("--ticks", type=int, default=100,
+                        help="ticks simulated per scenario")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the congestion generator")
+    parser.add_argument("--processes", type=int, help="size of the process pool")
+    args = parser.parse_args()
+
+    with open(args.grid, "r", encoding="utf-8") as grid_file:
+        grid = json.load(grid_file)
+    scenarios = expand_grid(grid, seed=args.seed, tick_count=args.ticks)
+    results = run_sweep(scenarios, args.results, args.processes)
+    print(f"{len(results)} of {len(scenarios)} scenarios complete")
@@ -0,0 +1,161 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : traces.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        CongestionTrace.current()
+        CongestionTrace.current_band()
+        CongestionTrace.seek()
+        CongestionTrace.advance()
+        write_raw_trace()
+
+    NOTES :
+        - A trace is a (T, rows, columns) uint8 cube of congestion levels, one
+          slice per time step, spanning the whole window. A level of 0 marks a
+          cell that is not part of the heatmap, which satellites cannot use.
+        - Two formats are supported: '.npy' files, and raw files made of a small
+          header (magic, then T, rows and columns as little-endian uint32)
+          followed by the cube in C order. Both are memory-mapped, so traces
+          larger than RAM replay without being loaded.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import struct
+from typing import Iterable
+
+import numpy as np
+
+from config import SimulationConfig
+from heatmap import CongestionBand
+
+TRACE_MAGIC = b"SNSCUBE\x00"
+
+_TRACE_HEADER = struct.Struct("<8sIII")
+
+
+class CongestionTrace:
+    """ A memory-mapped congestion time series with a time cursor.
+
+        :param path: The '.npy' or raw trace file to map.
+        :raises ValueError: If the file is not a 3 dimensional uint8 cube.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        if path.endswith(".npy"):
+            self._cube = np.load(path, mmap_mode="r")
+        else:
+            with open(path, "rb") as file:
+                magic, steps, row_num, column_num = _TRACE_HEADER.unpack(
+                    file.read(_TRACE_HEADER.size))
+            if magic != TRACE_MAGIC:
+                raise ValueError(f"'{path}' is not a congestion trace")
+            self._cube = np.memmap(
+                path,
+                dtype=np.uint8,
+                mode="r",
+                offset=_TRACE_HEADER.size,
+                shape=(steps, row_num, column_num)
+            )
+
+        if self._cube.ndim != 3 or self._cube.dtype != np.uint8:
+            raise ValueError(
+                f"'{path}' must hold a (T, rows, columns) uint8 cube")
+        if len(self._cube) == 0:
+            raise ValueError(f"'{path}' holds no time steps")
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return len(self._cube)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        """ The (T, rows, columns) shape of the trace. """
+        return self._cube.shape
+
+    def current(self) -> np.ndarray:
+        """ Returns the congestion grid under the cursor. The grid is a view
+            into the mapped file, nothing is copied.
+
+            :return: A read-only (rows, columns) uint8 array.
+        """
+        return self._cube[self.cursor]
+
+    def current_band(self, config: SimulationConfig = None) -> CongestionBand:
+        """ Returns the orbit band of the congestion grid under the cursor, so
+            only its rows are read from the mapped file.
+
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: A CongestionBand viewing the rows of the band.
+        """
+        return CongestionBand.from_grid(self.current(), config=config)
+
+    def seek(self, step: int) -> np.ndarray:
+        """ Moves the cursor to a time step, wrapping around the trace.
+
+            :param step: The time step to move to.
+            :return: The congestion grid at that step.
+        """
+        self.cursor = step % len(self._cube)
+        return self.current()
+
+    def advance(self, steps: int = 1) -> np.ndarray:
+        """ Moves the cursor forward, wrapping around the trace.
+
+            :param steps: How many time steps to move. Defaults to 1.
+            :return: The congestion grid at the new cursor.
+        """
+        return self.seek(self.cursor + steps)
+
+
+def write_raw_trace(
+        path: str,
+        grids: Iterable[np.ndarray],
+        row_num: int,
+        column_num: int
+) -> int:
+    """ Writes congestion grids to a raw trace file one step at a time, so
+        traces never have to fit in memory while they are produced.
+
+        :param path: The file to write.
+        :param grids: The (rows, columns) grids to write, in time order.
+        :param row_num: The number of rows of every grid.
+        :param column_num: The number of columns of every grid.
+        :return: The number of time steps written.
+        :raises ValueError: If a grid does not have the declared shape.
+    """
+    steps = 0
+    with open(path, "wb") as file:
+        # Reserve the header, the step count is only known at the end.
+        file.write(_TRACE_HEADER.pack(TRACE_MAGIC, 0, row_num, column_num))
+        for grid in grids:
+            grid = np.asarray(grid)
+            if grid.shape != (row_num, column_num):
+                raise ValueError(
+                    f"grid {steps} has shape {grid.shape}, expected {(row_num, column_num)}")
+            file.write(np.ascontiguousarray(grid, dtype=np.uint8).tobytes())
+            steps += 1
+        file.seek(0)
+        file.write(_TRACE_HEADER.pack(TRACE_MAGIC, steps, row_num, column_num))
+    return steps
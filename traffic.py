@@ -0,0 +1,333 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : traffic.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        @dataclass.TrafficDemand
+        @dataclass.TrafficLoad
+        route_demands()
+        load_node_costs()
+        cell_load()
+        TrafficEngine.step()
+
+    NOTES :
+        - Demands are routed in batches: every distinct uplink satellite gets one
+          full shortest path tree, which serves all demands leaving from it.
+        - Loads are accumulated with np.bincount over the flattened routes, so
+          the cost of accumulation does not grow with the number of demands
+          beyond the length of their routes.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from config import SimulationConfig
+from entities import GroundStation, Congestion
+from graph import INF, SnapshotGraph, build_snapshot_graph, shortest_path_tree, \
+    reconstruct_path
+from heatmap import CongestionBand
+from positioning import get_3D_position, closest_leo_nodes_to_endpoints
+from routing import Algorithms
+
+
+@dataclass
+class TrafficDemand:
+    """ A dataclass representing traffic between two ground stations.
+
+        Attributes:
+            src (GroundStation): The ground station the traffic leaves from.
+            dst (GroundStation): The ground station the traffic goes to.
+            volume (float): The amount of traffic. Defaults to 1.
+    """
+    src: GroundStation
+    dst: GroundStation
+    volume: float = 1
+
+
+@dataclass
+class TrafficLoad:
+    """ A dataclass holding the load the routed traffic puts on a tick's graph.
+
+        Attributes:
+            graph (SnapshotGraph): The graph the demands were routed over.
+            node_load (np.ndarray): The load of every node, by node index.
+            link_nodes (np.ndarray): The (u, v) node indices of every link, one
+            row per edge of get_edges_between_nodes(), in the same order.
+            link_load (np.ndarray): The load of every link.
+            routes (list): The (node path, volume) pairs the demands were split
+            into, as node indices.
+            unrouted_volume (float): The volume that could not be routed.
+    """
+    graph: SnapshotGraph
+    node_load: np.ndarray
+    link_nodes: np.ndarray
+    link_load: np.ndarray
+    routes: list = field(default_factory=list)
+    unrouted_volume: float = 0
+
+
+def route_demands(
+        all_satellite_positions: list[tuple[float, float, int]],
+        leo_satellite_positions: list[tuple[float, float, int]],
+        demands: list[TrafficDemand],
+        node_cost: dict[tuple, float],
+        edges: dict[tuple[tuple, tuple], float],
+        paths_per_demand: int = 1,
+        config: SimulationConfig = None
+) -> TrafficLoad:
+    """ Routes every demand over the graph of a tick and accumulates the load
+        it puts on the satellites and links it traverses.
+
+        :param all_satellite_positions: A list of tuples representing the
+        positions of all satellites.
+        :param leo_satellite_positions: A list of tuples representing the
+        positions of the LEO satellites, used as uplinks.
+        :param demands: The traffic to route.
+        :param node_cost: A dictionary of the cost of every node.
+        :param edges: A dictionary of edges between nodes with their weights.
+        :param paths_per_demand: How many routes each demand is split across,
+        in inverse proportion to their cost. Defaults to 1.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: A TrafficLoad instance.
+    """
+    graph = build_snapshot_graph(all_satellite_positions, edges, node_cost)
+
+    # Find the uplink of every ground station once.
+    stations = list({id(station): station for demand in demands
+                     for station in (demand.src, demand.dst)}.values())
+    uplinks = closest_leo_nodes_to_endpoints(
+        leo_satellite_positions=leo_satellite_positions,
+        ground_station_positions=[get_3D_position(station) for station in stations],
+        node_cost=node_cost,
+        config=config
+    ) if stations else []
+    uplink = {id(station): graph.index[link[0]]
+              for station, link in zip(stations, uplinks)}
+
+    routes = []
+    unrouted_volume = 0
+    if paths_per_demand > 1:
+        for demand in demands:
+            ranked = Algorithms.k_shortest_paths(
+                all_satellite_positions,
+                [(graph.positions[uplink[id(demand.src)]], None),
+                 (graph.positions[uplink[id(demand.dst)]], None)],
+                node_cost,
+                edges,
+                k=paths_per_demand,
+                graph=graph
+            )
+            if not ranked:
+                unrouted_volume += demand.volume
+                continue
+            # Split the volume in inverse proportion to the route costs.
+            weights = np.array([1 / max(cost, 1e-9) for _, cost in ranked])
+            for (path, _), share in zip(ranked, weights / weights.sum()):
+                routes.append(([graph.index[p] for p in path], demand.volume * share))
+    else:
+        # Group the demands by uplink so each source is searched only once.
+        by_source = {}
+        for demand in demands:
+            by_source.setdefault(uplink[id(demand.src)], []).append(demand)
+        for source, source_demands in by_source.items():
+            distance, parent = shortest_path_tree(graph, source)
+            for demand in source_demands:
+                target = uplink[id(demand.dst)]
+                if distance[target] == INF:
+                    unrouted_volume += demand.volume
+                    continue
+                routes.append((reconstruct_path(parent, source, target), demand.volume))
+
+    node_count = len(graph.positions)
+    link_nodes = np.array([(graph.index[u], graph.index[v]) for u, v in edges],
+                          dtype=np.int64).reshape(-1, 2)
+    node_load = np.zeros(node_count)
+    link_load = np.zeros(len(link_nodes))
+    if routes:
+        # Flatten every route into node and hop arrays weighted by its volume.
+        lengths = np.array([len(path) for path, _ in routes])
+        volumes = np.array([volume for _, volume in routes], dtype=float)
+        nodes = np.fromiter((n for path, _ in routes for n in path),
+                            dtype=np.int64, count=int(lengths.sum()))
+        node_load = np.bincount(nodes, weights=np.repeat(volumes, lengths),
+                                minlength=node_count)
+
+        if len(link_nodes):
+            # Key every undirected link by its sorted node pair.
+            link_keys = np.minimum(link_nodes[:, 0], link_nodes[:, 1]) * node_count + \
+                np.maximum(link_nodes[:, 0], link_nodes[:, 1])
+            order = np.argsort(link_keys)
+            # Drop the last node of every route to get the hop start points.
+            starts = np.cumsum(lengths) - lengths
+            hop_mask = np.ones(len(nodes), dtype=bool)
+            hop_mask[starts + lengths - 1] = False
+            hop_u = nodes[hop_mask]
+            hop_v = nodes[np.roll(hop_mask, 1)]
+            hop_keys = np.minimum(hop_u, hop_v) * node_count + np.maximum(hop_u, hop_v)
+            hop_links = order[np.searchsorted(link_keys[order], hop_keys)]
+            link_load = np.bincount(hop_links, weights=np.repeat(volumes, lengths - 1),
+                                    minlength=len(link_nodes))
+
+    return TrafficLoad(
+        graph=graph,
+        node_load=node_load,
+        link_nodes=link_nodes,
+        link_load=link_load,
+        routes=routes,
+        unrouted_volume=unrouted_volume
+    )
+
+
+def load_node_costs(
+        load: TrafficLoad,
+        capacity: float,
+        congestion_node_cost: dict[tuple, float] = None,
+        blend: float = 0.5,
+        config: SimulationConfig = None
+) -> dict[tuple, float]:
+    """ Derives node costs from the load on every satellite, optionally blended
+        with the costs derived from the congestion map.
+
+        A node's load cost uses the same scale as get_node_costs(): a node at
+        full capacity costs as much as a cell of maximum congestion.
+
+        :param load: The load accumulated by route_demands().
+        :param capacity: The load at which a satellite is fully used.
+        :param congestion_node_cost: The node costs from get_node_costs().
+        Defaults to None, in which case only the load is used.
+        :param blend: The weight of the congestion costs in the blend, between
+        0 and 1. Defaults to 0.5.
+        :param config: The simulation config. Defaults to None (settings.py).
+        :return: A dictionary of the cost of every node.
+    """
+    if capacity <= 0:
+        raise ValueError("'capacity' must be above 0")
+    if not 0 <= blend <= 1:
+        raise ValueError("'blend' must be between 0 and 1")
+
+    if config is None:
+        config = SimulationConfig.from_settings()
+    utilisation = load.node_load / capacity
+    costs = (config.half_height *
+             (1 + config.congestion_complexity * utilisation)).tolist()
+    if congestion_node_cost is None:
+        return dict(zip(load.graph.positions, costs))
+    return {position: _blend(cost, congestion_node_cost.get(position, INF), blend)
+            for position, cost in zip(load.graph.positions, costs)}
+
+
+def _blend(load_cost: float, congestion_cost: float, blend: float) -> float:
+    """ Mixes a load cost with a congestion cost, without turning an infinite
+        cost with a zero weight into NaN.
+    """
+    if blend == 0:
+        return load_cost
+    if blend == 1:
+        return congestion_cost
+    return (1 - blend) * load_cost + blend * congestion_cost
+
+
+def cell_load(load: TrafficLoad, congestion: Congestion | CongestionBand) -> np.ndarray:
+    """ Accumulates the load of every satellite onto the congestion grid cell
+        it is in.
+
+        :param load: The load accumulated by route_demands().
+        :param congestion: An initialized instance of the Congestion class, or a
+        CongestionBand.
+        :return: A (row_num, column_num) array of the load in every cell.
+    """
+    grid = np.zeros((congestion.row_num, congestion.column_num))
+    if not load.graph.positions:
+        return grid
+    positions = np.asarray(load.graph.positions, dtype=float)
+    cols = np.clip((positions[:, 0] // congestion.cell_size).astype(int),
+                   0, congestion.column_num - 1)
+    rows = np.clip((positions[:, 1] // congestion.cell_size).astype(int),
+                   0, congestion.row_num - 1)
+    np.add.at(grid, (rows, cols), load.node_load)
+    return grid
+
+
+class TrafficEngine:
+    """ Closes the load-balancing loop: the load routed on one tick prices the
+        nodes the next tick is routed with.
+
+        :param demands: The traffic to route every tick.
+        :param capacity: The load at which a satellite is fully used.
+        :param blend: The weight of the congestion costs in the node costs.
+        :param paths_per_demand: How many routes each demand is split across.
+    """
+
+    def __init__(
+            self,
+            demands: list[TrafficDemand],
+            capacity: float,
+            blend: float = 0.5,
+            paths_per_demand: int = 1
+    ) -> None:
+        self.demands = demands
+        self.capacity = capacity
+        self.blend = blend
+        self.paths_per_demand = paths_per_demand
+        self.load = None
+
+    def step(
+            self,
+            all_satellite_positions: list[tuple[float, float, int]],
+            leo_satellite_positions: list[tuple[float, float, int]],
+            congestion_node_cost: dict[tuple, float],
+            edges: dict[tuple[tuple, tuple], float],
+            config: SimulationConfig = None
+    ) -> TrafficLoad:
+        """ Routes the demands of a tick, priced by the previous tick's load.
+
+            :param all_satellite_positions: The positions of all satellites.
+            :param leo_satellite_positions: The positions of the LEO satellites.
+            :param congestion_node_cost: The node costs from get_node_costs().
+            :param edges: A dictionary of edges between nodes with their weights.
+            :param config: The simulation config. Defaults to None (settings.py).
+            :return: The TrafficLoad of the tick.
+        """
+        node_cost = congestion_node_cost
+        # Satellites moved since the last tick, so the previous load is carried
+        # over by satellite order rather than by position.
+        if self.load is not None and \
+                len(self.load.graph.positions) == len(all_satellite_positions):
+            load_costs = load_node_costs(self.load, self.capacity, config=config).values()
+            node_cost = {position: _blend(cost, congestion_node_cost.get(position, INF),
+                                          self.blend)
+                         for position, cost in zip(all_satellite_positions, load_costs)}
+
+        self.load = route_demands(
+            all_satellite_positions,
+            leo_satellite_positions,
+            self.demands,
+            node_cost,
+            edges,
+            self.paths_per_demand,
+            config
+        )
+        return self.load
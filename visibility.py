@@ -0,0 +1,122 @@
+""" PROJECT : Satellite Network Simulation
+
+    FILENAME : visibility.py
+
+    DESCRIPTION :
+        This program simulates a simple satellite network using Python and pygame.
+        It allows users to create and configure a network of LEO and MEO satellites
+        and ground stations, simulate packet routing, and visualize the network state
+        over time.
+
+    FUNCTIONS :
+        map_to_ecef()
+        earth_occlusion_mask()
+        elevation_angles()
+        elevation_mask()
+
+    NOTES :
+        - Vectorized visibility tests of the orbital mechanics mode, run over
+          whole candidate edge arrays and every ground station at once.
+        - A link is occluded when the straight segment between its ends dips
+          below the Earth's surface plus settings.ORBIT_LINK_CLEARANCE, which
+          keeps inter-satellite links out of the lower atmosphere.
+
+    AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
+
+    CHANGES :
+        - ...
+
+    VERSION     DATE        WHO             DETAILS
+    0.1.0       2022.11.26  Noah            Creation of project.
+    0.2.0       2023.01.09  Noah            Basic simulation of LEO satellite constellation.
+    0.2.1       2023.01.19  Noah            Advanced simulation of LEO satellite constellation.
+    0.2.2       2023.01.21  Noah            Added some distortion to LEO satellite orbit to better represent Mercator Projection.
+    0.3.0       2023.01.22  Noah            Added path from ground station to nearest satellite and shortest path algorithm.
+    0.3.1       2023.01.22  Noah            Allows to run multiple endpoint (ground station) pairs at once (not recommended).
+    0.4.0       2023.03.17  Noah            Added MEO satellite constellation into routing calculations.
+    0.5.0       2023.03.22  Noah            Added load-balancing in form of a dynamic heatmap.
+    1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
+"""
+
+import numpy as np
+
+import settings
+
+# Mean radius of the Earth (km).
+EARTH_RADIUS = 6371.0
+
+
+def map_to_ecef(x: np.ndarray, y: np.ndarray, altitude: float = 0) -> np.ndarray:
+    """ Converts equirectangular map coordinates into Earth-fixed positions.
+
+        :param x: The x map coordinates (pixels).
+        :param y: The y map coordinates (pixels).
+        :param altitude: The altitude above the surface (km). Defaults to 0.
+        :return: An (N, 3) array of ECEF positions (km).
+    """
+    longitude = np.asarray(x, dtype=float) / settings.WINDOW_WIDTH * 2 * np.pi - np.pi
+    latitude = np.pi / 2 - np.asarray(y, dtype=float) / settings.WINDOW_HEIGHT * np.pi
+    radius = EARTH_RADIUS + altitude
+    return np.stack([radius * np.cos(latitude) * np.cos(longitude),
+                     radius * np.cos(latitude) * np.sin(longitude),
+                     radius * np.sin(latitude)], axis=-1)
+
+
+def earth_occlusion_mask(
+        a: np.ndarray,
+        b: np.ndarray,
+        clearance: float = None
+) -> np.ndarray:
+    """ Tests which links have a line of sight clear of the Earth.
+
+        :param a: An (E, 3) array of the ECEF positions (km) of one end.
+        :param b: An (E, 3) array of the ECEF positions (km) of the other end.
+        :param clearance: The height above the surface (km) the line of sight
+        must stay above. Defaults to settings.ORBIT_LINK_CLEARANCE.
+        :return: An (E,) boolean array, True where the link is visible.
+    """
+    if clearance is None:
+        clearance = settings.ORBIT_LINK_CLEARANCE
+    direction = b - a
+    length_squared = np.einsum("ij,ij->i", direction, direction)
+    # The point of the segment closest to the centre of the Earth.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.clip(-np.einsum("ij,ij->i", a, direction) / length_squared, 0, 1)
+    t = np.nan_to_num(t)
+    closest = a + t[:, None] * direction
+    return np.einsum("ij,ij->i", closest, closest) > (EARTH_RADIUS + clearance) ** 2
+
+
+def elevation_angles(stations: np.ndarray, satellites: np.ndarray) -> np.ndarray:
+    """ Computes the elevation of every satellite seen from every station.
+
+        :param stations: A (G, 3) array of the ECEF positions (km) of the stations.
+        :param satellites: An (N, 3) array of the ECEF positions (km) of the
+        satellites.
+        :return: A (G, N) array of elevation angles (degrees).
+    """
+    up = stations / np.linalg.norm(stations, axis=1, keepdims=True)
+    line_of_sight = satellites[None, :, :] - stations[:, None, :]
+    slant_range = np.linalg.norm(line_of_sight, axis=2)
+    sine = np.einsum("gnk,gk->gn", line_of_sight, up) / slant_range
+    return np.degrees(np.arcsin(np.clip(sine, -1, 1)))
+
+
+def elevation_mask(
+        stations: np.ndarray,
+        satellites: np.ndarray,
+        min_elevation: float = None
+) -> np.ndarray:
+    """ Tests which satellites every station can see above its minimum
+        elevation.
+
+        :param stations: A (G, 3) array of the ECEF positions (km) of the stations.
+        :param satellites: An (N, 3) array of the ECEF positions (km) of the
+        satellites.
+        :param min_elevation: The lowest usable elevation (degrees). Defaults
+        to settings.ORBIT_MIN_ELEVATION.
+        :return: A (G, N) boolean array, True where the satellite is usable.
+    """
+    if min_elevation is None:
+        min_elevation = settings.ORBIT_MIN_ELEVATION
+    return elevation_angles(stations, satellites) >= min_elevation
@@ -11,9 +11,18 @@
     FUNCTIONS :
         draw_entity()
         draw_line()
+        draw_congestion()
+        draw_congestion_grid()
+        draw_congestion_band()
+        congestion_band_level()
+        draw_background()
+        draw_density_tiles()
+        load_background()
 
     NOTES :
-        - ...
+        - The background scaled to a resolution is cached on disk as an
+          uncompressed bitmap in ASSET_CACHE_DIR, next to the source image, so
+          later starts skip decoding and rescaling the full size map.
 
     AUTHOR(S) : Noah Da Silva    START DATE : 2022.11.26 (YYYY.MM.DD)
 
@@ -32,18 +41,23 @@
     1.0.0       2023.04.07  Noah            Rewrote the program for efficiency and better dynamic adjustments.
 """
 
+import os
+
 import pygame
 import numpy as np
 
 import settings
 from entities import LEOSatellite, MEOSatellite, GroundStation, Congestion
+from camera import Camera
+from heatmap import CongestionBand
 
 
 def draw_entity(
         screen: pygame.display,
         entity: LEOSatellite | MEOSatellite | GroundStation,
         colour: tuple[int, int, int] = None,
-) -> None:
+        camera: Camera = None
+) -> pygame.Rect:
     """ Draws an entity on the screen.
 
         :param screen: The screen to draw on. Type: pygame.display
@@ -51,41 +65,269 @@ def draw_entity(
             GroundStation
         :param colour: The colour to use when drawing the entity. Defaults to \
             None. Type: tuple[int, int, int], optional
+        :param camera: The camera to draw through. Defaults to None (the whole \
+            world at a zoom of 1). Type: Camera, optional
+        :return: The area of the screen drawn on. Type: pygame.Rect
     """
+    centre, width = (entity.x, entity.y), entity.width
+    if camera is not None:
+        centre, width = camera.world_to_screen(centre), width * camera.zoom ** 0.5
     if colour is not None:
-        pygame.draw.circle(screen, colour, (entity.x, entity.y), entity.width)
-    else:
-        pygame.draw.circle(screen, entity.colour,
-                           (entity.x, entity.y), entity.width)
+        return pygame.draw.circle(screen, colour, centre, width)
+    return pygame.draw.circle(screen, entity.colour, centre, width)
 
 
 def draw_line(
         screen: pygame.display,
         points: tuple[tuple, tuple],
-        colour: tuple[int, int, int] = settings.BLACK
-) -> None:
+        colour: tuple[int, int, int] = settings.BLACK,
+        camera: Camera = None
+) -> pygame.Rect:
     """ Draws a line on the screen.
 
         :param screen: The screen to draw on. Type, pygame.display
         :param points: The points to connect with the line. Type, tuple[tuple, tuple]
         :param colour: The colour to use when drawing the line. Defaults to 
         settings.BLACK. Type, tuple[int, int, int], optional
+        :param camera: The camera to draw through. Defaults to None (the whole
+        world at a zoom of 1). Type, Camera, optional
+        :return: The area of the screen drawn on. Type, pygame.Rect
     """
-    pygame.draw.lines(screen, colour, False, [
+    if camera is not None:
+        points = [camera.world_to_screen(point) for point in points]
+    return pygame.draw.lines(screen, colour, False, [
                       point[0:2] for point in points], 2)
 
 
-def draw_congestion(screen: pygame.display, congestion: Congestion) -> None:
+def draw_congestion(
+        screen: pygame.display,
+        congestion: Congestion | np.ndarray | CongestionBand,
+        camera: Camera = None
+) -> None:
     """ Draws a congestion heat map on the screen.
 
         :param screen: The screen to draw on. Type, pygame.display
-        :param congestion: The congestion data to visualize. Type, Congestion
+        :param congestion: The congestion data to visualize. A (rows, columns)
+        array of congestion levels spanning the window, such as a slice of a
+        CongestionTrace, or a CongestionBand is also accepted.
+        Type, Congestion | np.ndarray | CongestionBand
+        :param camera: The camera to draw through, cells outside of its view are
+        skipped. Defaults to None. Type, Camera, optional
     """
+    if isinstance(congestion, np.ndarray):
+        draw_congestion_grid(screen, congestion, camera)
+        return
+    if isinstance(congestion, CongestionBand):
+        draw_congestion_band(screen, congestion, camera)
+        return
+
+    cell_size = congestion.cell_size
+    if camera is not None:
+        view_x, view_y, view_width, view_height = camera.visible_rect()
+        cell_size = congestion.cell_size * camera.zoom
+
     # Draw the heat map to visualize the congestion
     for (cell_top_left_points, cell_bottom_right_points), congestion_level in congestion.congestion_map.items():
+        if camera is not None:
+            # Skip the cells outside of the view.
+            if cell_bottom_right_points[0] < view_x or cell_top_left_points[0] > view_x + view_width or \
+                    cell_bottom_right_points[1] < view_y or cell_top_left_points[1] > view_y + view_height:
+                continue
+            cell_top_left_points = camera.world_to_screen(cell_top_left_points)
         cell = pygame.Surface(
-            (congestion.cell_size, congestion.cell_size), pygame.SRCALPHA)
+            (cell_size, cell_size), pygame.SRCALPHA)
         (30 * congestion_level)
         cell.fill((225, int(255 - np.interp(np.exp(np.interp(congestion_level,
                   [1, 5], [0, 1])), [np.exp(0), np.exp(1)], [65, 254])), 64, 80))
         screen.blit(cell, cell_top_left_points)
+
+
+def _congestion_colour_table() -> np.ndarray:
+    """ Builds the RGBA colour of every uint8 congestion level, using the same
+        colour scale as draw_congestion().
+    """
+    levels = np.arange(256)
+    green = (255 - np.interp(np.exp(np.interp(levels, [1, 5], [0, 1])),
+                             [np.exp(0), np.exp(1)], [65, 254])).astype(np.uint8)
+    colours = np.empty((256, 4), dtype=np.uint8)
+    colours[:, 0] = 225
+    colours[:, 1] = green
+    colours[:, 2] = 64
+    colours[:, 3] = 80
+    return colours
+
+
+CONGESTION_COLOURS = _congestion_colour_table()
+
+
+def draw_congestion_grid(
+        screen: pygame.display,
+        congestion_grid: np.ndarray,
+        camera: Camera = None
+) -> None:
+    """ Draws a dense congestion grid spanning the whole world in one blit.
+
+        :param screen: The screen to draw on. Type, pygame.display
+        :param congestion_grid: A (rows, columns) array of congestion levels.
+        Type, np.ndarray
+        :param camera: The camera to draw through, only the visible cells are
+        coloured and scaled. Defaults to None. Type, Camera, optional
+    """
+    if camera is None:
+        camera = Camera()
+    row_num, column_num = congestion_grid.shape
+    _draw_cells(screen, congestion_grid, 0, settings.WINDOW_WIDTH / column_num,
+                settings.WINDOW_HEIGHT / row_num, camera)
+
+
+def draw_congestion_band(
+        screen: pygame.display,
+        band: CongestionBand,
+        camera: Camera = None
+) -> None:
+    """ Draws the orbit band of a congestion heat map in one blit, from the
+        finest level of its pyramid whose cells are at least
+        settings.CONGESTION_MIN_CELL_PIXELS wide on screen.
+
+        :param screen: The screen to draw on. Type, pygame.display
+        :param band: The congestion levels of the orbit band. Type, CongestionBand
+        :param camera: The camera to draw through. Defaults to None. Type, Camera, optional
+    """
+    if camera is None:
+        camera = Camera()
+    level = congestion_band_level(band, camera)
+    _draw_cells(screen, level.levels, level.row_offset, level.cell_size,
+                level.cell_size, camera)
+
+
+def congestion_band_level(band: CongestionBand, camera: Camera) -> CongestionBand:
+    """ Picks the level of the pyramid of a band that draw_congestion_band()
+        draws through a camera.
+
+        :param band: The congestion levels of the orbit band. Type, CongestionBand
+        :param camera: The camera to draw through. Type, Camera
+        :return: The band itself or one of its coarser levels. Type, CongestionBand
+    """
+    factor = 1
+    while factor < 2 ** settings.CONGESTION_PYRAMID_DEPTH and \
+            band.cell_size * factor * camera.zoom < settings.CONGESTION_MIN_CELL_PIXELS:
+        factor *= 2
+    return band.coarsen(factor)
+
+
+def _draw_cells(
+        screen: pygame.display,
+        cells: np.ndarray,
+        row_offset: int,
+        cell_width: float,
+        cell_height: float,
+        camera: Camera
+) -> None:
+    """ Colours the visible part of a block of cells, whose first row is the
+        grid row row_offset, and blits it stretched to the view.
+    """
+    row_num, column_num = cells.shape
+
+    # Crop the block to the cells under the view.
+    view_x, view_y, view_width, view_height = camera.visible_rect()
+    first_column = max(int(view_x // cell_width), 0)
+    last_column = min(int(np.ceil((view_x + view_width) / cell_width)), column_num)
+    first_row = max(int(view_y // cell_height) - row_offset, 0)
+    last_row = min(int(np.ceil((view_y + view_height) / cell_height)) - row_offset, row_num)
+    if first_row >= last_row or first_column >= last_column:
+        return
+    visible = cells[first_row:last_row, first_column:last_column]
+
+    # Colour every cell through the lookup table, then stretch cells to pixels.
+    pixels = CONGESTION_COLOURS[np.asarray(visible, dtype=np.uint8)]
+    image = pygame.image.frombuffer(
+        pixels.tobytes(), (visible.shape[1], visible.shape[0]), "RGBA")
+    size = (round(visible.shape[1] * cell_width * camera.zoom),
+            round(visible.shape[0] * cell_height * camera.zoom))
+    screen.blit(pygame.transform.scale(image, size), camera.world_to_screen(
+        (first_column * cell_width, (row_offset + first_row) * cell_height)))
+
+
+_background_cache = {}
+
+
+def draw_background(
+        screen: pygame.display,
+        background: pygame.Surface,
+        camera: Camera = None
+) -> None:
+    """ Draws the part of the world map under the camera, caching the scaled
+        crop of the last view.
+
+        :param screen: The screen to draw on. Type, pygame.display
+        :param background: The world map, scaled to the window. Type, pygame.Surface
+        :param camera: The camera to draw through. Defaults to None. Type, Camera, optional
+    """
+    if camera is None or camera.zoom == 1:
+        screen.blit(background, (-camera.x if camera else 0, -camera.y if camera else 0))
+        return
+    key = (id(background), camera.x, camera.y, camera.zoom)
+    if key not in _background_cache:
+        _background_cache.clear()
+        view = pygame.Rect(camera.visible_rect()).clip(background.get_rect())
+        _background_cache[key] = (pygame.transform.scale(
+            background.subsurface(view),
+            (round(view.width * camera.zoom), round(view.height * camera.zoom))),
+            camera.world_to_screen(view.topleft))
+    crop, offset = _background_cache[key]
+    screen.blit(crop, offset)
+
+
+def draw_density_tiles(
+        screen: pygame.display,
+        counts: np.ndarray,
+        colour: tuple[int, int, int],
+        tile_size: float
+) -> pygame.Rect:
+    """ Draws satellite density tiles, each tile more opaque the more
+        satellites it holds.
+
+        :param screen: The screen to draw on. Type, pygame.display
+        :param counts: A (rows, columns) array of satellites per tile, the first
+        tile at the top left of the screen. Type, np.ndarray
+        :param colour: The colour of the tiles. Type, tuple[int, int, int]
+        :param tile_size: The size of a tile on screen (pixels). Type, float
+        :return: The area of the screen drawn on. Type, pygame.Rect
+    """
+    if not counts.size or counts.max() == 0:
+        return pygame.Rect(0, 0, 0, 0)
+    pixels = np.empty(counts.shape + (4,), dtype=np.uint8)
+    pixels[..., :3] = colour
+    pixels[..., 3] = (np.sqrt(counts / counts.max()) * 230).astype(np.uint8)
+    tiles = pygame.image.frombuffer(
+        pixels.tobytes(), (counts.shape[1], counts.shape[0]), "RGBA")
+    return screen.blit(pygame.transform.scale(tiles, (
+        round(counts.shape[1] * tile_size), round(counts.shape[0] * tile_size))), (0, 0))
+
+
+def load_background(path: str = None, size: tuple[int, int] = None) -> pygame.Surface:
+    """ Loads the world map scaled to a resolution, through its disk cache.
+
+        :param path: The image to load. Defaults to settings.BACKGROUND_IMAGE.
+        Type, str, optional
+        :param size: The resolution to scale to. Defaults to settings.RESOLUTION.
+        Type, tuple[int, int], optional
+        :return: The scaled image, converted to the display format once a
+        display mode is set. Type, pygame.Surface
+    """
+    path = settings.BACKGROUND_IMAGE if path is None else path
+    size = tuple(settings.RESOLUTION if size is None else size)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    cache_path = os.path.join(os.path.dirname(path), settings.ASSET_CACHE_DIR,
+                              f"{stem}_{size[0]}x{size[1]}.bmp")
+
+    if os.path.exists(cache_path) and \
+            os.path.getmtime(cache_path) >= os.path.getmtime(path):
+        background = pygame.image.load(cache_path)
+    else:
+        background = pygame.transform.scale(pygame.image.load(path), size)
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        pygame.image.save(background, cache_path)
+    if pygame.display.get_surface() is not None:
+        background = background.convert()
+    return background